@@ -0,0 +1,187 @@
+"""模型上下文窗口查询模块"""
+
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, Optional
+
+import requests
+
+from utils.config_path import get_cache_dir
+from utils.constants import (
+    CONTEXT_WINDOW_CACHE_TTL,
+    CONTEXT_WINDOW_REQUEST_TIMEOUT,
+    CONTEXT_WINDOW_RETRY_TTL,
+    OLLAMA_MAX_NUM_CTX,
+)
+from utils.text_processor import text_processor
+
+# OpenAI兼容服务在模型元数据中可能使用的上下文长度字段
+_OPENAI_CONTEXT_FIELDS = (
+    "context_length",
+    "context_window",
+    "max_model_len",
+    "max_context_length",
+    "max_input_tokens",
+)
+
+
+def _positive_int(value) -> Optional[int]:
+    """将元数据中的数值转换为正整数"""
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return None
+    return value if value > 0 else None
+
+
+def fetch_ollama_context_window(endpoint: Dict[str, Any]) -> Optional[int]:
+    """通过Ollama的/api/show查询模型上下文长度
+
+    优先使用模型参数中显式配置的num_ctx，否则使用模型元数据中的context_length（不超过OLLAMA_MAX_NUM_CTX）。
+    Ollama默认只分配较小的上下文，因此问答请求会通过options.num_ctx按这里的结果申请上下文长度
+    """
+    response = requests.post(
+        f"{endpoint['base_url']}/api/show",
+        headers=endpoint["headers"],
+        json={"model": endpoint["model"]},
+        timeout=CONTEXT_WINDOW_REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+    data = response.json()
+
+    for line in (data.get("parameters") or "").splitlines():
+        parts = line.split()
+        if len(parts) == 2 and parts[0] == "num_ctx":
+            num_ctx = _positive_int(parts[1])
+            if num_ctx:
+                return num_ctx
+
+    for key, value in (data.get("model_info") or {}).items():
+        if key.endswith(".context_length"):
+            context_length = _positive_int(value)
+            return min(context_length, OLLAMA_MAX_NUM_CTX) if context_length else None
+    return None
+
+
+def fetch_openai_context_window(endpoint: Dict[str, Any]) -> Optional[int]:
+    """通过OpenAI兼容服务的/v1/models查询模型上下文长度（服务未提供时返回None）"""
+    response = requests.get(
+        f"{endpoint['base_url']}/v1/models",
+        headers=endpoint["headers"],
+        timeout=CONTEXT_WINDOW_REQUEST_TIMEOUT,
+    )
+    response.raise_for_status()
+
+    for model in response.json().get("data", []):
+        if model.get("id") != endpoint["model"]:
+            continue
+        for field in _OPENAI_CONTEXT_FIELDS:
+            limit = _positive_int(model.get(field))
+            if limit:
+                return limit
+        return None
+    return None
+
+
+class ContextWindowRegistry:
+    """模型上下文窗口注册表
+
+    按服务地址和模型名称缓存从服务端查询到的上下文长度，持久化到磁盘并设置有效期；
+    查询不到时回退到TextProcessor中的模型配置表
+    """
+
+    def __init__(self, cache_path: Optional[str] = None, ttl: int = CONTEXT_WINDOW_CACHE_TTL,
+                 retry_ttl: int = CONTEXT_WINDOW_RETRY_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.retry_ttl = retry_ttl
+        self._lock = threading.Lock()
+        self._entries = None
+
+    @staticmethod
+    def make_key(endpoint: Dict[str, Any]) -> str:
+        """生成缓存键：服务类型、服务地址和模型名称"""
+        return f"{endpoint['service']}|{endpoint['base_url']}|{endpoint['model']}"
+
+    def _load_entries(self) -> Dict[str, Dict[str, Any]]:
+        """加载磁盘缓存（延迟加载，调用方需持有锁）"""
+        if self._entries is None:
+            if not self.cache_path:
+                self.cache_path = os.path.join(get_cache_dir(), "context_windows.json")
+            try:
+                with open(self.cache_path, "r", encoding="utf-8") as f:
+                    self._entries = json.load(f)
+            except FileNotFoundError:
+                self._entries = {}
+            except (OSError, ValueError) as e:
+                print(f"读取上下文窗口缓存失败: {e}")
+                self._entries = {}
+        return self._entries
+
+    def _save_entries(self):
+        """写入磁盘缓存（调用方需持有锁）"""
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._entries, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            print(f"写入上下文窗口缓存失败: {e}")
+
+    def _get_cached(self, key: str):
+        """读取未过期的缓存条目，返回(是否命中, 上下文长度或None)"""
+        with self._lock:
+            entry = self._load_entries().get(key)
+        if not entry:
+            return False, None
+        ttl = self.ttl if entry.get("limit") else self.retry_ttl
+        if time.time() - entry.get("fetched_at", 0) > ttl:
+            return False, None
+        return True, entry.get("limit")
+
+    def _fetch(self, endpoint: Dict[str, Any]) -> Optional[int]:
+        """向服务端查询上下文长度"""
+        try:
+            if endpoint["service"] == "ollama":
+                return fetch_ollama_context_window(endpoint)
+            return fetch_openai_context_window(endpoint)
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"查询模型上下文长度失败: {e}")
+            return None
+
+    def get_limit(self, endpoint: Optional[Dict[str, Any]], model_name: str = "",
+                  allow_fetch: bool = True) -> int:
+        """获取模型的上下文窗口大小
+
+        Args:
+            endpoint: get_service_endpoint返回的服务信息，为None时直接查表
+            model_name: 查表回退时使用的模型名称（默认取endpoint中的模型）
+            allow_fetch: 缓存未命中时是否向服务端查询（界面线程中应传False）
+        """
+        if endpoint is None:
+            return text_processor.get_model_token_limit(model_name)
+
+        model_name = model_name or endpoint["model"]
+        key = self.make_key(endpoint)
+        hit, limit = self._get_cached(key)
+        if not hit and allow_fetch:
+            limit = self._fetch(endpoint)
+            if limit:
+                print(f"模型 {endpoint['model']} 的上下文长度: {limit}")
+            # 查询失败也记录下来，在较短的有效期内不再重复请求
+            with self._lock:
+                self._load_entries()[key] = {"limit": limit, "fetched_at": time.time()}
+                self._save_entries()
+
+        if limit:
+            return limit
+        limit = text_processor.get_model_token_limit(model_name)
+        if endpoint["service"] == "ollama":
+            limit = min(limit, OLLAMA_MAX_NUM_CTX)
+        return limit
+
+
+# 全局实例
+context_window_registry = ContextWindowRegistry()
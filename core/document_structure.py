@@ -0,0 +1,235 @@
+"""PDF文档结构分析模块
+
+基于pymupdf的get_text("dict")输出的字号和字体标志识别标题、章节、图表标题、
+参考文献以及页眉页脚，将文档切分为带元数据的章节级文本块
+"""
+
+import re
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Optional
+
+import pymupdf
+
+from utils.constants import (
+    RUNNING_HEADER_MARGIN,
+    RUNNING_HEADER_MIN_RATIO,
+    STRUCTURE_CHUNK_CHARS,
+)
+from utils.extracted_text_cache import extracted_text_cache
+from utils.file_fingerprint import file_fingerprint
+from utils.text_processor import text_processor
+
+# 结构分析规则变化时递增，使旧缓存自动失效
+STRUCTURE_CACHE_VERSION = 1
+
+# 粗体字体标志位
+_BOLD_FLAG = 1 << 4
+
+_NUMBERED_HEADING_PATTERN = re.compile(
+    r'^(?:(\d+(?:\.\d+)*)\.?|[IVX]+\.|[A-Z]\.|第[一二三四五六七八九十百\d]+[章节部分篇]|[一二三四五六七八九十]+、)\s*\S'
+)
+_REFERENCES_PATTERN = re.compile(
+    r'^(?:[\dIVX]+\.?\s*)?(?:references|bibliography|works cited|literature cited|参考文献|引用文献)$',
+    re.IGNORECASE,
+)
+_CAPTION_PATTERN = re.compile(
+    r'^(?:fig\.?|figure|table|tab\.|图|表)\s*[\dA-Z一二三四五六七八九十]+', re.IGNORECASE
+)
+_PAGE_NUMBER_PATTERN = re.compile(r'^(?:page\s*)?\d+(?:\s*(?:/|of)\s*\d+)?$|^第\s*\d+\s*页', re.IGNORECASE)
+_DIGITS_PATTERN = re.compile(r'\d+')
+
+
+def _read_blocks(doc, stop_check: Optional[Callable[[], bool]] = None) -> List[Dict]:
+    """读取所有文本块及其主要字号、是否粗体和在页面中的纵向位置"""
+    blocks = []
+    for page in doc:
+        if stop_check and stop_check():
+            return []
+        data = page.get_text("dict", flags=pymupdf.TEXTFLAGS_TEXT)
+        height = data.get("height") or 1
+        for block in data.get("blocks", []):
+            if block.get("type") != 0:
+                continue
+            lines = []
+            size_chars = Counter()
+            bold_chars = 0
+            for line in block.get("lines", []):
+                line_text = "".join(span["text"] for span in line.get("spans", [])).strip()
+                if not line_text:
+                    continue
+                lines.append(line_text)
+                for span in line["spans"]:
+                    count = len(span["text"].strip())
+                    if not count:
+                        continue
+                    size_chars[round(span["size"] * 2) / 2] += count
+                    if span["flags"] & _BOLD_FLAG or "bold" in span.get("font", "").lower():
+                        bold_chars += count
+            if not lines:
+                continue
+            chars = sum(size_chars.values())
+            blocks.append({
+                "page": page.number,
+                "lines": lines,
+                "text": " ".join(lines),
+                "size": size_chars.most_common(1)[0][0] if size_chars else 0,
+                "chars": chars,
+                "bold": chars > 0 and bold_chars >= chars * 0.6,
+                "top": block["bbox"][1] / height,
+                "bottom": block["bbox"][3] / height,
+            })
+    return blocks
+
+
+def _find_running_blocks(blocks: List[Dict], page_count: int) -> set:
+    """找出页眉、页脚和页码所在的文本块（返回块序号集合）"""
+    pages_by_key = defaultdict(set)
+    margin_blocks = []
+    for i, block in enumerate(blocks):
+        if block["bottom"] < RUNNING_HEADER_MARGIN or block["top"] > 1 - RUNNING_HEADER_MARGIN:
+            key = _DIGITS_PATTERN.sub("#", block["text"].lower()).strip()
+            pages_by_key[key].add(block["page"])
+            margin_blocks.append((i, key))
+
+    min_pages = max(3, int(page_count * RUNNING_HEADER_MIN_RATIO))
+    running = set()
+    for i, key in margin_blocks:
+        if len(pages_by_key[key]) >= min_pages or _PAGE_NUMBER_PATTERN.match(blocks[i]["text"]):
+            running.add(i)
+    return running
+
+
+def _heading_level(block: Dict, body_size: float, heading_sizes: List[float]) -> int:
+    """判断文本块是否为标题，返回标题层级（1为最高），不是标题时返回0"""
+    text = block["text"]
+    if len(block["lines"]) > 3 or len(text) > 150 or block["size"] < body_size * 0.95:
+        return 0
+    if text[-1] in "。，,;；" or (text[-1] == "." and len(text) > 40):
+        return 0
+
+    numbered = _NUMBERED_HEADING_PATTERN.match(text)
+    is_large = block["size"] >= body_size * 1.15
+    if not (is_large or (block["bold"] and (numbered or len(text) <= 60))):
+        return 0
+
+    # 编号标题按编号层数确定层级，其余按字号排序
+    if numbered and numbered.group(1):
+        return numbered.group(1).count(".") + 1
+    if block["size"] in heading_sizes:
+        return heading_sizes.index(block["size"]) + 1
+    return len(heading_sizes) + 1
+
+
+def _new_section(title: str, level: int, kind: str, page: int) -> Dict:
+    """创建章节"""
+    return {
+        "title": title,
+        "level": level,
+        "kind": kind,
+        "page_start": page,
+        "page_end": page,
+        "paragraphs": [],
+        "captions": [],
+    }
+
+
+def _split_section(section: Dict, max_chars: int) -> List[Dict]:
+    """按段落将章节切分为不超过max_chars的文本块，每块保留章节元数据"""
+    chunks = []
+    current = []
+    current_len = 0
+
+    def flush():
+        if not current:
+            return
+        body = "\n".join(text for _, text in current)
+        chunks.append({
+            "title": section["title"],
+            "level": section["level"],
+            "kind": section["kind"],
+            "page_start": current[0][0],
+            "page_end": current[-1][0],
+            "part": len(chunks),
+            "captions": [caption for caption in section["captions"] if caption in body],
+            "text": f"{section['title']}\n{body}" if section["title"] else body,
+        })
+
+    for page, paragraph in section["paragraphs"]:
+        if current and current_len + len(paragraph) > max_chars:
+            flush()
+            current, current_len = [], 0
+        current.append((page, paragraph))
+        current_len += len(paragraph)
+    flush()
+    return chunks
+
+
+def extract_document_sections(file_path: str,
+                              stop_check: Optional[Callable[[], bool]] = None) -> List[Dict]:
+    """分析PDF结构，返回章节级文本块
+
+    每个文本块包含：title（所属章节标题）、level（标题层级，0为正文开头部分）、
+    kind（body正文或references参考文献）、page_start/page_end（0-based页码）、
+    part（章节内的序号）、captions（块内的图表标题）、text（含标题的文本）、tokens
+    页眉、页脚和页码在分析时去除
+    """
+    doc = pymupdf.open(file_path)
+    try:
+        page_count = len(doc)
+        blocks = _read_blocks(doc, stop_check)
+    finally:
+        doc.close()
+    if not blocks:
+        return []
+
+    running = _find_running_blocks(blocks, page_count)
+
+    size_chars = Counter()
+    for i, block in enumerate(blocks):
+        if i not in running:
+            size_chars[block["size"]] += block["chars"]
+    body_size = size_chars.most_common(1)[0][0] if size_chars else 0
+    heading_sizes = sorted({block["size"] for block in blocks if block["size"] >= body_size * 1.15}, reverse=True)
+
+    sections = [_new_section("", 0, "body", blocks[0]["page"])]
+    references_level = None  # 参考文献章节的层级，遇到同级或更高级标题时结束
+    for i, block in enumerate(blocks):
+        if i in running:
+            continue
+        level = _heading_level(block, body_size, heading_sizes)
+        if level:
+            if _REFERENCES_PATTERN.match(block["text"]):
+                references_level = level
+            elif references_level is not None and level <= references_level:
+                references_level = None
+            kind = "references" if references_level is not None else "body"
+            sections.append(_new_section(block["text"], level, kind, block["page"]))
+            continue
+
+        section = sections[-1]
+        section["page_end"] = block["page"]
+        paragraph = "\n".join(block["lines"])
+        section["paragraphs"].append((block["page"], paragraph))
+        if _CAPTION_PATTERN.match(block["text"]):
+            section["captions"].append(paragraph)
+
+    chunks = []
+    for section in sections:
+        chunks.extend(_split_section(section, STRUCTURE_CHUNK_CHARS))
+    for chunk, tokens in zip(chunks, text_processor.count_tokens_batch([chunk["text"] for chunk in chunks])):
+        chunk["tokens"] = tokens
+    return chunks
+
+
+def load_document_sections(file_path: str,
+                           stop_check: Optional[Callable[[], bool]] = None) -> List[Dict]:
+    """获取PDF的章节级文本块，按文件指纹缓存分析结果"""
+    fingerprint = file_fingerprint(file_path)
+    chunks = extracted_text_cache.get_data(fingerprint, kind="structure", version=STRUCTURE_CACHE_VERSION)
+    if chunks is not None:
+        return chunks
+
+    chunks = extract_document_sections(file_path, stop_check)
+    if chunks and not (stop_check and stop_check()):
+        extracted_text_cache.set_data(fingerprint, chunks, kind="structure", version=STRUCTURE_CACHE_VERSION)
+    return chunks
@@ -0,0 +1,150 @@
+"""对话历史压缩模块"""
+
+from typing import Dict, List, Tuple
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+from core.llm_client import chat_completion, load_qa_config
+from utils.constants import (
+    QA_HISTORY_COMPACT_BATCH,
+    QA_HISTORY_MAX_TURNS,
+    QA_HISTORY_SUMMARY_CHARS,
+    QA_HISTORY_WINDOW,
+)
+
+
+class HistoryCompactionThread(QThread):
+    """对话历史摘要线程"""
+    compaction_completed = pyqtSignal(str, int, str)  # 对话ID, 已覆盖的轮数, 摘要
+    compaction_failed = pyqtSignal(str, str)  # 对话ID, 错误信息
+
+    def __init__(self, conversation_id: str, previous_summary: str, turns: List[Dict],
+                 covered_turns: int, parent=None):
+        super().__init__(parent)
+        self.conversation_id = conversation_id
+        self.previous_summary = previous_summary
+        self.turns = turns
+        self.covered_turns = covered_turns
+
+    def run(self):
+        """执行摘要"""
+        try:
+            config = load_qa_config()
+            summary = chat_completion(config, self._build_messages())
+            if summary.strip():
+                self.compaction_completed.emit(
+                    self.conversation_id, self.covered_turns, summary.strip()
+                )
+            else:
+                self.compaction_failed.emit(self.conversation_id, "摘要结果为空")
+        except Exception as e:
+            self.compaction_failed.emit(self.conversation_id, str(e))
+
+    def _build_messages(self) -> list:
+        """构建摘要请求消息"""
+        parts = []
+        if self.previous_summary:
+            parts.append(f"【已有摘要】\n{self.previous_summary}")
+        for chat in self.turns:
+            parts.append(f"【用户】{chat.get('question', '')}\n【助手】{chat.get('answer', '')}")
+
+        return [
+            {
+                "role": "system",
+                "content": (
+                    "你负责压缩关于一份PDF文档的问答记录。请将已有摘要与新的对话合并为一份简洁的摘要，"
+                    "保留用户关心的问题、关键结论、数据、引用的页码和术语，省略寒暄和重复内容。"
+                    f"摘要不超过{QA_HISTORY_SUMMARY_CHARS}字，直接输出摘要正文。"
+                )
+            },
+            {
+                "role": "user",
+                "content": "\n\n".join(parts)
+            }
+        ]
+
+
+class ChatHistoryCompactor(QObject):
+    """对话历史压缩管理器
+
+    保留最近若干轮对话原文，更早的对话在后台用同一问答服务压缩为摘要，
+    摘要按对话ID缓存，使提示词长度在长对话中保持稳定；
+    摘要尚未生成或生成失败时，最多保留max_turns轮原文，丢弃更早的对话
+    """
+
+    def __init__(self, window: int = QA_HISTORY_WINDOW, batch: int = QA_HISTORY_COMPACT_BATCH,
+                 max_turns: int = QA_HISTORY_MAX_TURNS, parent=None):
+        super().__init__(parent)
+        self.window = window
+        self.batch = batch
+        self.max_turns = max(max_turns, window + batch)
+        self._summaries = {}  # 对话ID -> (已覆盖的轮数, 摘要)
+        self._threads = {}  # 对话ID -> 正在运行的摘要线程
+
+    def get_compacted_history(self, conversation_id: str, chat_history: List[Dict]) -> Tuple[str, List[Dict]]:
+        """获取压缩后的历史
+
+        Returns:
+            Tuple[更早对话的摘要, 未被摘要覆盖的最近对话（不超过max_turns轮）]
+        """
+        covered, summary = self._summaries.get(conversation_id, (0, ""))
+        if covered > len(chat_history):
+            # 对话已被清空或重置，摘要失效
+            self.discard(conversation_id)
+            covered, summary = 0, ""
+        recent = chat_history[covered:]
+        if len(recent) > self.max_turns:
+            print(f"对话历史摘要缺失或滞后，只保留最近{self.max_turns}轮对话（丢弃{len(recent) - self.max_turns}轮）")
+            recent = recent[-self.max_turns:]
+        return summary, recent
+
+    def schedule_compaction(self, conversation_id: str, chat_history: List[Dict]):
+        """在后台压缩超出窗口的较早对话"""
+        if not conversation_id or conversation_id in self._threads:
+            return
+
+        covered, summary = self._summaries.get(conversation_id, (0, ""))
+        if covered > len(chat_history):
+            covered, summary = 0, ""
+
+        target = len(chat_history) - self.window
+        if target - covered < self.batch:
+            return
+
+        thread = HistoryCompactionThread(
+            conversation_id, summary, list(chat_history[covered:target]), target, parent=self
+        )
+        thread.compaction_completed.connect(self._on_compaction_completed)
+        thread.compaction_failed.connect(self._on_compaction_failed)
+        thread.finished.connect(lambda: self._on_thread_finished(conversation_id, thread))
+        self._threads[conversation_id] = thread
+        thread.start()
+
+    def _on_compaction_completed(self, conversation_id: str, covered_turns: int, summary: str):
+        """摘要完成，更新缓存"""
+        current_covered, _ = self._summaries.get(conversation_id, (0, ""))
+        if covered_turns > current_covered:
+            self._summaries[conversation_id] = (covered_turns, summary)
+            print(f"对话历史已压缩: 前{covered_turns}轮 -> {len(summary)}字摘要")
+
+    def _on_compaction_failed(self, conversation_id: str, error_message: str):
+        """摘要失败，保留原始历史"""
+        print(f"对话历史压缩失败: {error_message}")
+
+    def _on_thread_finished(self, conversation_id: str, thread: HistoryCompactionThread):
+        """清理已结束的摘要线程"""
+        if self._threads.get(conversation_id) is thread:
+            del self._threads[conversation_id]
+        thread.deleteLater()
+
+    def discard(self, conversation_id: str):
+        """丢弃指定对话的摘要缓存"""
+        self._summaries.pop(conversation_id, None)
+
+    def cleanup(self):
+        """等待正在运行的摘要线程结束"""
+        for thread in list(self._threads.values()):
+            if thread.isRunning() and not thread.wait(3000):
+                thread.terminate()
+                thread.wait(1000)
+        self._threads.clear()
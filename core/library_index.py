@@ -0,0 +1,339 @@
+"""多文档问答索引模块"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.document_structure import load_document_sections
+from core.text_extraction import extract_document_text
+from utils.config_path import get_cache_dir
+from utils.constants import LIBRARY_CHUNK_CHARS, LIBRARY_SEARCH_LIMIT
+from utils.file_fingerprint import file_fingerprint, file_signature
+from utils.text_processor import text_processor
+
+_LATIN_TERM_PATTERN = re.compile(r'[a-z0-9]+')
+_CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def tokenize_terms(text: str) -> List[str]:
+    """将文本切分为检索词：英文按单词，中文按相邻二字组"""
+    text = (text or "").lower()
+    terms = [word for word in _LATIN_TERM_PATTERN.findall(text) if len(word) > 1]
+    for run in _CJK_RUN_PATTERN.findall(text):
+        if len(run) == 1:
+            terms.append(run)
+        else:
+            terms.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return terms
+
+
+def split_page_into_chunks(page_text: str, max_chars: int = LIBRARY_CHUNK_CHARS) -> List[str]:
+    """按段落将单页文本合并为不超过max_chars的检索块"""
+    chunks = []
+    current = []
+    current_len = 0
+    for paragraph in re.split(r'\n\s*\n', page_text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and current_len + len(paragraph) > max_chars:
+            chunks.append("\n".join(current))
+            current, current_len = [], 0
+        # 超长段落直接按字符切分
+        while len(paragraph) > max_chars:
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        current.append(paragraph)
+        current_len += len(paragraph)
+    if current:
+        chunks.append("\n".join(current))
+    return chunks
+
+
+class LibraryIndex:
+    """文档库检索索引
+
+    基于SQLite FTS5持久化所有文档的文本块，按文件签名与指纹增量更新，
+    只重新提取新增或发生变化的文件
+    """
+
+    def __init__(self, db_path: Optional[str] = None):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取数据库连接（延迟创建）"""
+        if self._conn is None:
+            if not self.db_path:
+                self.db_path = os.path.join(get_cache_dir(), "library_index.sqlite3")
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY,
+                    path TEXT UNIQUE NOT NULL,
+                    title TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime REAL NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    page_count INTEGER NOT NULL,
+                    indexed_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS chunks (
+                    id INTEGER PRIMARY KEY,
+                    doc_id INTEGER NOT NULL,
+                    page INTEGER NOT NULL,
+                    text TEXT NOT NULL,
+                    tokens INTEGER NOT NULL,
+                    section TEXT NOT NULL DEFAULT ''
+                );
+                CREATE INDEX IF NOT EXISTS idx_chunks_doc ON chunks(doc_id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS chunks_fts USING fts5(terms);
+                """
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def _normalize_folder(folder: str) -> str:
+        """规范化文件夹路径，保证以分隔符结尾"""
+        return os.path.join(os.path.abspath(folder), "")
+
+    @staticmethod
+    def _like_prefix(folder: str) -> str:
+        """构建LIKE前缀匹配模式"""
+        escaped = folder.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        return escaped + "%"
+
+    @staticmethod
+    def scan_folder(folder: str) -> List[str]:
+        """递归扫描文件夹中的PDF文件（跳过双语对照版本）"""
+        pdf_files = []
+        for root, _, files in os.walk(folder):
+            for name in files:
+                lower = name.lower()
+                if lower.endswith(".pdf") and not lower.endswith("-dual.pdf"):
+                    pdf_files.append(os.path.abspath(os.path.join(root, name)))
+        pdf_files.sort()
+        return pdf_files
+
+    def update_folder(self, folder: str,
+                      progress_callback: Optional[Callable[[int, int, str], None]] = None,
+                      stop_check: Optional[Callable[[], bool]] = None) -> Dict[str, int]:
+        """增量更新文件夹的索引
+
+        Returns:
+            各类文件数量统计：added、updated、removed、unchanged
+        """
+        folder = self._normalize_folder(folder)
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+
+        with self._lock:
+            conn = self._get_conn()
+            existing = {
+                row[0]: row[1:]
+                for row in conn.execute(
+                    "SELECT path, id, size, mtime, fingerprint FROM documents "
+                    "WHERE path LIKE ? ESCAPE '\\'",
+                    (self._like_prefix(folder),),
+                )
+            }
+
+        pdf_files = self.scan_folder(folder)
+        total = len(pdf_files)
+        for i, path in enumerate(pdf_files):
+            if stop_check and stop_check():
+                return stats
+            if progress_callback:
+                progress_callback(i + 1, total, os.path.basename(path))
+
+            try:
+                size, mtime = file_signature(path)
+                known = existing.get(path)
+                if known and known[1] == size and known[2] == mtime:
+                    stats["unchanged"] += 1
+                    continue
+
+                self._index_document(path, size, mtime, file_fingerprint(path))
+                stats["updated" if known else "added"] += 1
+            except Exception as e:
+                print(f"索引文档失败 {path}: {e}")
+
+        # 删除已不存在的文件
+        removed = set(existing) - set(pdf_files)
+        if removed:
+            with self._lock:
+                conn = self._get_conn()
+                for path in removed:
+                    self._delete_document(conn, existing[path][0])
+                conn.commit()
+            stats["removed"] = len(removed)
+
+        return stats
+
+    def _index_document(self, path: str, size: int, mtime: float, fingerprint: str):
+        """提取并写入单个文档的文本块
+
+        优先按文档结构切分为章节级文本块（跳过参考文献和页眉页脚），
+        无法分析结构时按页面段落切分
+        """
+        try:
+            sections = load_document_sections(path)
+        except Exception as e:
+            print(f"分析文档结构失败 {path}: {e}")
+            sections = []
+
+        if sections:
+            rows = [
+                (section["page_start"], section["text"], section["tokens"], section["title"])
+                for section in sections
+                if section["kind"] != "references"
+            ]
+            page_count = sections[-1]["page_end"] + 1
+        else:
+            document = extract_document_text(path)
+            chunks = []
+            for page_text, page_num in zip(document.pages, document.page_numbers):
+                for chunk in split_page_into_chunks(page_text):
+                    chunks.append((page_num, chunk))
+            token_counts = text_processor.count_tokens_batch([chunk for _, chunk in chunks])
+            rows = [(page_num, chunk, tokens, "") for (page_num, chunk), tokens in zip(chunks, token_counts)]
+            page_count = document.page_count
+
+        with self._lock:
+            conn = self._get_conn()
+            row = conn.execute("SELECT id FROM documents WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._delete_document(conn, row[0])
+
+            cursor = conn.execute(
+                "INSERT INTO documents (path, title, size, mtime, fingerprint, page_count, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (path, os.path.splitext(os.path.basename(path))[0], size, mtime,
+                 fingerprint, page_count, time.time()),
+            )
+            doc_id = cursor.lastrowid
+            for page_num, chunk, tokens, section in rows:
+                cursor = conn.execute(
+                    "INSERT INTO chunks (doc_id, page, text, tokens, section) VALUES (?, ?, ?, ?, ?)",
+                    (doc_id, page_num, chunk, tokens, section),
+                )
+                conn.execute(
+                    "INSERT INTO chunks_fts (rowid, terms) VALUES (?, ?)",
+                    (cursor.lastrowid, " ".join(tokenize_terms(chunk))),
+                )
+            conn.commit()
+
+    @staticmethod
+    def _delete_document(conn: sqlite3.Connection, doc_id: int):
+        """删除文档及其文本块"""
+        conn.execute(
+            "DELETE FROM chunks_fts WHERE rowid IN (SELECT id FROM chunks WHERE doc_id = ?)",
+            (doc_id,),
+        )
+        conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+        conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+
+    def search(self, query: str, folder: str = "", limit: int = LIBRARY_SEARCH_LIMIT) -> List[Dict]:
+        """按BM25相关度检索文本块"""
+        terms = list(dict.fromkeys(tokenize_terms(query)))[:32]
+        if not terms:
+            return []
+        match_expr = " OR ".join(f'"{term}"' for term in terms)
+
+        sql = (
+            "SELECT d.path, d.title, c.page, c.text, c.tokens, c.section "
+            "FROM chunks_fts JOIN chunks c ON c.id = chunks_fts.rowid "
+            "JOIN documents d ON d.id = c.doc_id "
+            "WHERE chunks_fts MATCH ?"
+        )
+        params = [match_expr]
+        if folder:
+            sql += " AND d.path LIKE ? ESCAPE '\\'"
+            params.append(self._like_prefix(self._normalize_folder(folder)))
+        sql += " ORDER BY bm25(chunks_fts) LIMIT ?"
+        params.append(limit)
+
+        try:
+            with self._lock:
+                rows = self._get_conn().execute(sql, params).fetchall()
+        except sqlite3.Error as e:
+            print(f"文档库检索失败: {e}")
+            return []
+
+        return [
+            {"path": path, "title": title, "page": page, "text": text, "tokens": tokens, "section": section}
+            for path, title, page, text, tokens, section in rows
+        ]
+
+    def build_context(self, question: str, max_tokens: int, folder: str = "") -> str:
+        """检索与问题相关的文本块，在token预算内组装为带出处的上下文"""
+        parts = []
+        used_tokens = 0
+        for chunk in self.search(question, folder=folder):
+            if used_tokens + chunk["tokens"] > max_tokens:
+                continue
+            parts.append(f"[来源：《{chunk['title']}》第{chunk['page'] + 1}页]\n{chunk['text']}")
+            used_tokens += chunk["tokens"]
+        return "\n\n".join(parts)
+
+    def revision(self, folder: str = "") -> str:
+        """获取文档库当前版本标识，索引变化时随之变化"""
+        sql = "SELECT COUNT(*), COALESCE(MAX(indexed_at), 0), COALESCE(SUM(size), 0) FROM documents"
+        params = []
+        if folder:
+            sql += " WHERE path LIKE ? ESCAPE '\\'"
+            params.append(self._like_prefix(self._normalize_folder(folder)))
+        with self._lock:
+            row = self._get_conn().execute(sql, params).fetchone()
+        return hashlib.sha256(f"{folder}|{row}".encode("utf-8")).hexdigest()
+
+    def document_count(self, folder: str = "") -> int:
+        """获取已索引的文档数量"""
+        sql = "SELECT COUNT(*) FROM documents"
+        params = []
+        if folder:
+            sql += " WHERE path LIKE ? ESCAPE '\\'"
+            params.append(self._like_prefix(self._normalize_folder(folder)))
+        with self._lock:
+            return self._get_conn().execute(sql, params).fetchone()[0]
+
+
+class LibraryIndexThread(QThread):
+    """文档库索引更新线程"""
+    progress_updated = pyqtSignal(int, int, str)  # current, total, current_file
+    index_completed = pyqtSignal(str, object)  # folder, 统计信息
+    index_failed = pyqtSignal(str, str)  # folder, 错误信息
+
+    def __init__(self, folder: str, parent=None):
+        super().__init__(parent)
+        self.folder = folder
+        self._stop_requested = False
+
+    def stop(self):
+        """停止索引"""
+        self._stop_requested = True
+
+    def run(self):
+        """执行增量索引"""
+        try:
+            stats = library_index.update_folder(
+                self.folder,
+                progress_callback=self.progress_updated.emit,
+                stop_check=lambda: self._stop_requested,
+            )
+            if not self._stop_requested:
+                self.index_completed.emit(self.folder, stats)
+        except Exception as e:
+            self.index_failed.emit(self.folder, str(e))
+
+
+# 全局实例
+library_index = LibraryIndex()
@@ -0,0 +1,177 @@
+"""大模型服务调用模块（返回完整回答）"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Optional
+
+import requests
+
+from core.context_window import context_window_registry
+from utils.config_path import get_config_file_path
+
+
+def load_qa_config() -> Dict[str, Any]:
+    """加载问答引擎配置（包含qa_settings）"""
+    config_file = get_config_file_path()
+    default_config = {
+        "service": "关闭",
+        "envs": {}
+    }
+
+    try:
+        if os.path.exists(config_file):
+            with open(config_file, 'r', encoding='utf-8') as f:
+                full_config = json.load(f)
+                if "qa_engine" in full_config:
+                    config = full_config["qa_engine"]
+                    # 如果有qa_settings，也加载进来
+                    if "qa_settings" in full_config:
+                        config["qa_settings"] = full_config["qa_settings"]
+                    return config
+    except Exception as e:
+        print(f"读取问答引擎配置失败: {e}")
+
+    return default_config
+
+
+def get_service_endpoint(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """根据配置获取服务端点信息
+
+    Returns:
+        包含service、base_url、headers、model的字典，配置不完整时返回None
+    """
+    service = config.get("service", "关闭")
+    envs = config.get("envs", {})
+
+    if service == "silicon":
+        api_key = envs.get("SILICON_API_KEY")
+        model = envs.get("SILICON_MODEL")
+        if not api_key or not model:
+            return None
+        return {
+            "service": service,
+            "base_url": "https://api.siliconflow.cn",
+            "headers": {
+                "Authorization": f"Bearer {api_key}",
+                "Content-Type": "application/json"
+            },
+            "model": model,
+        }
+    elif service == "ollama":
+        model = envs.get("OLLAMA_MODEL")
+        if not model:
+            return None
+        return {
+            "service": service,
+            "base_url": envs.get("OLLAMA_HOST", "http://127.0.0.1:11434").rstrip('/'),
+            "headers": {"Content-Type": "application/json"},
+            "model": model,
+        }
+    elif service == "自定义":
+        api_url = envs.get("CUSTOM_HOST")
+        model = envs.get("CUSTOM_MODEL")
+        if not api_url or not model:
+            return None
+        headers = {"Content-Type": "application/json"}
+        if envs.get("CUSTOM_KEY"):
+            headers["Authorization"] = f"Bearer {envs.get('CUSTOM_KEY')}"
+        return {
+            "service": service,
+            "base_url": api_url.rstrip('/'),
+            "headers": headers,
+            "model": model,
+        }
+    return None
+
+
+def ollama_chat_options(endpoint: Dict[str, Any], **options) -> Dict[str, Any]:
+    """Ollama /api/chat的options参数
+
+    num_ctx设为问答分配token预算时使用的上下文长度，否则Ollama按默认的较小上下文静默截断提示词
+    """
+    options["num_ctx"] = context_window_registry.get_limit(endpoint)
+    return options
+
+
+class RequestCancelled(Exception):
+    """请求被取消"""
+
+
+def chat_completion(config: Dict[str, Any], messages: list, timeout: int = 120,
+                    temperature: float = 0.3,
+                    stop_check: Optional[Callable[[], bool]] = None) -> str:
+    """调用配置的问答服务，返回完整回答
+
+    提供stop_check时以流式方式接收回答，每收到一段就检查一次，
+    需要停止时立即关闭连接（服务端随之停止生成）并抛出RequestCancelled
+
+    Raises:
+        ValueError: 问答引擎未配置或配置不完整
+        requests.exceptions.RequestException: API调用失败
+        RequestCancelled: stop_check返回True
+    """
+    endpoint = get_service_endpoint(config)
+    if endpoint is None:
+        raise ValueError("问答引擎未配置或配置不完整")
+
+    stream = stop_check is not None
+    if endpoint["service"] == "ollama":
+        url = f"{endpoint['base_url']}/api/chat"
+        data = {
+            "model": endpoint["model"],
+            "messages": messages,
+            "stream": stream,
+            "options": ollama_chat_options(endpoint, temperature=temperature)
+        }
+    else:
+        # 硅基流动与自定义服务均兼容OpenAI格式
+        url = f"{endpoint['base_url']}/v1/chat/completions"
+        data = {
+            "model": endpoint["model"],
+            "messages": messages,
+            "stream": stream,
+            "temperature": temperature
+        }
+
+    response = requests.post(url, headers=endpoint["headers"], json=data, timeout=timeout, stream=stream)
+    try:
+        response.raise_for_status()
+        if stream:
+            return _read_stream(endpoint["service"], response, stop_check)
+        if endpoint["service"] == "ollama":
+            return response.json().get("message", {}).get("content", "")
+        choices = response.json().get("choices", [])
+        if not choices:
+            return ""
+        return choices[0].get("message", {}).get("content", "") or ""
+    finally:
+        response.close()
+
+
+def _read_stream(service: str, response, stop_check: Callable[[], bool]) -> str:
+    """读取流式回答（Ollama为JSON行，OpenAI兼容服务为SSE），拼接为完整回答"""
+    parts = []
+    for line in response.iter_lines():
+        if stop_check():
+            raise RequestCancelled()
+        if not line:
+            continue
+        line = line.decode("utf-8")
+        if service != "ollama":
+            if not line.startswith("data: "):
+                continue
+            line = line[6:]
+            if line.strip() == "[DONE]":
+                break
+        try:
+            data = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        if service == "ollama":
+            parts.append(data.get("message", {}).get("content", ""))
+            if data.get("done", False):
+                break
+        else:
+            choices = data.get("choices") or [{}]
+            parts.append(choices[0].get("delta", {}).get("content") or "")
+    return "".join(parts)
@@ -0,0 +1,166 @@
+"""超长文档的分块汇总（map-reduce）问答模块"""
+
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from core.llm_client import RequestCancelled, chat_completion
+from utils.constants import MAP_REDUCE_NOTES_CHARS, MAP_REDUCE_POLL_INTERVAL
+from utils.document_text import DocumentText
+from utils.qa_cache import qa_cache
+from utils.text_processor import text_processor
+
+# 分块中没有相关信息时模型的约定回复
+NO_RELEVANT_CONTENT = "无相关内容"
+# 分块提取失败时记录的要点，提示最终回答这部分内容缺失
+MAP_CHUNK_FAILED = "（这部分内容提取失败，未纳入回答依据）"
+
+# 问题类型：(类型, 关键词, 分块提取要求)
+# 分块提取只依赖问题类型而不依赖具体问题，同类追问可以复用已缓存的分块结果
+QUESTION_TYPES = [
+    ("summary", ("总结", "概括", "摘要", "概述", "主要内容", "讲了什么", "大意", "summar", "overview"),
+     "概括这部分内容的主要观点、论证过程和结论"),
+    ("method", ("方法", "如何", "怎么", "怎样", "步骤", "流程", "算法", "实验", "原理", "method", "how"),
+     "提取这部分内容中的方法、步骤、实验设置和技术细节"),
+    ("data", ("数据", "结果", "数值", "多少", "指标", "表格", "对比", "性能", "result", "data"),
+     "提取这部分内容中的结果、数据、数值以及表格和图表中的信息"),
+]
+DEFAULT_QUESTION_TYPE = ("general", (), "提取这部分内容中的关键事实、定义、观点和结论，尽量保留具体细节")
+
+
+def classify_question(question: str) -> Tuple[str, str]:
+    """根据关键词判断问题类型，返回(类型, 分块提取要求)"""
+    question = (question or "").lower()
+    for question_type, keywords, instruction in QUESTION_TYPES:
+        if any(keyword in question for keyword in keywords):
+            return question_type, instruction
+    return DEFAULT_QUESTION_TYPE[0], DEFAULT_QUESTION_TYPE[2]
+
+
+def split_into_map_chunks(document: DocumentText, max_tokens: int) -> List[DocumentText]:
+    """将文档按连续页面切分为不超过max_tokens的分块，单页超出时单独成块"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    for i, page in enumerate(document.page_numbers):
+        tokens = document.token_counts[i]
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(document.select_pages(current))
+            current, current_tokens = [], 0
+        current.append(page)
+        current_tokens += tokens
+    if current:
+        chunks.append(document.select_pages(current))
+    return chunks
+
+
+def _page_range_label(chunk: DocumentText) -> str:
+    """分块的页码范围描述"""
+    first, last = chunk.page_numbers[0] + 1, chunk.page_numbers[-1] + 1
+    return f"第{first}页" if first == last else f"第{first}-{last}页"
+
+
+def _map_chunk(config: Dict[str, Any], chunk: DocumentText, max_tokens: int,
+               instruction: str, stop_check: Optional[Callable[[], bool]] = None) -> str:
+    """对单个分块发送提取请求"""
+    content, _ = text_processor.smart_truncate_pdf_content(chunk, max_tokens)
+    messages = [
+        {
+            "role": "system",
+            "content": "你是一个文档分析助手。下面是一份长文档中的一部分，请" + instruction +
+                       f"。只依据给出的内容，使用中文，条理清晰，不超过{MAP_REDUCE_NOTES_CHARS}字。"
+                       f"内容中没有相关信息时只回答“{NO_RELEVANT_CONTENT}”。",
+        },
+        {"role": "user", "content": content},
+    ]
+    return chat_completion(config, messages, stop_check=stop_check).strip()
+
+
+def map_document(config: Dict[str, Any], document: DocumentText, question: str,
+                 chunk_tokens: int, concurrency: int, model: str = "",
+                 stop_check: Optional[Callable[[], bool]] = None) -> List[Tuple[str, str]]:
+    """并发提取文档各分块的要点
+
+    每个分块的结果按(分块内容哈希, 问题类型, 服务商, 模型)缓存，追问同类问题时直接复用
+
+    Returns:
+        按页面顺序排列的(页码范围, 要点)列表
+    """
+    question_type, instruction = classify_question(question)
+    chunks = split_into_map_chunks(document, chunk_tokens)
+    provider = config.get("service", "")
+
+    results: List[Optional[str]] = [None] * len(chunks)
+    keys = []
+    pending = []
+    for i, chunk in enumerate(chunks):
+        key = qa_cache.hash_text(
+            "\x1f".join(["map", chunk.content_hash, question_type, provider, model])
+        )
+        keys.append(key)
+        results[i] = qa_cache.get(key)
+        if results[i] is None:
+            pending.append(i)
+
+    print(f"分块汇总: 共{len(chunks)}块，问题类型{question_type}，"
+          f"命中缓存{len(chunks) - len(pending)}块，并发数{concurrency}")
+
+    if pending:
+        _map_pending(config, chunks, pending, keys, results, chunk_tokens, instruction,
+                     concurrency, stop_check)
+
+    return [
+        (_page_range_label(chunk), notes)
+        for chunk, notes in zip(chunks, results)
+        if notes is not None
+    ]
+
+
+def _map_pending(config: Dict[str, Any], chunks: List[DocumentText], pending: List[int],
+                 keys: List[str], results: List[Optional[str]], chunk_tokens: int,
+                 instruction: str, concurrency: int,
+                 stop_check: Optional[Callable[[], bool]] = None):
+    """并发提取未命中缓存的分块，结果写入results
+
+    每隔一段时间检查一次stop_check，停止时撤销排队的分块，进行中的请求随之关闭连接；
+    单个分块失败时记为缺失；本次发送的分块请求全部失败时（服务不可用）抛出异常，
+    即使另有分块命中缓存，也不用少量缓存要点加缺失标记拼凑回答
+    """
+    stop_check = stop_check or (lambda: False)
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency))
+    futures = {
+        executor.submit(_map_chunk, config, chunks[i], chunk_tokens, instruction, stop_check): i
+        for i in pending
+    }
+    failures = []
+    try:
+        not_done = set(futures)
+        while not_done:
+            if stop_check():
+                return
+            done, not_done = wait(not_done, timeout=MAP_REDUCE_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except RequestCancelled:
+                    return
+                except Exception as e:
+                    print(f"分块{_page_range_label(chunks[i])}提取失败: {e}")
+                    failures.append(e)
+                    results[i] = MAP_CHUNK_FAILED
+                else:
+                    qa_cache.set(keys[i], results[i])
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if len(failures) == len(pending):
+        raise failures[-1]
+
+
+def build_reduce_context(partials: List[Tuple[str, str]], max_tokens: int) -> str:
+    """将各分块要点组装为最终回答使用的上下文，超出预算时截断"""
+    content = "\n\n".join(
+        f"[{label}]\n{notes}" for label, notes in partials if notes and notes != NO_RELEVANT_CONTENT
+    )
+    content, _ = text_processor.smart_truncate_pdf_content(content, max_tokens)
+    return content
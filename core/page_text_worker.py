@@ -0,0 +1,35 @@
+"""PDF页面文本提取工作进程模块
+
+仅依赖pymupdf，供进程池中的工作进程导入，避免加载Qt等重量级模块
+"""
+
+from typing import List, Optional, Tuple
+
+import pymupdf
+
+def check_page_text(page_text: Optional[str]) -> Optional[str]:
+    """检查文本质量，返回清理后的文本；为空、包含过多单字符或乱码时返回None"""
+    if not page_text or not page_text.strip():
+        return None
+    words = page_text.split()
+    single_chars = sum(1 for word in words if len(word) == 1)
+    if single_chars / len(words) > 0.7:
+        return None
+    return page_text.strip()
+
+
+def extract_page_text(page) -> Optional[str]:
+    """提取单页文本，未通过质量检查时返回None"""
+    return check_page_text(page.get_text())
+
+
+def extract_page_range(file_path: str, start: int, end: int) -> List[Tuple[int, Optional[str]]]:
+    """在工作进程中提取[start, end)范围内的页面文本
+
+    每个区间打开一次文档，提取完成后立即关闭，工作进程空闲时不占用文件
+    """
+    doc = pymupdf.open(file_path)
+    try:
+        return [(page_num, extract_page_text(doc.load_page(page_num))) for page_num in range(start, end)]
+    finally:
+        doc.close()
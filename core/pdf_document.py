@@ -1,10 +1,13 @@
 """PDF文档管理"""
 
+import threading
 from collections import OrderedDict
+from contextlib import contextmanager
 
 import pymupdf
 
-from utils.constants import MAX_CACHE_SIZE
+from core.word_boxes import WordBoxes
+from utils.constants import DISPLAY_LIST_CACHE_SIZE, PAGE_CACHE_MAX_BYTES, PAGE_WORDS_CACHE_SIZE
 
 
 class PDFDocument:
@@ -14,23 +17,27 @@ class PDFDocument:
         self.doc = None
         self.file_path = ""
         self.total_pages = 0
+        self.handles = None  # 工作线程使用的文档句柄池（self.doc只在界面线程中使用）
         
     def load(self, file_path):
         """加载PDF文档"""
         try:
-            if self.doc:
-                self.doc.close()
+            self.close()
                 
             self.doc = pymupdf .open(file_path)
             self.file_path = file_path
             self.total_pages = len(self.doc)
+            self.handles = DocumentHandlePool(file_path)
             return True, "加载成功"
             
         except Exception as e:
             return False, f"加载失败: {str(e)}"
     
     def close(self):
-        """关闭文档"""
+        """关闭文档（等待工作线程归还句柄后关闭所有句柄）"""
+        if self.handles:
+            self.handles.close()
+            self.handles = None
         if self.doc:
             self.doc.close()
             self.doc = None
@@ -47,49 +54,201 @@ class PDFDocument:
         return page.rect if page else None
 
 
+class DocumentHandlePool:
+    """文档句柄池
+
+    pymupdf文档对象不能被多个线程同时使用，句柄池从同一路径（或字节数据）打开多个文档，
+    每个句柄附带自己的显示列表缓存，同一时刻只借给一个线程。线程归还后句柄留在池中，
+    供之后的渲染线程复用，句柄数量不超过同时渲染的线程数。
+    关闭句柄池时等待正在使用的句柄归还后统一关闭
+    """
+    
+    def __init__(self, source):
+        self.source = source
+        self._condition = threading.Condition()
+        self._handles = []
+        self._idle = []  # 已归还、可供复用的句柄
+        self._in_use = 0
+        self._closed = False
+    
+    def _open(self):
+        """打开一个新的文档句柄"""
+        if isinstance(self.source, (bytes, bytearray)):
+            return pymupdf.open(stream=self.source, filetype="pdf")
+        return pymupdf.open(self.source)
+    
+    @contextmanager
+    def acquire(self):
+        """借出一个(文档, 显示列表缓存)句柄，没有空闲句柄时打开新句柄，句柄池已关闭时抛出RuntimeError"""
+        with self._condition:
+            if self._closed:
+                raise RuntimeError("文档句柄池已关闭")
+            self._in_use += 1
+            handle = self._idle.pop() if self._idle else None
+        try:
+            if handle is None:
+                handle = (self._open(), DisplayListCache())
+                with self._condition:
+                    self._handles.append(handle)
+            yield handle
+        finally:
+            with self._condition:
+                if handle is not None:
+                    self._idle.append(handle)
+                self._in_use -= 1
+                self._condition.notify_all()
+    
+    @property
+    def handle_count(self):
+        """已打开的句柄数量"""
+        with self._condition:
+            return len(self._handles)
+    
+    def close(self):
+        """关闭所有句柄"""
+        with self._condition:
+            self._closed = True
+            while self._in_use:
+                self._condition.wait()
+            handles, self._handles = self._handles, []
+            self._idle = []
+        for doc, display_lists in handles:
+            display_lists.clear()
+            doc.close()
+
+
+class DisplayListCache:
+    """页面显示列表缓存
+
+    显示列表是页面内容流解析后的绘图指令，可以按不同比例和裁剪区域重复渲染，
+    缩放时不必重新解析内容流（复杂矢量页面尤其明显）。显示列表依赖所属文档，
+    切换或关闭文档时必须清空
+    """
+    
+    def __init__(self, max_size=DISPLAY_LIST_CACHE_SIZE):
+        self.lists = OrderedDict()
+        self.max_size = max_size
+    
+    def get(self, doc, page_num):
+        """获取页面的显示列表，不存在时解析页面生成"""
+        display_list = self.lists.get(page_num)
+        if display_list is not None:
+            self.lists.move_to_end(page_num)
+            return display_list
+        
+        display_list = doc[page_num].get_displaylist()
+        self.lists[page_num] = display_list
+        while len(self.lists) > self.max_size:
+            self.lists.popitem(last=False)
+        return display_list
+    
+    def clear(self):
+        """清空缓存"""
+        self.lists.clear()
+
+
+def image_size_in_bytes(image):
+    """估算图像占用的字节数（宽 × 高 × 每像素字节数）"""
+    if hasattr(image, "sizeInBytes"):  # QImage
+        return image.sizeInBytes()
+    if hasattr(image, "depth"):  # QPixmap
+        return image.width() * image.height() * image.depth() // 8
+    if hasattr(image, "samples"):  # pymupdf.Pixmap
+        return image.stride * image.height
+    return 0
+
+
 class PageCache:
-    """页面缓存管理"""
+    """页面缓存管理
+
+    页面图像按总字节数淘汰（LRU），文本单词数据体积小、重建代价高，使用单独的按页数淘汰的缓存
+    """
     
-    def __init__(self, max_size=MAX_CACHE_SIZE):
+    def __init__(self, max_bytes=PAGE_CACHE_MAX_BYTES, max_text_pages=PAGE_WORDS_CACHE_SIZE):
         self.page_cache = OrderedDict()
-        self.text_cache = {}
-        self.max_size = max_size
+        self.text_cache = OrderedDict()
+        self.max_bytes = max_bytes
+        self.max_text_pages = max_text_pages
+        self.total_bytes = 0
+        self._page_bytes = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.text_hits = 0
+        self.text_misses = 0
     
     def get_page(self, page_num):
         """获取缓存的页面"""
         if page_num in self.page_cache:
             # 移动到末尾（LRU）
             self.page_cache.move_to_end(page_num)
+            self.hits += 1
             return self.page_cache[page_num]
+        self.misses += 1
         return None
     
     def get_text(self, page_num):
         """获取缓存的文本"""
-        return self.text_cache.get(page_num, [])
+        if page_num in self.text_cache:
+            self.text_cache.move_to_end(page_num)
+            self.text_hits += 1
+            return self.text_cache[page_num]
+        self.text_misses += 1
+        return WordBoxes()
     
     def set_page(self, page_num, pixmap, text_words):
         """设置页面缓存"""
+        self._remove_page(page_num)
+        size = image_size_in_bytes(pixmap)
         self.page_cache[page_num] = pixmap
-        self.text_cache[page_num] = text_words
+        self._page_bytes[page_num] = size
+        self.total_bytes += size
         
-        # 移动到末尾（LRU）
-        self.page_cache.move_to_end(page_num)
+        if text_words is not None:
+            self.text_cache[page_num] = text_words
+            self.text_cache.move_to_end(page_num)
         
         # 清理过老的缓存
         self._cleanup_old_cache()
     
+    def _remove_page(self, page_num):
+        """移除页面图像"""
+        if page_num in self.page_cache:
+            del self.page_cache[page_num]
+            self.total_bytes -= self._page_bytes.pop(page_num)
+    
     def _cleanup_old_cache(self):
-        """清理旧缓存"""
-        while len(self.page_cache) > self.max_size:
-            old_page = self.page_cache.popitem(last=False)[0]
-            if old_page in self.text_cache:
-                del self.text_cache[old_page]
+        """清理旧缓存，至少保留最近的一页图像"""
+        while self.total_bytes > self.max_bytes and len(self.page_cache) > 1:
+            old_page = next(iter(self.page_cache))
+            self._remove_page(old_page)
+            self.evictions += 1
+        while len(self.text_cache) > self.max_text_pages:
+            self.text_cache.popitem(last=False)
+    
+    def stats(self):
+        """缓存统计信息"""
+        lookups = self.hits + self.misses
+        return {
+            "pages": len(self.page_cache),
+            "bytes": self.total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "text_pages": len(self.text_cache),
+            "text_hits": self.text_hits,
+            "text_misses": self.text_misses,
+        }
     
     def clear(self):
         """清空缓存"""
         self.page_cache.clear()
         self.text_cache.clear()
+        self._page_bytes.clear()
+        self.total_bytes = 0
     
     def has_page(self, page_num):
         """检查是否有页面缓存"""
-        return page_num in self.page_cache 
\ No newline at end of file
+        return page_num in self.page_cache
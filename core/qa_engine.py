@@ -1,14 +1,21 @@
 """AI问答引擎模块"""
 
 import json
-import os
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional
 
 import requests
 from PyQt6.QtCore import QObject, QThread, pyqtSignal
 
+from core.history_compactor import ChatHistoryCompactor
+from core.context_window import context_window_registry
+from core.document_structure import load_document_sections
+from core.library_index import library_index
+from core.llm_client import get_service_endpoint, load_qa_config, ollama_chat_options
+from core.map_reduce_qa import build_reduce_context, map_document
 from utils.text_processor import text_processor
-from utils.config_path import get_config_file_path
+from utils.constants import MAP_REDUCE_CONCURRENCY, QA_CACHE_REPLAY_CHUNK
+from utils.document_text import DocumentText
+from utils.qa_cache import qa_cache
 
 
 class QAEngineThread(QThread):
@@ -17,36 +24,24 @@ class QAEngineThread(QThread):
     response_completed = pyqtSignal()  # 响应完成
     response_failed = pyqtSignal(str)  # 响应失败
     
-    def __init__(self, question: str, pdf_content: str, chat_history: list, parent=None):
+    def __init__(self, question: str, pdf_content, chat_history: list,
+                 use_cache: bool = True, history_summary: str = "", library_folder: str = "",
+                 parent=None):
         super().__init__(parent)
         self.question = question
-        self.pdf_content = pdf_content
+        self.pdf_content = DocumentText.ensure(pdf_content)
         self.chat_history = chat_history
+        self.history_summary = history_summary  # 更早对话的摘要
+        self.library_folder = library_folder  # 文档库模式下检索的文件夹
+        self.use_cache = use_cache
         self.config = self._load_qa_config()
         self._stop_requested = False
+        self._answer_parts = []  # 累积的回答片段，用于写入缓存
+        self._cache_key = None
         
     def _load_qa_config(self) -> Dict[str, Any]:
         """加载问答引擎配置"""
-        config_file = get_config_file_path()
-        default_config = {
-            "service": "关闭",
-            "envs": {}
-        }
-
-        try:
-            if os.path.exists(config_file):
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    full_config = json.load(f)
-                    if "qa_engine" in full_config:
-                        config = full_config["qa_engine"]
-                        # 如果有qa_settings，也加载进来
-                        if "qa_settings" in full_config:
-                            config["qa_settings"] = full_config["qa_settings"]
-                        return config
-        except Exception as e:
-            print(f"读取问答引擎配置失败: {e}")
-            
-        return default_config
+        return load_qa_config()
         
     def stop(self):
         """停止问答"""
@@ -56,6 +51,10 @@ class QAEngineThread(QThread):
         """执行问答"""
         try:
             service = self.config.get("service", "关闭")
+
+            # 命中答案缓存时直接回放
+            if service in ("silicon", "ollama", "自定义") and self._replay_cached_answer():
+                return
             
             if service == "silicon":
                 self._handle_silicon_qa()
@@ -69,6 +68,65 @@ class QAEngineThread(QThread):
                 
         except Exception as e:
             self.response_failed.emit(f"问答过程中出错: {str(e)}")
+
+    def _build_cache_key(self) -> str:
+        """构建当前问答的缓存键"""
+        qa_settings = self.config.get("qa_settings", {})
+        pages = self._parse_page_ranges(qa_settings.get("pages", "").strip())
+        return qa_cache.make_key(
+            document_hash=(
+                library_index.revision(self.library_folder) if self.library_folder
+                else self.pdf_content.content_hash
+            ),
+            pages=pages,
+            question=self.question,
+            chat_history=self._history_with_summary(),
+            provider=self.config.get("service", ""),
+            model=self._get_current_model(),
+            system_prompt=qa_settings.get("system_prompt", "").strip(),
+            mode="map_reduce" if self._map_reduce_enabled() and not self.library_folder else "",
+        )
+
+    def _map_reduce_enabled(self) -> bool:
+        """超长文档是否使用分块汇总模式"""
+        return self.config.get("qa_settings", {}).get("long_document_mode") == "map_reduce"
+
+    def _history_with_summary(self) -> List[Dict]:
+        """将历史摘要作为一轮对话并入历史，用于token预算和缓存键"""
+        if not self.history_summary:
+            return self.chat_history
+        return [{"question": "", "answer": self.history_summary}] + list(self.chat_history)
+
+    def _replay_cached_answer(self) -> bool:
+        """若缓存中已有相同问答，通过相同的信号回放答案"""
+        if not self.use_cache:
+            return False
+
+        self._cache_key = self._build_cache_key()
+        answer = qa_cache.get(self._cache_key)
+        if answer is None:
+            return False
+
+        print("命中问答缓存，直接回放答案")
+        for start in range(0, len(answer), QA_CACHE_REPLAY_CHUNK):
+            if self._stop_requested:
+                return True
+            self.response_chunk.emit(answer[start:start + QA_CACHE_REPLAY_CHUNK])
+        self.response_completed.emit()
+        return True
+
+    def _emit_chunk(self, content: str):
+        """发送回答片段并累积完整回答"""
+        self._answer_parts.append(content)
+        self.response_chunk.emit(content)
+
+    def _complete_response(self):
+        """回答完成：写入缓存并发送完成信号"""
+        if self._stop_requested:
+            return
+        if self.use_cache and self._cache_key and self._answer_parts:
+            qa_cache.set(self._cache_key, "".join(self._answer_parts))
+        self.response_completed.emit()
             
     def _handle_silicon_qa(self):
         """处理硅基流动问答"""
@@ -82,6 +140,8 @@ class QAEngineThread(QThread):
             
         # 构建消息
         messages = self._build_messages()
+        if messages is None:
+            return
         
         # 调用硅基流动API
         try:
@@ -120,12 +180,11 @@ class QAEngineThread(QThread):
                                 if 'delta' in choice and 'content' in choice['delta']:
                                     content = choice['delta']['content']
                                     if content:
-                                        self.response_chunk.emit(content)
+                                        self._emit_chunk(content)
                         except json.JSONDecodeError:
                             continue
                             
-            if not self._stop_requested:
-                self.response_completed.emit()
+            self._complete_response()
                 
         except requests.exceptions.RequestException as e:
             self.response_failed.emit(f"Silicon API调用失败: {str(e)}")
@@ -144,6 +203,8 @@ class QAEngineThread(QThread):
             
         # 构建消息
         messages = self._build_messages()
+        if messages is None:
+            return
         
         # 调用Ollama API
         try:
@@ -151,7 +212,8 @@ class QAEngineThread(QThread):
             data = {
                 "model": model,
                 "messages": messages,
-                "stream": True
+                "stream": True,
+                "options": ollama_chat_options(get_service_endpoint(self.config)),
             }
             
             response = requests.post(url, json=data, stream=True)
@@ -168,15 +230,14 @@ class QAEngineThread(QThread):
                         if 'message' in data and 'content' in data['message']:
                             content = data['message']['content']
                             if content:
-                                self.response_chunk.emit(content)
+                                self._emit_chunk(content)
                                 
                         if data.get('done', False):
                             break
                     except json.JSONDecodeError:
                         continue
                         
-            if not self._stop_requested:
-                self.response_completed.emit()
+            self._complete_response()
                 
         except requests.exceptions.RequestException as e:
             self.response_failed.emit(f"Ollama API调用失败: {str(e)}")
@@ -197,6 +258,8 @@ class QAEngineThread(QThread):
 
         # 构建消息
         messages = self._build_messages()
+        if messages is None:
+            return
 
         # 调用自定义API
         try:
@@ -236,20 +299,19 @@ class QAEngineThread(QThread):
                                 if 'delta' in choice and 'content' in choice['delta']:
                                     content = choice['delta']['content']
                                     if content:
-                                        self.response_chunk.emit(content)
+                                        self._emit_chunk(content)
                         except json.JSONDecodeError:
                             continue
             
-            if not self._stop_requested:
-                self.response_completed.emit()
+            self._complete_response()
 
         except requests.exceptions.RequestException as e:
             self.response_failed.emit(f"自定义问答API调用失败: {str(e)}")
         except Exception as e:
             self.response_failed.emit(f"自定义问答处理失败: {str(e)}")
             
-    def _build_messages(self) -> list:
-        """构建对话消息"""
+    def _build_messages(self) -> Optional[list]:
+        """构建对话消息，分块汇总阶段被停止时返回None（不再发送最终请求）"""
         messages = []
         
         # 获取当前模型名称
@@ -267,31 +329,58 @@ class QAEngineThread(QThread):
             system_prompt_template = "你是一个AI助手，请基于以下PDF文档内容回答用户的问题。\n\nPDF文档内容如下：\n{pdf_content}\n\n请基于上述内容回答问题。"
             print("警告：配置文件中未找到系统提示词，使用基础模板")
         
-        # 处理PDF内容：根据页面配置过滤
-        processed_pdf_content = self._process_pdf_content_by_pages(self.pdf_content, pages_config)
-        
         # 计算可用于PDF内容的token数量
         available_tokens = text_processor.calculate_available_tokens(
             model_name=model_name,
             system_prompt=system_prompt_template,
-            chat_history=self.chat_history,
+            chat_history=self._history_with_summary(),
             current_question=self.question,
-            max_response_tokens=2000
+            max_response_tokens=2000,
+            context_limit=self._get_context_limit(),
         )
         
-        # 智能截断PDF内容
-        final_pdf_content, was_truncated = text_processor.smart_truncate_pdf_content(
-            pdf_content=processed_pdf_content,
-            max_tokens=available_tokens,
-            question=self.question
-        )
-        
-        # 记录截断情况（仅在调试模式下输出）
-        if was_truncated:
-            text_processor.count_tokens(processed_pdf_content)
-            text_processor.count_tokens(final_pdf_content)
-            # 只在确实需要时进行调试输出
-            pass
+        map_reduce_used = False
+        if self.library_folder:
+            # 文档库模式：检索所有文档中与问题相关的文本块
+            final_pdf_content = library_index.build_context(
+                self.question, available_tokens, folder=self.library_folder
+            )
+        else:
+            # 处理PDF内容：根据页面配置过滤
+            processed_pdf_content = self._process_pdf_content_by_pages(self.pdf_content, pages_config)
+
+            if self._map_reduce_enabled() and processed_pdf_content.total_tokens > available_tokens:
+                # 分块汇总模式：并发提取各分块要点，再基于全部要点回答
+                map_reduce_used = True
+                partials = map_document(
+                    self.config, processed_pdf_content, self.question,
+                    chunk_tokens=available_tokens,
+                    concurrency=self._get_map_concurrency(),
+                    model=model_name,
+                    stop_check=lambda: self._stop_requested,
+                )
+                if self._stop_requested:
+                    return None
+                final_pdf_content = build_reduce_context(partials, available_tokens)
+            else:
+                # 智能截断PDF内容：优先按章节选择，去掉参考文献和页眉页脚
+                sections = []
+                if processed_pdf_content.total_tokens > available_tokens:
+                    sections = self._load_body_sections(processed_pdf_content)
+                if sections:
+                    final_pdf_content = text_processor.select_sections(
+                        sections, available_tokens, self.question
+                    )
+                    was_truncated = True
+                else:
+                    final_pdf_content, was_truncated = text_processor.smart_truncate_pdf_content(
+                        pdf_content=processed_pdf_content,
+                        max_tokens=available_tokens,
+                        question=self.question
+                    )
+
+                if was_truncated:
+                    print(f"PDF内容已截断: {processed_pdf_content.total_tokens} -> {available_tokens} tokens")
         
         # 构建最终的系统提示词
         system_prompt = system_prompt_template.format(pdf_content=final_pdf_content)
@@ -300,6 +389,26 @@ class QAEngineThread(QThread):
             "role": "system",
             "content": system_prompt
         })
+
+        if self.library_folder:
+            messages.append({
+                "role": "system",
+                "content": "上述内容检索自文档库中的多篇文档，每段以[来源：《文档名》第N页]标注出处。"
+                           "回答时请以（《文档名》第N页）的形式注明所依据的文档和页码。"
+            })
+        elif map_reduce_used:
+            messages.append({
+                "role": "system",
+                "content": "文档较长，上述内容是按页码范围分段提取的要点，每段以[第N-M页]标注范围。"
+                           "请综合各段要点回答问题，并注明所依据的页码范围。"
+            })
+
+        # 添加更早对话的摘要
+        if self.history_summary:
+            messages.append({
+                "role": "system",
+                "content": f"以下是此前对话的摘要，供理解上下文参考：\n{self.history_summary}"
+            })
         
         # 添加历史对话
         for chat in self.chat_history:
@@ -320,95 +429,36 @@ class QAEngineThread(QThread):
         
         return messages
     
-    def _process_pdf_content_by_pages(self, pdf_content: str, pages_config: str) -> str:
-        """根据页面配置处理PDF内容"""
-        if not pages_config or not pdf_content:
-            print(f"页面过滤跳过: pages_config='{pages_config}', pdf_content_len={len(pdf_content)}")
-            return pdf_content
-            
+    def _load_body_sections(self, document: DocumentText) -> List[Dict]:
+        """获取文档中位于选中页面内的正文章节（不含参考文献），无法分析结构时返回空列表"""
+        if not document.source_path:
+            return []
         try:
-            # 解析页面范围
-            page_numbers = self._parse_page_ranges(pages_config)
-            if not page_numbers:
-                print(f"页面范围解析为空: {pages_config}")
-                return pdf_content
-                
-            print(f"页面范围解析结果: {pages_config} -> {page_numbers} (0-based)")
-                
-            # 按页面分割PDF内容 - 使用更精确的分割方式
-            import re
-            # 匹配 "=== 第X页 ===" 模式，使用更严格的匹配
-            page_pattern = r'=== 第(\d+)页 ==='
-            page_matches = list(re.finditer(page_pattern, pdf_content))
-            
-            print(f"找到页面标记: {len(page_matches)} 个")
-            
-            # 验证页面标记的连续性和合理性
-            page_nums_found = []
-            for match in page_matches:
-                page_num = int(match.group(1))
-                page_nums_found.append(page_num)
-                print(f"  第{page_num}页 at position {match.start()}")
-            
-            # 检查页面是否连续且合理
-            if page_nums_found:
-                page_nums_found.sort()
-                max_page = max(page_nums_found)
-                min_page = min(page_nums_found)
-                expected_pages = list(range(min_page, max_page + 1))
-                
-                # 如果页面不连续或数量过多，可能是提取错误
-                if len(page_nums_found) != len(expected_pages):
-                    print(f"警告：页面标记不连续。找到页面: {page_nums_found}")
-                
-                # 如果最大页面号超过合理范围（比如超过100页），认为可能有错误
-                if max_page > 100:
-                    print(f"警告：检测到过多页面({max_page}页)，可能是文本提取错误")
-                    # 可以选择只使用前面合理的页面
-                    valid_matches = [m for m in page_matches if int(m.group(1)) <= 50]
-                    if valid_matches:
-                        page_matches = valid_matches
-                        print("已限制为前50页进行处理")
-            
-            if not page_matches:
-                # 如果没有页面标记，返回原内容
-                print("PDF内容没有页面标记，返回原内容")
-                return pdf_content
-                
-            # 提取指定页面的内容
-            selected_pages = []
-            
-            for i, match in enumerate(page_matches):
-                page_num = int(match.group(1))
-                page_index = page_num - 1  # 转换为0-based索引
-                
-                print(f"检查第{page_num}页 (索引{page_index}): {'包含' if page_index in page_numbers else '跳过'}")
-                
-                if page_index in page_numbers:
-                    # 确定页面内容的起始和结束位置
-                    start_pos = match.start()
-                    
-                    # 找到下一页的开始位置或文档结尾
-                    if i + 1 < len(page_matches):
-                        end_pos = page_matches[i + 1].start()
-                    else:
-                        end_pos = len(pdf_content)
-                    
-                    # 提取页面内容
-                    page_content = pdf_content[start_pos:end_pos].strip()
-                    if page_content:
-                        selected_pages.append(page_content)
-                        print(f"  已添加第{page_num}页内容: {len(page_content)} 字符")
-                        
-            result = "\n\n".join(selected_pages)
-            print(f"QA页面过滤完成: 原内容{len(pdf_content)}字符，配置页面{pages_config}，过滤后{len(result)}字符，选中{len(selected_pages)}个页面")
-            return result if result.strip() else pdf_content
-            
+            sections = load_document_sections(document.source_path)
         except Exception as e:
-            print(f"处理页面配置时出错: {e}")
-            import traceback
-            traceback.print_exc()
-            return pdf_content
+            print(f"分析文档结构失败: {e}")
+            return []
+        pages = set(document.page_numbers)
+        return [
+            section for section in sections
+            if section["kind"] != "references" and section["page_start"] in pages
+        ]
+
+    def _process_pdf_content_by_pages(self, pdf_content, pages_config: str) -> DocumentText:
+        """根据页面配置处理PDF内容，返回选中页面的DocumentText"""
+        document = DocumentText.ensure(pdf_content)
+        if not pages_config or not document:
+            return document
+
+        # 解析页面范围
+        page_numbers = self._parse_page_ranges(pages_config)
+        if not page_numbers:
+            print(f"页面范围解析为空: {pages_config}")
+            return document
+
+        selected = document.select_pages(page_numbers)
+        print(f"QA页面过滤完成: 共{document.page_count}页，配置页面{pages_config}，选中{selected.page_count}页")
+        return selected if selected else document
     
     def _parse_page_ranges(self, page_string: str) -> list:
         """将页面范围字符串转换为整数数组（0-based索引）
@@ -445,6 +495,21 @@ class QAEngineThread(QThread):
             print(f"页面范围解析错误: {e}")
             return []
     
+    def _get_map_concurrency(self) -> int:
+        """分块汇总模式下同时发送的请求数量"""
+        try:
+            return max(1, int(self.config.get("qa_settings", {}).get("map_concurrency", MAP_REDUCE_CONCURRENCY)))
+        except (TypeError, ValueError):
+            return MAP_REDUCE_CONCURRENCY
+
+    def _get_context_limit(self, allow_fetch: bool = True) -> int:
+        """获取当前模型的上下文窗口大小（优先使用服务端查询结果）"""
+        return context_window_registry.get_limit(
+            get_service_endpoint(self.config),
+            model_name=self._get_current_model(),
+            allow_fetch=allow_fetch,
+        )
+
     def _get_current_model(self) -> str:
         """获取当前使用的模型名称"""
         service = self.config.get("service", "关闭")
@@ -454,7 +519,7 @@ class QAEngineThread(QThread):
             return envs.get("SILICON_MODEL", "deepseek-chat")
         elif service == "ollama":
             return envs.get("OLLAMA_MODEL", "llama2")
-        elif service == "custom":
+        elif service == "自定义":
             return envs.get("CUSTOM_MODEL", "default")
         else:
             return "default"
@@ -466,15 +531,30 @@ class QAEngineManager(QObject):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.current_thread = None
+        self.history_compactor = ChatHistoryCompactor(parent=self)
         
-    def start_qa(self, question: str, pdf_content: str, chat_history: list,
-                 chunk_callback=None, completed_callback=None, failed_callback=None):
-        """开始问答"""
+    def start_qa(self, question: str, pdf_content, chat_history: list,
+                 chunk_callback=None, completed_callback=None, failed_callback=None,
+                 use_cache: bool = True, conversation_id: str = "", library_folder: str = ""):
+        """开始问答
+
+        相同文档、页面、问题、对话历史、服务商、模型和系统提示词的问答会命中答案缓存，
+        并通过相同的回调即时回放。指定conversation_id时，较早的对话会在后台压缩为摘要，
+        只保留最近若干轮原文。指定library_folder时，在该文件夹的文档库索引中检索上下文
+        """
         # 停止当前问答
         self.stop_current_qa()
+
+        # 压缩历史：摘要 + 最近对话（没有对话ID时只按轮数截取）
+        history_summary, chat_history_window = self.history_compactor.get_compacted_history(
+            conversation_id, chat_history
+        )
         
         # 创建新的问答线程
-        self.current_thread = QAEngineThread(question, pdf_content, chat_history, parent=self)
+        self.current_thread = QAEngineThread(
+            question, pdf_content, chat_history_window, use_cache=use_cache,
+            history_summary=history_summary, library_folder=library_folder, parent=self
+        )
         
         # 连接信号
         if chunk_callback:
@@ -483,6 +563,11 @@ class QAEngineManager(QObject):
             self.current_thread.response_completed.connect(completed_callback)
         if failed_callback:
             self.current_thread.response_failed.connect(failed_callback)
+        if conversation_id:
+            # 回调追加本轮对话后，再检查是否需要压缩历史
+            self.current_thread.response_completed.connect(
+                lambda: self.history_compactor.schedule_compaction(conversation_id, chat_history)
+            )
             
         # 启动问答
         self.current_thread.start()
@@ -506,4 +591,5 @@ class QAEngineManager(QObject):
         
     def cleanup(self):
         """清理资源"""
-        self.stop_current_qa() 
\ No newline at end of file
+        self.stop_current_qa()
+        self.history_compactor.cleanup() 
\ No newline at end of file
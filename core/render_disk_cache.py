@@ -0,0 +1,154 @@
+"""渲染结果磁盘缓存模块
+
+将渲染好的页面以zlib压缩的原始像素保存到磁盘，按(文件指纹, 页码, 渲染比例)索引，
+由后台线程写入并按总大小进行LRU淘汰；重新打开文档时直接读取，不必再次渲染
+"""
+
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Optional
+
+from PyQt6.QtGui import QImage
+
+from utils.config_path import get_cache_dir
+from utils.constants import (
+    RENDER_DISK_CACHE_COMPRESSION,
+    RENDER_DISK_CACHE_ENABLED,
+    RENDER_DISK_CACHE_MAX_BYTES,
+    RENDER_DISK_CACHE_QUEUE_SIZE,
+)
+
+# 文件头：标识, 宽, 高, 每行字节数, QImage格式
+_HEADER = struct.Struct("<4sIIII")
+_MAGIC = b"FPR1"
+
+
+class RenderDiskCache:
+    """渲染结果磁盘缓存"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = RENDER_DISK_CACHE_MAX_BYTES,
+                 enabled: bool = RENDER_DISK_CACHE_ENABLED):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self._queue = queue.Queue(maxsize=RENDER_DISK_CACHE_QUEUE_SIZE)
+        self._writer = None
+        self._writer_lock = threading.Lock()
+
+    def _get_cache_dir(self) -> str:
+        """获取缓存目录（延迟创建）"""
+        if not self.cache_dir:
+            self.cache_dir = get_cache_dir("render")
+        return self.cache_dir
+
+    @staticmethod
+    def make_key(fingerprint: str, page_num: int, scale: float) -> str:
+        """生成缓存键，渲染比例保留三位小数（常用缩放级别会重复命中）"""
+        return f"{fingerprint}.p{page_num}.s{round(scale * 1000)}"
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self._get_cache_dir(), f"{key}.rpx")
+
+    def get(self, key: str) -> Optional[QImage]:
+        """读取缓存的页面图像，不存在或损坏时返回None"""
+        if not self.enabled:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            magic, width, height, stride, image_format = _HEADER.unpack_from(data)
+            if magic != _MAGIC:
+                return None
+            pixels = zlib.decompress(data[_HEADER.size:])
+            if len(pixels) != stride * height:
+                return None
+            # 更新访问时间，用于LRU淘汰
+            now = time.time()
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, struct.error, zlib.error) as e:
+            print(f"读取渲染缓存失败: {e}")
+            return None
+
+        image = QImage(pixels, width, height, stride, QImage.Format(image_format))
+        image._source_samples = pixels  # QImage直接引用解压后的缓冲区
+        return image
+
+    def put(self, key: str, image: QImage):
+        """提交后台写入，写入队列已满时放弃本次写入"""
+        if not self.enabled or image is None or image.isNull():
+            return
+        self._ensure_writer()
+        try:
+            self._queue.put_nowait((key, image))
+        except queue.Full:
+            pass
+
+    def _ensure_writer(self):
+        """首次写入时启动后台写入线程"""
+        with self._writer_lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="RenderDiskCacheWriter", daemon=True)
+                self._writer.start()
+
+    def _write_loop(self):
+        """后台写入线程：压缩并写入页面图像"""
+        while True:
+            key, image = self._queue.get()
+            try:
+                self._write(key, image)
+            except OSError as e:
+                print(f"写入渲染缓存失败: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _write(self, key: str, image: QImage):
+        """压缩写入单个页面图像，并在超出容量时淘汰最久未使用的条目"""
+        pixels = image.constBits().asstring(image.sizeInBytes())
+        header = _HEADER.pack(_MAGIC, image.width(), image.height(), image.bytesPerLine(),
+                              image.format().value)
+        payload = header + zlib.compress(pixels, RENDER_DISK_CACHE_COMPRESSION)
+
+        path = self._entry_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(payload)
+        os.replace(tmp_path, path)
+        self._evict()
+
+    def flush(self):
+        """等待所有已提交的写入完成"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        with os.scandir(self._get_cache_dir()) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".rpx"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+# 全局实例
+render_disk_cache = RenderDiskCache()
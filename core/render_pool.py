@@ -0,0 +1,316 @@
+"""PDF页面渲染线程池
+
+固定数量的渲染线程从优先队列中取出请求，按与视口的距离由近到远渲染；
+同一页面（图块）的重复请求合并，滚动或缩放后超出预加载范围或缩放级别已变化的请求被取消，
+并统计从提交到完成的渲染延迟分位数；整页渲染结果可写入磁盘缓存
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+from PyQt6.QtCore import QObject, QThread, pyqtSignal
+
+from core.render_disk_cache import render_disk_cache
+from core.render_thread import calculate_render_params, extract_text_words, render_page_image
+from core.tile_renderer import render_preview, render_tile
+from utils.constants import PRELOAD_DISTANCE, RENDER_LATENCY_SAMPLES, RENDER_POOL_WORKERS
+
+# 同一距离下的渲染顺序：先预览，再整页，最后图块
+_KIND_ORDER = {"preview": 0, "page": 1, "tile": 2}
+
+
+class _RenderWorker(QThread):
+    """渲染线程，循环从线程池中取出请求执行，线程池关闭时退出"""
+
+    def __init__(self, pool, parent=None):
+        super().__init__(parent)
+        self.pool = pool
+
+    def run(self):
+        while True:
+            request = self.pool._take_request()
+            if request is None:
+                return
+            self.pool._execute(request)
+
+
+class RenderPool(QObject):
+    """固定大小的渲染线程池
+
+    请求的缩放标识（zoom_key）由调用方决定：整页渲染可以使用缩放比例，图块渲染使用缩放档位。
+    set_viewport传入当前的缩放标识后，其他缩放标识的请求（预览除外）会被取消
+    """
+    page_rendered = pyqtSignal(int, object, object)  # 页码, QImage, 单词（WordBoxes）
+    preview_rendered = pyqtSignal(int, object)  # 页码, 预览QImage
+    tile_rendered = pyqtSignal(int, int, int, int, object)  # 页码, 缩放档位, 图块x, 图块y, QImage
+
+    def __init__(self, num_workers: int = RENDER_POOL_WORKERS, parent=None):
+        super().__init__(parent)
+        self.num_workers = max(1, num_workers)
+        self._condition = threading.Condition()
+        self._heap = []  # (优先级, 序号, 请求键)
+        self._pending: Dict[Tuple, Dict] = {}
+        self._running: Dict[Tuple, Dict] = {}
+        self._sequence = itertools.count()
+        self._workers: List[_RenderWorker] = []
+        self._shutdown = False
+        self._viewport = (0, 0)
+        self._zoom_key = None
+
+        # 每个渲染线程从句柄池取得自己的文档句柄，渲染线程之间不共享文档对象
+        self._handles = None
+        self._fingerprint = None  # 文档指纹，用于渲染结果磁盘缓存
+
+        self._latencies = deque(maxlen=RENDER_LATENCY_SAMPLES)
+        self.merged_count = 0
+        self.cancelled_count = 0
+
+    def set_document(self, handles, fingerprint: Optional[str] = None):
+        """切换文档（PDFDocument.handles句柄池），取消所有请求
+
+        提供文件指纹时，整页渲染结果会写入磁盘缓存，下次打开同一文档时直接读取
+        """
+        with self._condition:
+            self._cancel_where(lambda request: True)
+            self._handles = handles
+            self._fingerprint = fingerprint
+
+    def request_page(self, page_num: int, zoom_factor: float, dpi: int,
+                     target_width: Optional[int] = None, high_quality: bool = True):
+        """请求渲染整页（同时提取文本单词）"""
+        self._submit({
+            "kind": "page",
+            "key": ("page", page_num, zoom_factor, target_width, high_quality),
+            "page_num": page_num,
+            "zoom_key": zoom_factor,
+            "zoom_factor": zoom_factor,
+            "dpi": max(dpi, 150),  # 最低DPI保证清晰度
+            "target_width": target_width,
+            "high_quality": high_quality,
+        })
+
+    def request_preview(self, page_num: int):
+        """请求渲染整页低分辨率预览（与缩放级别无关）"""
+        self._submit({
+            "kind": "preview",
+            "key": ("preview", page_num),
+            "page_num": page_num,
+            "zoom_key": None,
+        })
+
+    def request_tiles(self, page_num: int, bucket: int, tiles: List[Tuple[int, int]]):
+        """请求渲染图块，tiles按期望的渲染顺序排列"""
+        for order, (tx, ty) in enumerate(tiles):
+            self._submit({
+                "kind": "tile",
+                "key": ("tile", page_num, bucket, tx, ty),
+                "page_num": page_num,
+                "zoom_key": bucket,
+                "bucket": bucket,
+                "tile": (tx, ty),
+                "order": order,
+            })
+
+    def set_viewport(self, first_page: int, last_page: int, zoom_key=None):
+        """更新视口范围和当前缩放标识
+
+        超出预加载范围或缩放标识已变化的请求被取消，其余请求按新的视口距离重新排序
+        """
+        with self._condition:
+            self._viewport = (first_page, last_page)
+            self._zoom_key = zoom_key
+            self._cancel_where(self._is_outdated)
+
+            self._heap = []
+            for key, request in self._pending.items():
+                request["priority"] = self._priority(request)
+                self._heap.append((request["priority"], next(self._sequence), key))
+            heapq.heapify(self._heap)
+
+    def cancel_all(self):
+        """取消所有未完成的请求"""
+        with self._condition:
+            self._cancel_where(lambda request: True)
+
+    def latency_percentiles(self) -> Dict[str, float]:
+        """最近渲染请求从提交到完成的延迟分位数（毫秒）"""
+        with self._condition:
+            samples = sorted(self._latencies)
+        if not samples:
+            return {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
+
+        def percentile(p):
+            return samples[min(len(samples) - 1, int(p / 100 * len(samples)))] * 1000
+
+        return {
+            "count": len(samples),
+            "p50": percentile(50),
+            "p90": percentile(90),
+            "p99": percentile(99),
+        }
+
+    def shutdown(self):
+        """取消所有请求并等待渲染线程退出"""
+        with self._condition:
+            self._cancel_where(lambda request: True)
+            self._shutdown = True
+            self._condition.notify_all()
+        for worker in self._workers:
+            worker.wait()
+        self._workers.clear()
+
+    def _distance(self, page_num: int) -> int:
+        """页面与视口的距离（页数），视口内为0"""
+        first, last = self._viewport
+        if page_num < first:
+            return first - page_num
+        if page_num > last:
+            return page_num - last
+        return 0
+
+    def _priority(self, request: Dict) -> Tuple[int, int, int]:
+        """请求优先级，值越小越先渲染"""
+        return (self._distance(request["page_num"]), _KIND_ORDER[request["kind"]], request.get("order", 0))
+
+    def _is_outdated(self, request: Dict) -> bool:
+        """请求是否已超出预加载范围或缩放级别已变化"""
+        if self._distance(request["page_num"]) > PRELOAD_DISTANCE:
+            return True
+        return request["zoom_key"] is not None and request["zoom_key"] != self._zoom_key
+
+    def _cancel_where(self, predicate):
+        """取消满足条件的排队和正在执行的请求（调用方持有锁）"""
+        for key in [key for key, request in self._pending.items() if predicate(request)]:
+            self._pending.pop(key)["cancelled"] = True
+            self.cancelled_count += 1
+        for request in self._running.values():
+            if not request["cancelled"] and predicate(request):
+                request["cancelled"] = True
+                self.cancelled_count += 1
+        # 堆中已取消的条目在取出时跳过，队列清空时直接重置
+        if not self._pending:
+            self._heap = []
+
+    def _submit(self, request: Dict):
+        """提交请求，与排队或正在执行的相同请求合并"""
+        key = request["key"]
+        with self._condition:
+            if self._shutdown:
+                return
+            running = self._running.get(key)
+            if running is not None and not running["cancelled"]:
+                self.merged_count += 1
+                return
+
+            priority = self._priority(request)
+            existing = self._pending.get(key)
+            if existing is not None:
+                self.merged_count += 1
+                if priority >= existing["priority"]:
+                    return
+                existing["priority"] = priority
+            else:
+                request.update(priority=priority, cancelled=False, submitted=time.perf_counter())
+                self._pending[key] = request
+            heapq.heappush(self._heap, (priority, next(self._sequence), key))
+
+            self._ensure_workers()
+            self._condition.notify()
+
+    def _ensure_workers(self):
+        """首次提交请求时启动渲染线程（调用方持有锁）"""
+        if not self._workers:
+            for _ in range(self.num_workers):
+                worker = _RenderWorker(self)
+                worker.start()
+                self._workers.append(worker)
+
+    def _take_request(self) -> Optional[Dict]:
+        """取出优先级最高的请求，没有请求时等待，线程池关闭时返回None"""
+        with self._condition:
+            while True:
+                if self._shutdown:
+                    return None
+                while self._heap:
+                    priority, _, key = heapq.heappop(self._heap)
+                    request = self._pending.get(key)
+                    # 跳过已取消或已调整优先级的旧条目
+                    if request is None or request["priority"] != priority:
+                        continue
+                    del self._pending[key]
+                    self._running[key] = request
+                    return request
+                self._condition.wait()
+
+    def _execute(self, request: Dict):
+        """执行渲染请求并发送结果"""
+        page_num = request["page_num"]
+        result = None
+        with self._condition:
+            handles = self._handles
+            fingerprint = self._fingerprint
+        try:
+            if handles is not None and not request["cancelled"]:
+                with handles.acquire() as (doc, display_lists):
+                    result = self._render(doc, display_lists, request, fingerprint)
+        except Exception as e:
+            if not request["cancelled"]:
+                print(f"渲染页面 {page_num} 时出错: {e}")
+        finally:
+            with self._condition:
+                if self._running.get(request["key"]) is request:
+                    del self._running[request["key"]]
+                if result is not None and not request["cancelled"]:
+                    self._latencies.append(time.perf_counter() - request["submitted"])
+
+        if result is None or request["cancelled"]:
+            return
+        if request["kind"] == "page":
+            self.page_rendered.emit(page_num, *result)
+        elif request["kind"] == "preview":
+            self.preview_rendered.emit(page_num, result)
+        else:
+            self.tile_rendered.emit(page_num, request["bucket"], *request["tile"], result)
+
+    def _render(self, doc, display_lists, request: Dict, fingerprint: Optional[str] = None):
+        """使用当前线程的文档句柄按请求类型渲染，返回发送的结果
+
+        同一页面的显示列表在不同缩放比例和图块之间复用；整页渲染先查磁盘缓存
+        """
+        page = doc[request["page_num"]]
+        if request["kind"] == "page":
+            return self._render_page(doc, display_lists, page, request, fingerprint)
+        display_list = display_lists.get(doc, request["page_num"])
+        if request["kind"] == "preview":
+            return render_preview(page, display_list)
+        return render_tile(page, request["bucket"], *request["tile"], display_list)
+
+    def _render_page(self, doc, display_lists, page, request: Dict, fingerprint: Optional[str]):
+        """渲染整页并提取文本单词，命中磁盘缓存时跳过渲染"""
+        page_num = request["page_num"]
+        cache_key = None
+        image = None
+        display_list = None
+        if fingerprint and render_disk_cache.enabled:
+            _, render_scale = calculate_render_params(
+                page.rect, request["zoom_factor"], request["dpi"],
+                request["target_width"], request["high_quality"],
+            )
+            cache_key = render_disk_cache.make_key(fingerprint, page_num, render_scale)
+            image = render_disk_cache.get(cache_key)
+
+        if image is None:
+            display_list = display_lists.get(doc, page_num)
+            image = render_page_image(
+                page, request["zoom_factor"], request["dpi"],
+                request["target_width"], request["high_quality"], display_list,
+            )
+            if cache_key and not request["cancelled"]:
+                render_disk_cache.put(cache_key, image)
+
+        words = extract_text_words(page, page_num, lambda: request["cancelled"], display_list)
+        return image, words
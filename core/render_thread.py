@@ -1,18 +1,52 @@
 """PDF页面渲染线程"""
 
-import pymupdf 
+import pymupdf
 from PyQt6.QtCore import QMutex, QMutexLocker, Qt, QThread, pyqtSignal
-from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtGui import QImage
+
+from core.word_boxes import WordBoxes
+from utils.constants import MAX_PAGE_WIDTH
+
+
+# pymupdf像素图通道数对应的QImage格式
+_IMAGE_FORMATS = {
+    1: QImage.Format.Format_Grayscale8,
+    3: QImage.Format.Format_RGB888,
+    4: QImage.Format.Format_RGBA8888,
+}
+
+
+def pixmap_to_qimage(pix) -> QImage:
+    """将pymupdf像素图直接包装为QImage，不经过PNG编码和解码
+
+    QImage直接引用像素图的采样缓冲区（按stride逐行读取），
+    并通过属性持有像素图对象，保证缓冲区在QImage使用期间不被释放
+    """
+    image_format = _IMAGE_FORMATS.get(pix.n)
+    if image_format is None:
+        pix = pymupdf.Pixmap(pymupdf.csRGB, pix)
+        image_format = QImage.Format.Format_RGB888
+    samples = pix.samples_mv if hasattr(pix, "samples_mv") else pix.samples
+    image = QImage(samples, pix.width, pix.height, pix.stride, image_format)
+    image._source_pixmap = pix
+    image._source_samples = samples
+    return image
 
 
 class PageRenderThread(QThread):
-    """页面渲染线程"""
-    page_rendered = pyqtSignal(int, object, object)  # 页码, QPixmap, 文本列表
-    preview_rendered = pyqtSignal(int, object)  # 页码, 预览QPixmap
+    """页面渲染线程
+
+    渲染结果以QImage发送（QPixmap只能在GUI线程中创建），
+    接收方在GUI线程中通过QPixmap.fromImage转换。
+    handles为PDFDocument.handles句柄池，渲染时使用本线程取得的文档句柄及其显示列表缓存，
+    不与界面线程或其他渲染线程共用文档对象
+    """
+    page_rendered = pyqtSignal(int, object, object)  # 页码, QImage, 单词（WordBoxes）
+    preview_rendered = pyqtSignal(int, object)  # 页码, 预览QImage
     
-    def __init__(self, doc, page_num, zoom_factor, dpi, target_width=None, high_quality=True, parent=None):
+    def __init__(self, handles, page_num, zoom_factor, dpi, target_width=None, high_quality=True, parent=None):
         super().__init__(parent)
-        self.doc = doc
+        self.handles = handles
         self.page_num = page_num
         self.zoom_factor = zoom_factor
         self.dpi = max(dpi, 150)  # 最低DPI保证清晰度
@@ -34,160 +68,157 @@ class PageRenderThread(QThread):
     def run(self):
         """执行渲染"""
         try:
-            if self._should_stop():
-                return
-                
-            page = self.doc[self.page_num]
-            
-            if self._should_stop():
-                return
-            
-            # 如果不是高质量模式，先发送快速预览
-            if not self.high_quality:
-                self._render_preview(page)
-                if self._should_stop():
-                    return
-            
-            # 计算最佳渲染参数
-            render_dpi, render_scale = self._calculate_render_params(page)
-            
-            # 高质量渲染
-            mat = pymupdf .Matrix(render_scale, render_scale)
-            pix = page.get_pixmap(
-                matrix=mat, 
-                alpha=False,
-                colorspace=pymupdf .csRGB,  # 明确指定RGB色彩空间
-                annots=True,  # 包含注释
-                clip=None
-            )
-            
             if self._should_stop():
                 return
             
-            # 转换为QPixmap
-            pixmap = self._convert_to_pixmap(pix)
+            with self.handles.acquire() as (doc, display_lists):
+                result = self._render(doc, display_lists)
             
-            if self._should_stop():
-                return
-            
-            # 智能缩放到目标尺寸
-            pixmap = self._smart_scale_pixmap(pixmap)
-            
-            if self._should_stop():
-                return
-            
-            # 提取文本单词
-            text_words = self._extract_text_words(page)
-            
-            if not self._should_stop():
-                self.page_rendered.emit(self.page_num, pixmap, text_words)
+            if result is not None and not self._should_stop():
+                self.page_rendered.emit(self.page_num, *result)
                 
         except Exception as e:
             if not self._should_stop():
                 print(f"渲染页面 {self.page_num} 时出错: {e}")
     
-    def _render_preview(self, page):
+    def _render(self, doc, display_lists):
+        """使用本线程的文档句柄渲染页面，返回(QImage, 单词)，停止时返回None"""
+        page = doc[self.page_num]
+        display_list = display_lists.get(doc, self.page_num)
+        
+        if self._should_stop():
+            return None
+        
+        # 如果不是高质量模式，先发送快速预览
+        if not self.high_quality:
+            self._render_preview(page, display_list)
+            if self._should_stop():
+                return None
+        
+        # 按显示宽度渲染，直接包装像素缓冲区为QImage
+        image = render_page_image(
+            page, self.zoom_factor, self.dpi, self.target_width, self.high_quality, display_list
+        )
+        
+        if self._should_stop():
+            return None
+        
+        # 提取文本单词
+        return image, self._extract_text_words(page, display_list)
+    
+    def _render_preview(self, page, display_list=None):
         """渲染快速预览版本"""
         try:
             # 使用较低的DPI快速渲染
             preview_scale = self.zoom_factor * (96 / 72.0)  # 96 DPI
             mat = pymupdf .Matrix(preview_scale, preview_scale)
-            pix = page.get_pixmap(matrix=mat, alpha=False)
+            pix = get_page_pixmap(page, mat, display_list=display_list)
             
             if self._should_stop():
                 return
             
-            pixmap = self._convert_to_pixmap(pix)
-            pixmap = self._smart_scale_pixmap(pixmap)
+            image = self._smart_scale_image(pixmap_to_qimage(pix))
             
             if not self._should_stop():
-                self.preview_rendered.emit(self.page_num, pixmap)
+                self.preview_rendered.emit(self.page_num, image)
                 
         except Exception as e:
             print(f"渲染预览页面 {self.page_num} 时出错: {e}")
     
     def _calculate_render_params(self, page):
         """计算最佳渲染参数"""
-        page_rect = page.rect
-        
-        # 基础缩放
-        base_scale = self.zoom_factor
-        
-        # 如果指定了目标宽度，计算适配缩放
-        if self.target_width:
-            width_scale = self.target_width / page_rect.width
-            base_scale = width_scale
-        
-        # 高质量渲染使用更高的DPI
-        if self.high_quality:
-            # 根据缩放级别动态调整DPI
-            if base_scale <= 1.0:
-                render_dpi = max(self.dpi, 200)
-            elif base_scale <= 2.0:
-                render_dpi = max(self.dpi, 250)
-            else:
-                render_dpi = max(self.dpi, 300)
+        return calculate_render_params(
+            page.rect, self.zoom_factor, self.dpi, self.target_width, self.high_quality
+        )
+    
+    def _smart_scale_image(self, image):
+        """智能缩放图像"""
+        return scale_to_width(image, self.target_width)
+    
+    def _extract_text_words(self, page, display_list=None):
+        """提取文本单词"""
+        return extract_text_words(page, self.page_num, self._should_stop, display_list)
+
+
+def calculate_render_params(page_rect, zoom_factor, dpi, target_width=None, high_quality=True):
+    """计算最佳渲染参数，返回(渲染DPI, 渲染比例)"""
+    # 基础缩放
+    base_scale = zoom_factor
+    
+    # 如果指定了目标宽度，计算适配缩放
+    if target_width:
+        width_scale = target_width / page_rect.width
+        base_scale = width_scale
+    
+    # 高质量渲染使用更高的DPI
+    if high_quality:
+        # 根据缩放级别动态调整DPI
+        if base_scale <= 1.0:
+            render_dpi = max(dpi, 200)
+        elif base_scale <= 2.0:
+            render_dpi = max(dpi, 250)
         else:
-            render_dpi = self.dpi
-        
-        render_scale = base_scale * (render_dpi / 72.0)
-        
-        return render_dpi, render_scale
+            render_dpi = max(dpi, 300)
+    else:
+        render_dpi = dpi
     
-    def _convert_to_pixmap(self, pix):
-        """转换为QPixmap，使用优化的图像格式"""
-        try:
-            # 使用PNG格式获得更好的质量
-            img_data = pix.tobytes("png")
-            qimg = QImage.fromData(img_data)
-            
-            # 确保图像格式为RGB32以获得最佳性能
-            if qimg.format() != QImage.Format.Format_RGB32:
-                qimg = qimg.convertToFormat(QImage.Format.Format_RGB32)
-            
-            return QPixmap.fromImage(qimg)
-        except:  # noqa: E722
-            # 回退到PPM格式
-            img_data = pix.tobytes("ppm")
-            qimg = QImage.fromData(img_data)
-            return QPixmap.fromImage(qimg)
+    render_scale = base_scale * (render_dpi / 72.0)
+
+    # 直接按最终显示宽度渲染，不再渲染超出显示宽度的像素后缩小
+    max_width = target_width or MAX_PAGE_WIDTH
+    render_scale = min(render_scale, max_width / page_rect.width)
+
+    return render_dpi, render_scale
+
+
+def get_page_pixmap(page, matrix, clip=None, display_list=None):
+    """渲染页面像素图，提供显示列表时直接重放显示列表，不再解析页面内容流"""
+    if display_list is not None:
+        # 显示列表默认包含注释
+        return display_list.get_pixmap(matrix=matrix, colorspace=pymupdf.csRGB, alpha=False, clip=clip)
+    return page.get_pixmap(
+        matrix=matrix,
+        alpha=False,
+        colorspace=pymupdf.csRGB,  # 明确指定RGB色彩空间
+        annots=True,  # 包含注释
+        clip=clip,
+    )
+
+
+def render_page_image(page, zoom_factor, dpi, target_width=None, high_quality=True, display_list=None):
+    """按显示宽度渲染整页，返回QImage"""
+    _, render_scale = calculate_render_params(page.rect, zoom_factor, dpi, target_width, high_quality)
+    pix = get_page_pixmap(page, pymupdf.Matrix(render_scale, render_scale), display_list=display_list)
+    return scale_to_width(pixmap_to_qimage(pix), target_width)
+
+
+def scale_to_width(image, target_width=None):
+    """图像宽度超出目标宽度时平滑缩小"""
+    if not image or image.isNull():
+        return image
+
+    # 如果指定了目标宽度，优先使用
+    target_width = target_width or MAX_PAGE_WIDTH
     
-    def _smart_scale_pixmap(self, pixmap):
-        """智能缩放像素图"""
-        if not pixmap or pixmap.isNull():
-            return pixmap
-        
-        from utils.constants import MAX_PAGE_WIDTH
-        
-        # 如果指定了目标宽度，优先使用
-        target_width = self.target_width or MAX_PAGE_WIDTH
-        
-        if pixmap.width() > target_width:
-            # 使用高质量的平滑变换
-            scaled_pixmap = pixmap.scaledToWidth(
-                target_width, 
-                Qt.TransformationMode.SmoothTransformation
-            )
-            return scaled_pixmap
-        
-        return pixmap
+    if image.width() > target_width:
+        # 使用高质量的平滑变换（生成独立的图像，不再引用像素图缓冲区）
+        return image.scaledToWidth(
+            target_width, 
+            Qt.TransformationMode.SmoothTransformation
+        )
     
-    def _extract_text_words(self, page):
-        """提取文本单词"""
+    return image
+
+
+def extract_text_words(page, page_num, should_stop=None, display_list=None):
+    """提取页面文本单词（列式存储），提供显示列表时从显示列表生成文本页"""
+    if should_stop and should_stop():
+        return WordBoxes()
+    if display_list is not None:
+        textpage = display_list.get_textpage()
+        if not isinstance(textpage, pymupdf.TextPage):  # 部分pymupdf版本返回底层文本页对象
+            textpage = pymupdf.TextPage(textpage)
+        words = textpage.extractWORDS()
+    else:
         words = page.get_text("words")
-        text_words = []
-        
-        for word_info in words:
-            if self._should_stop():
-                break
-                
-            if len(word_info) >= 5:
-                x0, y0, x1, y1, text = word_info[:5]
-                if text.strip():
-                    text_words.append({
-                        'text': text,
-                        'bbox': (x0, y0, x1, y1),
-                        'page_num': self.page_num
-                    })
-        
-        return text_words 
\ No newline at end of file
+    return WordBoxes.from_pymupdf_words(words, page_num)
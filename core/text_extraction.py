@@ -0,0 +1,294 @@
+"""PDF文本提取模块"""
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, Iterator, List, Optional, Tuple
+
+import pymupdf
+from PyQt6.QtCore import QThread, pyqtSignal
+
+from core.page_text_worker import check_page_text, extract_page_range, extract_page_text
+from utils.constants import (
+    PARALLEL_EXTRACTION_BATCH_PAGES,
+    PARALLEL_EXTRACTION_MAX_WORKERS,
+    PARALLEL_EXTRACTION_MIN_PAGES,
+)
+from utils.document_text import DocumentText
+from utils.extracted_text_cache import extracted_text_cache
+from utils.file_fingerprint import file_fingerprint
+
+
+UNEXTRACTABLE_PAGE_PLACEHOLDER = "[页面内容为空或无法提取有效文本]"
+
+
+class ExtractionCancelled(Exception):
+    """文本提取被取消"""
+
+
+def _extraction_worker_count() -> int:
+    """并行提取使用的工作进程数量"""
+    return max(1, min(os.cpu_count() or 1, PARALLEL_EXTRACTION_MAX_WORKERS))
+
+
+# 并行提取共享的进程池（首次使用时创建，之后的文档复用同一组工作进程）
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """获取共享的进程池，不存在时创建"""
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # 使用spawn方式创建进程，避免在多线程的GUI进程中fork
+            _process_pool = ProcessPoolExecutor(
+                max_workers=_extraction_worker_count(),
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _process_pool
+
+
+def shutdown_process_pool():
+    """关闭共享的进程池（程序退出时调用），取消尚未开始的任务"""
+    global _process_pool
+    with _process_pool_lock:
+        pool, _process_pool = _process_pool, None
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _extract_pages_parallel(file_path: str, page_count: int,
+                            progress_callback: Optional[Callable[[int, int], None]] = None,
+                            stop_check: Optional[Callable[[], bool]] = None) -> List[Optional[str]]:
+    """使用共享进程池并行提取页面文本
+
+    页面按固定大小的区间分发给工作进程，每个区间在工作进程中打开一次文档，提取完即关闭；
+    结果按页面顺序依次收集，并随之报告进度。取消或出错时只撤销本次提交的剩余任务
+    """
+    print(f"使用{_extraction_worker_count()}个进程并行提取{page_count}页文本...")
+
+    pool = _get_process_pool()
+    pages = []
+    futures = []
+    try:
+        for start in range(0, page_count, PARALLEL_EXTRACTION_BATCH_PAGES):
+            futures.append(pool.submit(
+                extract_page_range, file_path, start,
+                min(start + PARALLEL_EXTRACTION_BATCH_PAGES, page_count)
+            ))
+        for future in futures:
+            if stop_check and stop_check():
+                raise ExtractionCancelled()
+            pages.extend(page_text for _, page_text in future.result())
+            if progress_callback:
+                progress_callback(len(pages), page_count)
+    except BrokenProcessPool:
+        # 工作进程异常退出后进程池不可再用，丢弃后下次重新创建
+        shutdown_process_pool()
+        raise
+    finally:
+        for future in futures:
+            future.cancel()
+    return pages
+
+
+def extract_document_text(file_path: str,
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          stop_check: Optional[Callable[[], bool]] = None) -> DocumentText:
+    """提取PDF文本内容
+
+    所有页面先用最快的pymupdf提取一遍；只有未通过质量检查的页面，
+    才依次交给pdfplumber、PyPDF2、pdfminer-six重试，每个备用后端只打开一次文档
+
+    Args:
+        file_path: PDF文件路径
+        progress_callback: 进度回调 (已提取页数, 总页数)
+        stop_check: 返回True时取消提取并抛出ExtractionCancelled
+
+    Returns:
+        DocumentText: 按页组织的文本，包含每页文本和token数量
+    """
+    if not file_path:
+        return DocumentText([])
+
+    try:
+        pages = _extract_with_pymupdf(file_path, progress_callback, stop_check)
+    except ExtractionCancelled:
+        raise
+    except Exception as e:
+        print(f"pymupdf无法处理该文件: {e}，所有页面交由备用方法提取")
+        page_count = _count_pages_fallback(file_path)
+        pages = [None] * page_count
+
+    for backend_name, backend in _FALLBACK_BACKENDS:
+        failed_pages = [i for i, page_text in enumerate(pages) if page_text is None]
+        if not failed_pages:
+            break
+        print(f"使用{backend_name}重新提取{len(failed_pages)}个页面...")
+        try:
+            for page_num, page_text in backend(file_path, failed_pages, stop_check):
+                pages[page_num] = check_page_text(page_text)
+        except ExtractionCancelled:
+            raise
+        except ImportError:
+            print(f"{backend_name}未安装")
+        except Exception as e:
+            print(f"{backend_name}处理失败: {e}")
+
+    failed_count = sum(1 for page_text in pages if page_text is None)
+    if failed_count:
+        print(f"{failed_count}个页面无法提取有效文本")
+    document = DocumentText([
+        page_text if page_text is not None else UNEXTRACTABLE_PAGE_PLACEHOLDER
+        for page_text in pages
+    ])
+    print(f"PDF文本提取完成，总长度: {len(document)} 字符，共{document.page_count}页")
+    return document
+
+
+def _extract_with_pymupdf(file_path: str,
+                          progress_callback: Optional[Callable[[int, int], None]] = None,
+                          stop_check: Optional[Callable[[], bool]] = None) -> List[Optional[str]]:
+    """使用pymupdf提取所有页面，未通过质量检查的页面为None"""
+    doc = pymupdf.open(file_path)
+    page_count = len(doc)
+
+    if page_count >= PARALLEL_EXTRACTION_MIN_PAGES and _extraction_worker_count() > 1:
+        doc.close()
+        return _extract_pages_parallel(file_path, page_count, progress_callback, stop_check)
+
+    pages = []
+    try:
+        for page_num in range(page_count):
+            if stop_check and stop_check():
+                raise ExtractionCancelled()
+            if progress_callback:
+                progress_callback(page_num + 1, page_count)
+            pages.append(extract_page_text(doc.load_page(page_num)))
+    finally:
+        doc.close()
+    return pages
+
+
+def _count_pages_fallback(file_path: str) -> int:
+    """pymupdf不可用时获取页数"""
+    try:
+        import pikepdf
+
+        with pikepdf.open(file_path) as pdf:
+            return len(pdf.pages)
+    except ImportError:
+        pass
+
+    import pdfminer.pdfpage
+
+    with open(file_path, "rb") as fp:
+        return sum(1 for _ in pdfminer.pdfpage.PDFPage.get_pages(fp))
+
+
+def _extract_with_pdfplumber(file_path: str, page_numbers: List[int],
+                             stop_check: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[int, str]]:
+    """使用pdfplumber提取指定页面（文档只打开一次）"""
+    import pdfplumber
+
+    with pdfplumber.open(file_path) as pdf:
+        for page_num in page_numbers:
+            if stop_check and stop_check():
+                raise ExtractionCancelled()
+            yield page_num, pdf.pages[page_num].extract_text()
+
+
+def _extract_with_pypdf2(file_path: str, page_numbers: List[int],
+                         stop_check: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[int, str]]:
+    """使用PyPDF2提取指定页面（文档只打开一次）"""
+    import PyPDF2
+
+    with open(file_path, "rb") as file:
+        reader = PyPDF2.PdfReader(file)
+        for page_num in page_numbers:
+            if stop_check and stop_check():
+                raise ExtractionCancelled()
+            yield page_num, reader.pages[page_num].extract_text()
+
+
+def _extract_with_pdfminer(file_path: str, page_numbers: List[int],
+                           stop_check: Optional[Callable[[], bool]] = None) -> Iterator[Tuple[int, str]]:
+    """使用pdfminer-six提取指定页面（一次解析，只布局分析选中的页面）"""
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LAParams, LTTextContainer
+
+    # extract_pages按页码升序依次产出选中的页面
+    selected = sorted(page_numbers)
+    layouts = extract_pages(file_path, page_numbers=selected, laparams=LAParams())
+    for page_num, layout in zip(selected, layouts):
+        if stop_check and stop_check():
+            raise ExtractionCancelled()
+        yield page_num, "".join(
+            element.get_text() for element in layout if isinstance(element, LTTextContainer)
+        )
+
+
+# 按速度排列的备用提取后端
+_FALLBACK_BACKENDS = [
+    ("pdfplumber", _extract_with_pdfplumber),
+    ("PyPDF2", _extract_with_pypdf2),
+    ("pdfminer-six", _extract_with_pdfminer),
+]
+
+
+def load_document_text(file_path: str,
+                       progress_callback: Optional[Callable[[int, int], None]] = None,
+                       stop_check: Optional[Callable[[], bool]] = None) -> DocumentText:
+    """获取PDF文本，优先读取按文件指纹缓存的提取结果
+
+    参数与extract_document_text相同，未命中缓存时提取并写入缓存
+    """
+    fingerprint = file_fingerprint(file_path)
+    document = extracted_text_cache.get(fingerprint)
+    if document is not None:
+        print(f"命中文本缓存: {os.path.basename(file_path)}，共{document.page_count}页")
+        if progress_callback:
+            progress_callback(document.page_count, document.page_count)
+    else:
+        document = extract_document_text(file_path, progress_callback, stop_check)
+        if document:
+            extracted_text_cache.set(fingerprint, document)
+    document.source_path = file_path
+    return document
+
+
+class TextExtractionThread(QThread):
+    """PDF文本后台提取线程"""
+    extraction_progress = pyqtSignal(str, int, int)  # 文件路径, 已提取页数, 总页数
+    extraction_completed = pyqtSignal(str, object)  # 文件路径, DocumentText
+    extraction_failed = pyqtSignal(str, str)  # 文件路径, 错误信息
+
+    def __init__(self, file_path: str, parent=None):
+        super().__init__(parent)
+        self.file_path = file_path
+        self._stop_requested = False
+
+    def stop(self):
+        """请求取消提取"""
+        self._stop_requested = True
+
+    def run(self):
+        """执行提取"""
+        try:
+            document = load_document_text(
+                self.file_path,
+                progress_callback=lambda current, total: self.extraction_progress.emit(
+                    self.file_path, current, total
+                ),
+                stop_check=lambda: self._stop_requested,
+            )
+            if not self._stop_requested:
+                self.extraction_completed.emit(self.file_path, document)
+        except ExtractionCancelled:
+            print(f"已取消文本提取: {self.file_path}")
+        except Exception as e:
+            if not self._stop_requested:
+                self.extraction_failed.emit(self.file_path, str(e))
@@ -1,19 +1,32 @@
 """文本选择功能"""
 
-from PyQt6.QtCore import QPoint, QRect, Qt
+from collections import defaultdict
+
+import numpy as np
+from PyQt6.QtCore import QPoint, Qt
 from PyQt6.QtGui import QCursor
 
+from core.word_boxes import WordBoxes
+from utils.constants import TEXT_GRID_CELL_SIZE
+
 
 class TextSelection:
-    """文本选择管理类"""
+    """文本选择管理类
+
+    可见单词为WordBoxes列式存储，selected_words为按阅读顺序排列的选中单词下标数组
+    """
     
     def __init__(self):
         self.selecting = False
         self.start_pos = QPoint()
         self.current_pos = QPoint()
         self.selected_text = ""
-        self.visible_words = []
-        self.selected_words = []
+        self.visible_words = WordBoxes()
+        self.selected_words = np.empty(0, dtype=np.intp)
+        
+        # 单词显示矩形的均匀网格索引：(列, 行) -> 单词序号列表，布局变化时重建
+        self._grid = defaultdict(list)
+        self._grid_dirty = False
         
         # 光标
         self.text_cursor = QCursor(Qt.CursorShape.IBeamCursor)
@@ -46,21 +59,53 @@ class TextSelection:
         return ""
     
     def clear_selection(self):
-        """清除选择"""
-        for word in self.visible_words:
-            word['selected'] = False
-        self.selected_words.clear()
+        """清除选择（只重置已选中的单词）"""
+        self.visible_words.selected[self.selected_words] = False
+        self.selected_words = np.empty(0, dtype=np.intp)
     
     def set_visible_words(self, words):
-        """设置可见单词"""
+        """设置可见单词（布局变化），网格索引在下次命中检测时重建"""
         self.visible_words = words
+        self.selected_words = np.flatnonzero(words.selected)
+        self._grid_dirty = True
+    
+    def invalidate_layout(self):
+        """单词的显示坐标被原地修改后调用，使网格索引重建"""
+        self._grid_dirty = True
+    
+    def _ensure_grid(self):
+        """按需重建网格索引"""
+        if not self._grid_dirty:
+            return
+        self._grid = defaultdict(list)
+        cells = np.floor(self.visible_words.display_rects / TEXT_GRID_CELL_SIZE).astype(np.int64)
+        for i, (left, top, right, bottom) in enumerate(cells.tolist()):
+            for column in range(left, right + 1):
+                for row in range(top, bottom + 1):
+                    self._grid[(column, row)].append(i)
+        self._grid_dirty = False
+    
+    def _candidates_in_rect(self, left, top, right, bottom):
+        """与矩形所在网格单元格重叠的单词下标（升序）；矩形覆盖的单元格多于单词数时返回None（检查全部单词）"""
+        self._ensure_grid()
+        columns = range(int(left // TEXT_GRID_CELL_SIZE), int(right // TEXT_GRID_CELL_SIZE) + 1)
+        rows = range(int(top // TEXT_GRID_CELL_SIZE), int(bottom // TEXT_GRID_CELL_SIZE) + 1)
+        if len(columns) * len(rows) > len(self.visible_words):
+            return None
+        candidates = set()
+        for column in columns:
+            for row in rows:
+                candidates.update(self._grid.get((column, row), ()))
+        return np.array(sorted(candidates), dtype=np.intp)
     
     def get_word_at_pos(self, pos):
-        """获取指定位置的单词"""
-        for i, word in enumerate(self.visible_words):
-            if word['display_rect'].contains(pos):
-                return i
-        return -1
+        """获取指定位置的单词（只检查该位置所在网格单元格中的单词）"""
+        self._ensure_grid()
+        cell = (pos.x() // TEXT_GRID_CELL_SIZE, pos.y() // TEXT_GRID_CELL_SIZE)
+        candidates = self._grid.get(cell)
+        if not candidates:
+            return -1
+        return self.visible_words.hit_test(pos.x(), pos.y(), candidates)
     
     def is_over_text(self, pos):
         """检查是否在文本上"""
@@ -73,60 +118,35 @@ class TextSelection:
         return self.arrow_cursor
     
     def _update_text_selection(self):
-        """更新文本选择"""
-        self.clear_selection()
-        
+        """更新文本选择（只检查选择框所在网格内的单词，对其显示坐标整体计算）"""
         start_x = min(self.start_pos.x(), self.current_pos.x())
         end_x = max(self.start_pos.x(), self.current_pos.x())
         start_y = min(self.start_pos.y(), self.current_pos.y())
         end_y = max(self.start_pos.y(), self.current_pos.y())
         
-        selected = []
-        for i, word in enumerate(self.visible_words):
-            rect = word['display_rect']
-            center_x, center_y = rect.center().x(), rect.center().y()
-            
-            if start_x <= center_x <= end_x and start_y <= center_y <= end_y:
-                selected.append((i, word['page_num'], center_y, center_x))
-        
-        # 如果没选中，使用相交检测
-        if not selected:
-            selection_rect = QRect(start_x, start_y, end_x - start_x, end_y - start_y)
-            for i, word in enumerate(self.visible_words):
-                if selection_rect.intersects(word['display_rect']):
-                    rect = word['display_rect']
-                    selected.append((i, word['page_num'], rect.center().y(), rect.center().x()))
+        candidates = self._candidates_in_rect(start_x, start_y, end_x, end_y)
+        new_selection = self.visible_words.select_in_rect(start_x, start_y, end_x, end_y, candidates)
         
-        # 排序并标记选中
-        selected.sort(key=lambda x: (x[1], x[2], x[3]))
-        for word_idx, _, _, _ in selected:
-            self.visible_words[word_idx]['selected'] = True
-            self.selected_words.append(word_idx)
+        # 标记选中
+        self.visible_words.selected[self.selected_words] = False
+        self.visible_words.selected[new_selection] = True
+        self.selected_words = new_selection
     
     def _extract_selected_text(self):
         """提取选中的文本"""
-        if not self.selected_words:
+        if not len(self.selected_words):
             return ""
             
         texts = []
         last_y, last_page = None, None
         
-        # 获取选中文本数据
-        selected_data = []
-        for idx in self.selected_words:
-            word = self.visible_words[idx]
-            rect = word['display_rect']
-            selected_data.append((
-                word['page_num'], 
-                rect.center().y(), 
-                rect.center().x(), 
-                word['text']
-            ))
-        
-        selected_data.sort()
+        # 选中单词已按(页码, 行, 列)排序
+        _, center_y = self.visible_words.centers(self.selected_words)
+        page_nums = self.visible_words.page_nums[self.selected_words]
         
         # 组合文本
-        for page_num, y, x, text in selected_data:
+        for idx, page_num, y in zip(self.selected_words.tolist(), page_nums.tolist(), center_y.tolist()):
+            text = self.visible_words.texts[idx]
             if last_page is not None and page_num != last_page:
                 texts.append(f'\n--- 第 {page_num + 1} 页 ---\n')
             elif last_y is not None and abs(y - last_y) > 15:
@@ -138,4 +158,4 @@ class TextSelection:
             last_y, last_page = y, page_num
         
         self.selected_text = ''.join(texts).strip()
-        return self.selected_text 
\ No newline at end of file
+        return self.selected_text
@@ -0,0 +1,185 @@
+"""PDF页面缩略图生成与磁盘缓存
+
+缩略图在低优先级后台线程中逐页生成，全部完成后按文件指纹保存为一张JPEG拼图和一个JSON索引，
+再次打开同一文档时直接从拼图中切出所有缩略图
+"""
+
+import json
+import os
+import threading
+import time
+from typing import List, Optional
+
+import pymupdf
+from PyQt6.QtCore import QMutex, QMutexLocker, QRect, QThread, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QPainter
+
+from core.render_thread import pixmap_to_qimage
+from utils.config_path import get_cache_dir
+from utils.constants import (
+    THUMBNAIL_ATLAS_COLUMNS,
+    THUMBNAIL_ATLAS_QUALITY,
+    THUMBNAIL_CACHE_MAX_BYTES,
+    THUMBNAIL_WIDTH,
+    THUMBNAIL_YIELD_MS,
+)
+
+# 缩略图尺寸或拼图格式变化时递增，使旧缓存自动失效
+THUMBNAIL_ATLAS_VERSION = 1
+
+_cache_lock = threading.Lock()
+
+
+def _atlas_paths(fingerprint: str):
+    """拼图图像和索引文件的路径"""
+    base = os.path.join(get_cache_dir("thumbnails"), f"{fingerprint}.v{THUMBNAIL_ATLAS_VERSION}")
+    return f"{base}.jpg", f"{base}.json"
+
+
+def render_thumbnail(page) -> QImage:
+    """按缩略图宽度渲染页面"""
+    scale = THUMBNAIL_WIDTH / page.rect.width
+    pix = page.get_pixmap(matrix=pymupdf.Matrix(scale, scale), alpha=False)
+    return pixmap_to_qimage(pix)
+
+
+def save_thumbnail_atlas(fingerprint: str, thumbnails: List[QImage]):
+    """将所有缩略图拼成一张图像保存，索引中记录每页缩略图的尺寸"""
+    if not thumbnails:
+        return
+    columns = min(THUMBNAIL_ATLAS_COLUMNS, len(thumbnails))
+    rows = (len(thumbnails) + columns - 1) // columns
+    cell_height = max(image.height() for image in thumbnails)
+
+    atlas = QImage(columns * THUMBNAIL_WIDTH, rows * cell_height, QImage.Format.Format_RGB888)
+    atlas.fill(QColor("white"))
+    painter = QPainter(atlas)
+    for i, image in enumerate(thumbnails):
+        painter.drawImage((i % columns) * THUMBNAIL_WIDTH, (i // columns) * cell_height, image)
+    painter.end()
+
+    image_path, index_path = _atlas_paths(fingerprint)
+    index = {
+        "columns": columns,
+        "cell_width": THUMBNAIL_WIDTH,
+        "cell_height": cell_height,
+        "sizes": [[image.width(), image.height()] for image in thumbnails],
+    }
+    try:
+        with _cache_lock:
+            tmp_path = f"{image_path}.{os.getpid()}.tmp.jpg"
+            if not atlas.save(tmp_path, "JPG", THUMBNAIL_ATLAS_QUALITY):
+                raise OSError("无法写入缩略图拼图")
+            os.replace(tmp_path, image_path)
+            with open(f"{index_path}.tmp", "w", encoding="utf-8") as f:
+                json.dump(index, f)
+            os.replace(f"{index_path}.tmp", index_path)
+            _evict()
+    except OSError as e:
+        print(f"保存缩略图缓存失败: {e}")
+
+
+def load_thumbnail_atlas(fingerprint: str, page_count: int) -> Optional[List[QImage]]:
+    """从磁盘缓存读取所有缩略图，不存在、损坏或页数不符时返回None"""
+    image_path, index_path = _atlas_paths(fingerprint)
+    try:
+        with open(index_path, "r", encoding="utf-8") as f:
+            index = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        print(f"读取缩略图缓存失败: {e}")
+        return None
+
+    sizes = index.get("sizes", [])
+    atlas = QImage(image_path)
+    if len(sizes) != page_count or atlas.isNull():
+        return None
+
+    now = time.time()
+    for path in (image_path, index_path):
+        try:
+            os.utime(path, (now, now))
+        except OSError:
+            pass
+
+    columns = index["columns"]
+    cell_width, cell_height = index["cell_width"], index["cell_height"]
+    return [
+        atlas.copy(QRect((i % columns) * cell_width, (i // columns) * cell_height, width, height))
+        for i, (width, height) in enumerate(sizes)
+    ]
+
+
+def _evict():
+    """按最近访问时间淘汰拼图，直到总大小不超过上限（调用方持有锁）"""
+    entries = {}
+    total = 0
+    with os.scandir(get_cache_dir("thumbnails")) as it:
+        for entry in it:
+            if entry.is_file() and entry.name.endswith((".jpg", ".json")):
+                stat = entry.stat()
+                key = entry.name.rsplit(".", 1)[0]
+                mtime, size, paths = entries.get(key, (0, 0, []))
+                entries[key] = (max(mtime, stat.st_mtime), size + stat.st_size, paths + [entry.path])
+                total += stat.st_size
+    if total <= THUMBNAIL_CACHE_MAX_BYTES:
+        return
+    for _, size, paths in sorted(entries.values()):
+        for path in paths:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= size
+        if total <= THUMBNAIL_CACHE_MAX_BYTES:
+            break
+
+
+class ThumbnailThread(QThread):
+    """缩略图生成线程
+
+    使用文档句柄池中本线程自己的文档句柄逐页渲染，每页之后短暂让出CPU；
+    应以QThread.Priority.LowestPriority启动，全部完成后写入磁盘缓存
+    """
+    thumbnail_ready = pyqtSignal(int, object)  # 页码, QImage
+    thumbnails_finished = pyqtSignal()
+
+    def __init__(self, handles, fingerprint: str, page_count: int, parent=None):
+        super().__init__(parent)
+        self.handles = handles
+        self.fingerprint = fingerprint
+        self.page_count = page_count
+        self._stop_mutex = QMutex()
+        self._stop_requested = False
+
+    def stop(self):
+        """请求停止线程"""
+        with QMutexLocker(self._stop_mutex):
+            self._stop_requested = True
+
+    def _should_stop(self):
+        """检查是否应该停止"""
+        with QMutexLocker(self._stop_mutex):
+            return self._stop_requested
+
+    def run(self):
+        """逐页生成缩略图"""
+        thumbnails = []
+        try:
+            for page_num in range(self.page_count):
+                if self._should_stop():
+                    return
+                # 每页单独获取句柄，关闭文档时不必等待整个生成过程
+                with self.handles.acquire() as (doc, _):
+                    image = render_thumbnail(doc[page_num])
+                thumbnails.append(image)
+                self.thumbnail_ready.emit(page_num, image)
+                self.msleep(THUMBNAIL_YIELD_MS)
+
+            if not self._should_stop():
+                save_thumbnail_atlas(self.fingerprint, thumbnails)
+                self.thumbnails_finished.emit()
+        except Exception as e:
+            if not self._should_stop():
+                print(f"生成缩略图时出错: {e}")
@@ -0,0 +1,194 @@
+"""PDF页面分块渲染
+
+按视口只渲染可见区域的图块：图块使用pymupdf的clip矩形在显示比例下直接渲染，
+并按(页码, 缩放档位, 图块坐标)缓存；清晰图块渲染完成前，用整页低分辨率预览填充
+"""
+
+import math
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+import pymupdf
+from PyQt6.QtCore import QMutex, QMutexLocker, QRectF, QThread, pyqtSignal
+
+from core.render_thread import get_page_pixmap, pixmap_to_qimage
+from utils.constants import (
+    LOW_RES_PREVIEW_SCALE,
+    TILE_CACHE_MAX_BYTES,
+    TILE_SIZE,
+    ZOOM_BUCKETS_PER_OCTAVE,
+)
+
+
+def zoom_bucket(scale: float) -> int:
+    """将显示比例量化为缩放档位（每翻倍ZOOM_BUCKETS_PER_OCTAVE档）"""
+    return round(math.log2(max(scale, 1e-3)) * ZOOM_BUCKETS_PER_OCTAVE)
+
+
+def bucket_scale(bucket: int) -> float:
+    """缩放档位对应的渲染比例"""
+    return 2 ** (bucket / ZOOM_BUCKETS_PER_OCTAVE)
+
+
+# 整页低分辨率预览使用的档位和图块坐标
+LOW_RES_BUCKET = zoom_bucket(LOW_RES_PREVIEW_SCALE)
+PREVIEW_TILE = (-1, -1)
+
+
+def visible_tiles(page_width: float, page_height: float, scale: float,
+                  viewport: Tuple[float, float, float, float]) -> List[Tuple[int, int]]:
+    """计算视口内的图块坐标，按与视口中心的距离排序
+
+    Args:
+        page_width, page_height: 页面尺寸（点）
+        scale: 渲染比例（像素/点）
+        viewport: 视口在页面像素坐标系中的范围 (x0, y0, x1, y1)
+    """
+    columns = max(1, math.ceil(page_width * scale / TILE_SIZE))
+    rows = max(1, math.ceil(page_height * scale / TILE_SIZE))
+    x0, y0, x1, y1 = viewport
+    tx0, tx1 = max(0, int(x0 // TILE_SIZE)), min(columns - 1, int(x1 // TILE_SIZE))
+    ty0, ty1 = max(0, int(y0 // TILE_SIZE)), min(rows - 1, int(y1 // TILE_SIZE))
+    center_x, center_y = (x0 + x1) / 2, (y0 + y1) / 2
+
+    tiles = [(tx, ty) for ty in range(ty0, ty1 + 1) for tx in range(tx0, tx1 + 1)]
+    tiles.sort(key=lambda tile: ((tile[0] + 0.5) * TILE_SIZE - center_x) ** 2
+               + ((tile[1] + 0.5) * TILE_SIZE - center_y) ** 2)
+    return tiles
+
+
+def tile_clip(page_rect, scale: float, tx: int, ty: int):
+    """图块在页面坐标（点）中的裁剪矩形"""
+    size = TILE_SIZE / scale
+    x0 = page_rect.x0 + tx * size
+    y0 = page_rect.y0 + ty * size
+    return pymupdf.Rect(x0, y0, min(x0 + size, page_rect.x1), min(y0 + size, page_rect.y1))
+
+
+class TileCache:
+    """图块缓存，按(页码, 缩放档位, 图块x, 图块y)索引，按总字节数LRU淘汰"""
+
+    def __init__(self, max_bytes: int = TILE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._tiles = OrderedDict()
+
+    def get(self, page_num: int, bucket: int, tx: int, ty: int):
+        """获取缓存的图块图像"""
+        key = (page_num, bucket, tx, ty)
+        image = self._tiles.get(key)
+        if image is not None:
+            self._tiles.move_to_end(key)
+        return image
+
+    def put(self, page_num: int, bucket: int, tx: int, ty: int, image):
+        """缓存图块图像"""
+        key = (page_num, bucket, tx, ty)
+        old = self._tiles.pop(key, None)
+        if old is not None:
+            self.total_bytes -= old.sizeInBytes()
+        self._tiles[key] = image
+        self.total_bytes += image.sizeInBytes()
+        while self.total_bytes > self.max_bytes and len(self._tiles) > 1:
+            _, evicted = self._tiles.popitem(last=False)
+            self.total_bytes -= evicted.sizeInBytes()
+
+    def get_preview(self, page_num: int):
+        """获取整页低分辨率预览"""
+        return self.get(page_num, LOW_RES_BUCKET, *PREVIEW_TILE)
+
+    def put_preview(self, page_num: int, image):
+        """缓存整页低分辨率预览"""
+        self.put(page_num, LOW_RES_BUCKET, *PREVIEW_TILE, image)
+
+    def get_fallback(self, page_num: int, page_rect, scale: float, tx: int, ty: int):
+        """清晰图块尚未渲染时，返回低分辨率预览及图块对应的源区域
+
+        Returns:
+            (预览图像, 源矩形QRectF)，没有预览时返回None
+        """
+        preview = self.get_preview(page_num)
+        if preview is None:
+            return None
+        clip = tile_clip(page_rect, scale, tx, ty)
+        ratio = preview.width() / page_rect.width
+        return preview, QRectF(
+            (clip.x0 - page_rect.x0) * ratio, (clip.y0 - page_rect.y0) * ratio,
+            clip.width * ratio, clip.height * ratio,
+        )
+
+    def remove_page(self, page_num: int):
+        """移除指定页面的所有图块"""
+        for key in [key for key in self._tiles if key[0] == page_num]:
+            self.total_bytes -= self._tiles.pop(key).sizeInBytes()
+
+    def clear(self):
+        """清空缓存"""
+        self._tiles.clear()
+        self.total_bytes = 0
+
+
+class TileRenderThread(QThread):
+    """图块渲染线程：先渲染整页低分辨率预览（如需要），再按顺序渲染清晰图块
+
+    handles为PDFDocument.handles句柄池，使用本线程取得的文档句柄及其显示列表缓存渲染
+    """
+    preview_rendered = pyqtSignal(int, object)  # 页码, 预览QImage
+    tile_rendered = pyqtSignal(int, int, int, int, object)  # 页码, 缩放档位, 图块x, 图块y, QImage
+
+    def __init__(self, handles, page_num: int, bucket: int, tiles: List[Tuple[int, int]],
+                 need_preview: bool = True, parent=None):
+        super().__init__(parent)
+        self.handles = handles
+        self.page_num = page_num
+        self.bucket = bucket
+        self.tiles = tiles
+        self.need_preview = need_preview
+        self._stop_mutex = QMutex()
+        self._stop_requested = False
+
+    def stop(self):
+        """请求停止线程"""
+        with QMutexLocker(self._stop_mutex):
+            self._stop_requested = True
+
+    def _should_stop(self):
+        """检查是否应该停止"""
+        with QMutexLocker(self._stop_mutex):
+            return self._stop_requested
+
+    def run(self):
+        """执行渲染"""
+        try:
+            with self.handles.acquire() as (doc, display_lists):
+                page = doc[self.page_num]
+                display_list = display_lists.get(doc, self.page_num)
+                if self.need_preview and not self._should_stop():
+                    self.preview_rendered.emit(self.page_num, render_preview(page, display_list))
+
+                for tx, ty in self.tiles:
+                    if self._should_stop():
+                        return
+                    image = render_tile(page, self.bucket, tx, ty, display_list)
+                    if image is not None and not self._should_stop():
+                        self.tile_rendered.emit(self.page_num, self.bucket, tx, ty, image)
+        except Exception as e:
+            if not self._should_stop():
+                print(f"渲染页面 {self.page_num} 图块时出错: {e}")
+
+
+def render_preview(page, display_list=None):
+    """渲染整页低分辨率预览"""
+    scale = bucket_scale(LOW_RES_BUCKET)
+    pix = get_page_pixmap(page, pymupdf.Matrix(scale, scale), display_list=display_list)
+    return pixmap_to_qimage(pix)
+
+
+def render_tile(page, bucket: int, tx: int, ty: int, display_list=None) -> Optional[object]:
+    """按缩放档位渲染单个图块，图块超出页面时返回None"""
+    scale = bucket_scale(bucket)
+    clip = tile_clip(page.rect, scale, tx, ty)
+    if clip.is_empty:
+        return None
+    pix = get_page_pixmap(page, pymupdf.Matrix(scale, scale), clip=clip, display_list=display_list)
+    return pixmap_to_qimage(pix)
@@ -0,0 +1,103 @@
+"""页面单词的列式存储
+
+单词框坐标、页码和选中状态分别存放在NumPy数组中，文本存放在共享列表中，
+显示坐标变换、命中检测和框选都按数组整体计算，不再为每个单词创建字典和QRect
+"""
+
+from typing import Iterable, List, Optional
+
+import numpy as np
+
+
+class WordBoxes:
+    """单词列式存储
+
+    bboxes为PDF坐标（点）的(x0, y0, x1, y1)，display_rects为显示坐标（像素）的(x0, y0, x1, y1)，
+    selected为选中掩码，下标与texts一一对应
+    """
+
+    def __init__(self, texts: Optional[List[str]] = None, bboxes=None, page_nums=None):
+        self.texts = list(texts or [])
+        count = len(self.texts)
+        self.bboxes = np.asarray(bboxes if count else [], dtype=np.float32).reshape(count, 4)
+        self.page_nums = np.asarray(page_nums if count else [], dtype=np.int32).reshape(count)
+        self.display_rects = self.bboxes.copy()
+        self.selected = np.zeros(count, dtype=bool)
+
+    @classmethod
+    def from_pymupdf_words(cls, words: Iterable, page_num: int) -> "WordBoxes":
+        """从pymupdf的单词元组(x0, y0, x1, y1, text, ...)创建，忽略空白单词"""
+        texts, bboxes = [], []
+        for word_info in words:
+            if len(word_info) >= 5 and word_info[4].strip():
+                texts.append(word_info[4])
+                bboxes.append(word_info[:4])
+        return cls(texts, bboxes, [page_num] * len(texts))
+
+    @classmethod
+    def concat(cls, parts: List["WordBoxes"]) -> "WordBoxes":
+        """合并多个页面的单词（保留显示坐标和选中状态）"""
+        parts = [part for part in parts if len(part)]
+        if not parts:
+            return cls()
+        merged = cls()
+        merged.texts = [text for part in parts for text in part.texts]
+        merged.bboxes = np.concatenate([part.bboxes for part in parts])
+        merged.page_nums = np.concatenate([part.page_nums for part in parts])
+        merged.display_rects = np.concatenate([part.display_rects for part in parts])
+        merged.selected = np.concatenate([part.selected for part in parts])
+        return merged
+
+    def __len__(self):
+        return len(self.texts)
+
+    @property
+    def nbytes(self) -> int:
+        """数组部分占用的字节数"""
+        return self.bboxes.nbytes + self.page_nums.nbytes + self.display_rects.nbytes + self.selected.nbytes
+
+    def set_display_transform(self, scale: float, offset_x: float, offset_y: float,
+                              page_num: Optional[int] = None):
+        """按缩放比例和偏移计算显示坐标，指定page_num时只变换该页的单词"""
+        transformed = self.bboxes * scale + np.array([offset_x, offset_y, offset_x, offset_y], dtype=np.float32)
+        if page_num is None:
+            self.display_rects = transformed
+        else:
+            mask = self.page_nums == page_num
+            self.display_rects[mask] = transformed[mask]
+
+    def centers(self, indices=None):
+        """单词显示矩形的中心点坐标 (x数组, y数组)"""
+        rects = self.display_rects if indices is None else self.display_rects[indices]
+        return (rects[:, 0] + rects[:, 2]) / 2, (rects[:, 1] + rects[:, 3]) / 2
+
+    def hit_test(self, x: float, y: float, indices=None) -> int:
+        """返回包含点(x, y)的第一个单词下标，indices限定检查范围，没有时返回-1"""
+        if indices is None:
+            indices = np.arange(len(self))
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+        if not len(indices):
+            return -1
+        rects = self.display_rects[indices]
+        hits = np.flatnonzero(
+            (rects[:, 0] <= x) & (x <= rects[:, 2]) & (rects[:, 1] <= y) & (y <= rects[:, 3])
+        )
+        return int(indices[hits[0]]) if len(hits) else -1
+
+    def select_in_rect(self, x0: float, y0: float, x1: float, y1: float, indices=None) -> np.ndarray:
+        """返回中心点在矩形内的单词下标；没有时改用与矩形相交的单词，按(页码, 行, 列)排序
+
+        indices限定检查范围（如网格索引中与矩形重叠的候选单词）
+        """
+        if indices is None:
+            indices = np.arange(len(self))
+        else:
+            indices = np.asarray(indices, dtype=np.intp)
+        center_x, center_y = self.centers(indices)
+        mask = (x0 <= center_x) & (center_x <= x1) & (y0 <= center_y) & (center_y <= y1)
+        if not mask.any():
+            rects = self.display_rects[indices]
+            mask = (rects[:, 0] <= x1) & (x0 <= rects[:, 2]) & (rects[:, 1] <= y1) & (y0 <= rects[:, 3])
+        order = np.lexsort((center_x[mask], center_y[mask], self.page_nums[indices[mask]]))
+        return indices[mask][order]
@@ -277,14 +277,17 @@ def _load_pdf2zh_modules():
         _PDF2ZH_LOADED = True  # 标记为已尝试加载，避免重复尝试
 
 
-# 预加载模块
-_load_pdf2zh_modules()
+def _is_worker_process():
+    """是否为多进程工作进程（如并行文本提取），工作进程无需预加载pdf2zh"""
+    return (
+        multiprocessing.parent_process() is not None
+        or "--multiprocessing-fork" in sys.argv
+    )
 
-# 安全地导入PyQt6
-from PyQt6.QtWebEngineCore import QWebEngineProfile  # noqa: E402
-from PyQt6.QtWidgets import QApplication  # noqa: E402
 
-from ui.main_window import MainWindow  # noqa: E402
+# 预加载模块
+if not _is_worker_process():
+    _load_pdf2zh_modules()
 
 
 def get_pdf2zh_modules():
@@ -296,6 +299,13 @@ if __name__ == "__main__":
     # 配置多进程支持
     multiprocessing.freeze_support()
 
+    # 安全地导入PyQt6（放在主程序入口内：spawn方式启动的工作进程以__mp_main__导入本模块，
+    # 不会加载QtWebEngine和界面模块）
+    from PyQt6.QtWebEngineCore import QWebEngineProfile
+    from PyQt6.QtWidgets import QApplication
+
+    from ui.main_window import MainWindow
+
     app = QApplication(sys.argv)
 
     # 全局字体设置
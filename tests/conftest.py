@@ -0,0 +1,7 @@
+"""测试公共配置：以仓库根目录为导入路径，Qt使用无界面平台"""
+
+import os
+import sys
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+"""模型token限制查表与上下文窗口查询测试"""
+
+import pytest
+
+pytest.importorskip("requests")
+from core import context_window  # noqa: E402
+from core.context_window import ContextWindowRegistry, fetch_ollama_context_window  # noqa: E402
+from utils.constants import OLLAMA_MAX_NUM_CTX  # noqa: E402
+from utils.text_processor import TextProcessor  # noqa: E402
+
+
+@pytest.fixture(scope="module")
+def processor():
+    return TextProcessor()
+
+
+@pytest.mark.parametrize("model_name, expected", [
+    ("gpt-4o", 128000),  # 完整名称优先，不会匹配较短的gpt-4
+    ("gpt-4", 8192),
+    ("gpt-4-0613", 8192),
+    ("gpt-4o-mini-2024-07-18", 128000),
+    ("Qwen/Qwen2.5-7B-Instruct", 32768),  # 去掉组织前缀后按qwen2前缀匹配
+    ("llama3.1:8b", 32768),  # 去掉Ollama标签
+    ("llama3:latest", 8192),
+    ("llama30", 32768),  # 前缀后紧跟字母数字时不算匹配，回退默认值
+    ("unknown-model", 32768),
+    ("", 32768),
+])
+def test_model_token_limit_lookup(processor, model_name, expected):
+    assert processor.get_model_token_limit(model_name) == expected
+
+
+def test_model_token_limit_is_cached(processor):
+    processor.get_model_token_limit("deepseek-chat")
+    assert processor._model_limit_cache["deepseek-chat"] == 32768
+
+
+class _Response:
+    def __init__(self, data):
+        self._data = data
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self._data
+
+
+def _ollama_endpoint():
+    return {"service": "ollama", "base_url": "http://ollama", "headers": {}, "model": "llama3.1:8b"}
+
+
+def test_ollama_explicit_num_ctx_wins(monkeypatch):
+    monkeypatch.setattr(context_window.requests, "post", lambda *a, **k: _Response({
+        "parameters": "stop <eot>\nnum_ctx 65536",
+        "model_info": {"llama.context_length": 131072},
+    }))
+    assert fetch_ollama_context_window(_ollama_endpoint()) == 65536
+
+
+def test_ollama_trained_length_is_capped(monkeypatch):
+    monkeypatch.setattr(context_window.requests, "post", lambda *a, **k: _Response({
+        "model_info": {"llama.context_length": 131072},
+    }))
+    assert fetch_ollama_context_window(_ollama_endpoint()) == OLLAMA_MAX_NUM_CTX
+
+
+def test_registry_caches_and_falls_back(tmp_path, monkeypatch):
+    registry = ContextWindowRegistry(cache_path=str(tmp_path / "windows.json"))
+    calls = []
+    monkeypatch.setattr(registry, "_fetch", lambda endpoint: calls.append(endpoint) or None)
+
+    endpoint = {"service": "silicon", "base_url": "https://api", "headers": {}, "model": "gpt-4"}
+    assert registry.get_limit(endpoint) == 8192
+    assert registry.get_limit(endpoint) == 8192
+    assert len(calls) == 1  # 查询失败也在重试间隔内缓存
+
+    assert registry.get_limit(None, model_name="gpt-4o") == 128000
+
+
+def test_registry_caps_ollama_table_fallback(tmp_path, monkeypatch):
+    registry = ContextWindowRegistry(cache_path=str(tmp_path / "windows.json"))
+    monkeypatch.setattr(registry, "_fetch", lambda endpoint: None)
+    endpoint = dict(_ollama_endpoint(), model="glm-4")
+    assert registry.get_limit(endpoint) == min(128000, OLLAMA_MAX_NUM_CTX)
@@ -0,0 +1,73 @@
+"""对话历史压缩窗口测试"""
+
+import pytest
+
+pytest.importorskip("PyQt6.QtCore")
+pytest.importorskip("requests")
+from core.history_compactor import ChatHistoryCompactor  # noqa: E402
+
+
+def make_history(count):
+    return [{"question": f"q{i}", "answer": f"a{i}"} for i in range(count)]
+
+
+def questions(turns):
+    return [turn["question"] for turn in turns]
+
+
+def test_short_history_is_returned_unchanged():
+    compactor = ChatHistoryCompactor(window=4, batch=2, max_turns=8)
+    history = make_history(3)
+    assert compactor.get_compacted_history("c", history) == ("", history)
+
+
+def test_missing_summary_caps_raw_turns():
+    compactor = ChatHistoryCompactor(window=4, batch=2, max_turns=8)
+    summary, recent = compactor.get_compacted_history("c", make_history(20))
+    assert summary == ""
+    assert questions(recent) == [f"q{i}" for i in range(12, 20)]
+
+
+def test_max_turns_never_below_window_plus_batch():
+    compactor = ChatHistoryCompactor(window=4, batch=2, max_turns=1)
+    assert compactor.max_turns == 6
+
+
+def test_summary_covers_older_turns():
+    compactor = ChatHistoryCompactor(window=4, batch=2, max_turns=8)
+    compactor._on_compaction_completed("c", 16, "摘要")
+    summary, recent = compactor.get_compacted_history("c", make_history(20))
+    assert summary == "摘要"
+    assert questions(recent) == ["q16", "q17", "q18", "q19"]
+
+
+def test_stale_summary_is_ignored():
+    compactor = ChatHistoryCompactor()
+    compactor._on_compaction_completed("c", 10, "新摘要")
+    compactor._on_compaction_completed("c", 6, "旧摘要")
+    assert compactor.get_compacted_history("c", make_history(12))[0] == "新摘要"
+
+
+def test_reset_conversation_discards_summary():
+    compactor = ChatHistoryCompactor()
+    compactor._on_compaction_completed("c", 10, "摘要")
+    assert compactor.get_compacted_history("c", make_history(2)) == ("", make_history(2))
+    assert "c" not in compactor._summaries
+
+
+def test_schedule_waits_for_a_full_batch(monkeypatch):
+    started = []
+    monkeypatch.setattr(
+        "core.history_compactor.HistoryCompactionThread.start", lambda thread: started.append(thread)
+    )
+    compactor = ChatHistoryCompactor(window=4, batch=2)
+    compactor.schedule_compaction("c", make_history(5))
+    assert not started
+
+    compactor.schedule_compaction("c", make_history(6))
+    assert len(started) == 1
+    assert questions(started[0].turns) == ["q0", "q1"]
+    assert started[0].covered_turns == 2
+
+    compactor.schedule_compaction("c", make_history(8))
+    assert len(started) == 1  # 同一对话同时只运行一个摘要线程
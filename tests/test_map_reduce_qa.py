@@ -0,0 +1,123 @@
+"""分块汇总问答测试：问题分类、分块切分、单块失败和停止"""
+
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("requests")
+from core import map_reduce_qa  # noqa: E402
+from core.llm_client import RequestCancelled  # noqa: E402
+from core.map_reduce_qa import (  # noqa: E402
+    MAP_CHUNK_FAILED,
+    NO_RELEVANT_CONTENT,
+    build_reduce_context,
+    classify_question,
+    map_document,
+    split_into_map_chunks,
+)
+from utils.document_text import DocumentText  # noqa: E402
+
+
+class _MemoryCache:
+    """替代磁盘答案缓存"""
+
+    def __init__(self):
+        self.entries = {}
+
+    def hash_text(self, text):
+        return text
+
+    def get(self, key):
+        return self.entries.get(key)
+
+    def set(self, key, value):
+        self.entries[key] = value
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = _MemoryCache()
+    monkeypatch.setattr(map_reduce_qa, "qa_cache", cache)
+    monkeypatch.setattr(map_reduce_qa, "MAP_REDUCE_POLL_INTERVAL", 0.05)
+    return cache
+
+
+def make_document(page_count=6, page_tokens=100):
+    return DocumentText([f"page-{i} content" for i in range(page_count)], token_counts=[page_tokens] * page_count)
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("请总结这篇论文", "summary"),
+    ("实验是怎么做的？", "method"),
+    ("结果数据是多少", "data"),
+    ("作者是谁", "general"),
+])
+def test_classify_question(question, expected):
+    assert classify_question(question)[0] == expected
+
+
+def test_split_into_map_chunks_respects_budget():
+    document = DocumentText(["a", "b", "c", "d"], token_counts=[40, 40, 150, 10])
+    chunks = split_into_map_chunks(document, 100)
+    assert [chunk.page_numbers for chunk in chunks] == [[0, 1], [2], [3]]
+
+
+def test_single_chunk_failure_is_recorded_as_missing(cache, monkeypatch):
+    def fake_completion(config, messages, stop_check=None, **kwargs):
+        if "page-1 " in messages[1]["content"]:
+            raise RuntimeError("boom")
+        return "要点"
+
+    monkeypatch.setattr(map_reduce_qa, "chat_completion", fake_completion)
+    partials = map_document({}, make_document(), "总结", chunk_tokens=100, concurrency=3)
+
+    assert [notes for _, notes in partials] == ["要点", MAP_CHUNK_FAILED, "要点", "要点", "要点", "要点"]
+    assert MAP_CHUNK_FAILED not in cache.entries.values()  # 失败的分块不写入缓存
+
+
+def test_all_requests_failing_raises_even_with_cached_chunks(cache, monkeypatch):
+    def failing_completion(*args, **kwargs):
+        raise RuntimeError("service down")
+
+    document = make_document()
+    monkeypatch.setattr(map_reduce_qa, "chat_completion", lambda *a, **k: "要点")
+    map_document({}, document.select_pages([0]), "总结", chunk_tokens=100, concurrency=2)
+    assert len(cache.entries) == 1
+
+    monkeypatch.setattr(map_reduce_qa, "chat_completion", failing_completion)
+    with pytest.raises(RuntimeError, match="service down"):
+        map_document({}, document, "总结", chunk_tokens=100, concurrency=2)
+
+
+def test_stop_returns_promptly_and_cancels_requests(cache, monkeypatch):
+    stop = threading.Event()
+    cancelled = []
+
+    def slow_completion(config, messages, stop_check=None, **kwargs):
+        for _ in range(200):
+            if stop_check():
+                cancelled.append(messages[1]["content"])
+                raise RequestCancelled()
+            time.sleep(0.01)
+        return "要点"
+
+    monkeypatch.setattr(map_reduce_qa, "chat_completion", slow_completion)
+    threading.Timer(0.1, stop.set).start()
+    start = time.perf_counter()
+    partials = map_document({}, make_document(), "总结", chunk_tokens=100, concurrency=2,
+                            stop_check=stop.is_set)
+
+    assert time.perf_counter() - start < 1.0
+    assert partials == []
+    time.sleep(0.1)
+    assert len(cancelled) == 2  # 进行中的请求被取消，排队的分块不再发送
+    assert not cache.entries
+
+
+def test_build_reduce_context_skips_empty_notes():
+    content = build_reduce_context(
+        [("第1页", "要点一"), ("第2页", NO_RELEVANT_CONTENT), ("第3页", "")], max_tokens=1000
+    )
+    assert "要点一" in content
+    assert "第2页" not in content
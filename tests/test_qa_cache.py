@@ -0,0 +1,71 @@
+"""问答答案缓存测试：缓存键、TTL和容量淘汰"""
+
+from utils import qa_cache as qa_cache_module
+from utils.qa_cache import QACache
+
+
+def make_key(**overrides):
+    params = dict(
+        document_hash="doc", pages=[0, 1], question="What is this?",
+        chat_history=[{"question": "q", "answer": "a"}], provider="ollama",
+        model="llama3", system_prompt="prompt",
+    )
+    params.update(overrides)
+    return QACache.make_key(**params)
+
+
+def test_key_normalizes_question():
+    assert make_key(question="  what   IS this？ ") == make_key(question="What is this?")
+
+
+def test_key_changes_with_each_component():
+    base = make_key()
+    for overrides in (
+        {"document_hash": "other"},
+        {"pages": [0]},
+        {"question": "Another question"},
+        {"chat_history": []},
+        {"provider": "silicon"},
+        {"model": "qwen2"},
+        {"system_prompt": "other prompt"},
+        {"mode": "map_reduce"},
+    ):
+        assert make_key(**overrides) != base, overrides
+
+
+def test_get_and_set(tmp_path):
+    cache = QACache(db_path=str(tmp_path / "qa.sqlite3"))
+    cache.set("key", "answer")
+    assert cache.get("key") == "answer"
+    assert cache.get("missing") is None
+    cache.set("empty", "")
+    assert cache.get("empty") is None
+
+
+def test_expired_entries_are_dropped(tmp_path, monkeypatch):
+    cache = QACache(db_path=str(tmp_path / "qa.sqlite3"), ttl=100)
+    now = [1000.0]
+    monkeypatch.setattr(qa_cache_module.time, "time", lambda: now[0])
+    cache.set("key", "answer")
+
+    now[0] += 50
+    assert cache.get("key") == "answer"
+    now[0] += 51
+    assert cache.get("key") is None
+
+
+def test_evicts_least_recently_used_over_budget(tmp_path, monkeypatch):
+    cache = QACache(db_path=str(tmp_path / "qa.sqlite3"), max_bytes=10)
+    now = [1000.0]
+    monkeypatch.setattr(qa_cache_module.time, "time", lambda: now[0])
+    cache.set("a", "aaaa")
+    now[0] += 1
+    cache.set("b", "bbbb")
+    now[0] += 1
+    assert cache.get("a") == "aaaa"  # a 变为最近访问
+    now[0] += 1
+    cache.set("c", "cccc")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa"
+    assert cache.get("c") == "cccc"
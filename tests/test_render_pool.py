@@ -0,0 +1,111 @@
+"""渲染线程池测试：优先级排序、重复请求合并和视口变化时的取消"""
+
+import pytest
+
+from core.render_pool import RenderPool
+from utils.constants import PRELOAD_DISTANCE
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    """不启动渲染线程的线程池，测试中直接调用_take_request取出请求"""
+    render_pool = RenderPool(num_workers=1)
+    monkeypatch.setattr(render_pool, "_ensure_workers", lambda: None)
+    return render_pool
+
+
+def drain(pool):
+    """按渲染顺序取出所有排队请求的键"""
+    keys = []
+    while pool._pending:
+        keys.append(pool._take_request()["key"])
+    return keys
+
+
+def test_orders_by_viewport_distance(pool):
+    pool.set_viewport(5, 6, zoom_key=1.0)
+    for page_num in (8, 5, 3, 6):
+        pool.request_page(page_num, 1.0, 150)
+    assert [key[1] for key in drain(pool)] == [5, 6, 8, 3]
+
+
+def test_same_distance_orders_preview_page_tile(pool):
+    pool.set_viewport(0, 0, zoom_key=1.0)
+    pool.request_tiles(0, 1, [(1, 0), (0, 0)])
+    pool.request_page(0, 1.0, 150)
+    pool.request_preview(0)
+    assert drain(pool) == [
+        ("preview", 0),
+        ("page", 0, 1.0, None, True),
+        ("tile", 0, 1, 1, 0),
+        ("tile", 0, 1, 0, 0),
+    ]
+
+
+def test_merges_pending_duplicate_keeping_better_priority(pool):
+    pool.set_viewport(0, 0, zoom_key=1.0)
+    pool.request_page(2, 1.0, 150)
+    pool.request_page(1, 1.0, 150)
+    pool.set_viewport(2, 2, zoom_key=1.0)
+    pool.request_page(1, 1.0, 150)
+    pool.request_page(2, 1.0, 150)
+
+    assert pool.merged_count == 2
+    assert len(pool._pending) == 2
+    assert [key[1] for key in drain(pool)] == [2, 1]
+
+
+def test_merges_with_running_request(pool):
+    pool.request_preview(0)
+    request = pool._take_request()
+    pool.request_preview(0)
+    assert pool.merged_count == 1
+    assert not pool._pending
+
+    # 正在执行的请求被取消后，新请求重新排队
+    request["cancelled"] = True
+    pool.request_preview(0)
+    assert ("preview", 0) in pool._pending
+
+
+def test_set_viewport_cancels_outdated_requests(pool):
+    pool.set_viewport(0, 0, zoom_key=1.0)
+    far_page = PRELOAD_DISTANCE + 3
+    pool.request_page(0, 1.0, 150)
+    pool.request_page(far_page, 1.0, 150)
+    pool.request_preview(0)
+    pool.request_preview(far_page)
+
+    pool.set_viewport(far_page, far_page, zoom_key=2.0)
+    # 整页请求的缩放已变化，预览与缩放无关，只有超出预加载范围时取消
+    assert drain(pool) == [("preview", far_page)]
+    assert pool.cancelled_count == 3
+
+
+def test_set_viewport_cancels_running_request(pool):
+    pool.set_viewport(0, 0, zoom_key=1)
+    pool.request_tiles(0, 1, [(0, 0)])
+    request = pool._take_request()
+    pool.set_viewport(0, 0, zoom_key=2)
+    assert request["cancelled"]
+
+
+def test_cancel_all(pool):
+    pool.request_preview(0)
+    pool.request_page(1, 1.0, 150)
+    running = pool._take_request()
+    pool.cancel_all()
+    assert running["cancelled"]
+    assert not pool._pending
+    assert pool._heap == []
+
+
+def test_shutdown_rejects_requests(pool):
+    pool.shutdown()
+    pool.request_preview(0)
+    assert not pool._pending
+    assert pool._take_request() is None
+
+
+def test_latency_percentiles_empty(pool):
+    assert pool.latency_percentiles() == {"count": 0, "p50": 0.0, "p90": 0.0, "p99": 0.0}
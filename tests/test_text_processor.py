@@ -0,0 +1,71 @@
+"""按得分密度选择内容与句子截断测试"""
+
+import pytest
+
+from utils.text_processor import TextProcessor
+
+
+@pytest.fixture
+def processor(monkeypatch):
+    processor = TextProcessor()
+    # 以字符数作为token数，结果与是否安装tiktoken无关
+    monkeypatch.setattr(
+        processor, "count_tokens_batch", lambda texts, use_cache=True: [len(text) for text in texts]
+    )
+    return processor
+
+
+def test_keyword_blocks_win_within_budget(processor):
+    blocks = ["intro", "background", "transformer attention details", "experiments", "ending"]
+    result = processor._select_important_content(
+        blocks, 250, "transformer attention", block_tokens=[100] * 5, block_labels=[1, 2, 3, 4, 5],
+    )
+    assert result.split("\n\n") == [
+        "[页面 1]\nintro",
+        "[页面 3]\ntransformer attention details",
+        "[注意：由于内容过长，已智能选择 2/5 个重要部分]",
+    ]
+
+
+def test_oversized_block_is_skipped_for_smaller_ones(processor):
+    blocks = ["first", "second", "third"]
+    result = processor._select_important_content(
+        blocks, 150, "", block_tokens=[1000, 60, 60], block_labels=[1, 2, 3],
+    )
+    assert "[页面 2]\nsecond" in result
+    assert "[页面 3]\nthird" in result
+    assert "first" not in result
+
+
+def test_remaining_budget_truncates_best_skipped_block(processor):
+    long_block = "Sentence one is here. " * 20
+    blocks = ["short", long_block]
+    result = processor._select_important_content(
+        blocks, 300, "", block_tokens=[50, len(long_block)], block_labels=[1, 2],
+    )
+    assert "[页面 1]\nshort" in result
+    assert "[页面 2]\nSentence one is here." in result
+    assert "...[内容截断]" in result
+
+
+def test_everything_fits_without_note(processor):
+    result = processor._select_important_content(["a", "b"], 100, "", block_tokens=[10, 10], block_labels=[1, 2])
+    assert "注意" not in result
+
+
+def test_truncate_block_keeps_whole_sentences(processor):
+    block = "aaaaaaaaaa. bbbbbbbbbb. cccccccccc. dddddddddd."
+    assert processor._truncate_block(block, 100) == block
+    # 预留20个token给截断提示：前两句共24个token
+    assert processor._truncate_block(block, 44) == "aaaaaaaaaa. bbbbbbbbbb....[内容截断]"
+    assert processor._truncate_block(block, 30) == ""
+    assert processor._truncate_block("", 100) == ""
+
+
+def test_select_sections_labels_page_ranges(processor):
+    sections = [
+        {"text": "one", "tokens": 10, "page_start": 0, "page_end": 0},
+        {"text": "two", "tokens": 10, "page_start": 1, "page_end": 3},
+    ]
+    result = processor.select_sections(sections, 100)
+    assert result == "[页面 1]\none\n\n[页面 2-4]\ntwo"
@@ -0,0 +1,107 @@
+"""单词框选与网格索引测试"""
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6.QtGui")
+from PyQt6.QtCore import QPoint  # noqa: E402
+from PyQt6.QtGui import QGuiApplication  # noqa: E402
+
+from core.text_selection import TextSelection  # noqa: E402
+from core.word_boxes import WordBoxes  # noqa: E402
+
+
+@pytest.fixture(scope="module", autouse=True)
+def qt_app():
+    """QCursor需要QGuiApplication"""
+    app = QGuiApplication.instance() or QGuiApplication([])
+    yield app
+
+
+def random_words(count=2000, seed=0):
+    """随机分布在多页上的单词"""
+    rng = np.random.default_rng(seed)
+    x = rng.uniform(0, 2000, count)
+    y = rng.uniform(0, 20000, count)
+    w = rng.uniform(5, 60, count)
+    h = rng.uniform(8, 14, count)
+    return WordBoxes(
+        [f"w{i}" for i in range(count)],
+        np.stack([x, y, x + w, y + h], axis=1),
+        rng.integers(0, 5, count),
+    )
+
+
+def test_select_in_rect_orders_by_page_row_column():
+    words = WordBoxes(
+        ["c", "a", "b", "d"],
+        [(50, 0, 60, 10), (0, 0, 10, 10), (20, 0, 30, 10), (0, 0, 10, 10)],
+        [0, 0, 0, 1],
+    )
+    selected = words.select_in_rect(0, 0, 100, 100)
+    assert [words.texts[i] for i in selected] == ["a", "b", "c", "d"]
+
+
+def test_select_in_rect_falls_back_to_intersection():
+    words = WordBoxes(["long"], [(0, 0, 100, 10)], [0])
+    # 选择框不包含中心点，但与单词相交
+    assert list(words.select_in_rect(0, 0, 20, 20)) == [0]
+
+
+def test_select_in_rect_respects_candidates():
+    words = WordBoxes(["a", "b"], [(0, 0, 10, 10), (20, 0, 30, 10)], [0, 0])
+    assert list(words.select_in_rect(0, 0, 40, 40, np.array([1]))) == [1]
+
+
+def test_hit_test_with_candidates():
+    words = WordBoxes(["a", "b"], [(0, 0, 10, 10), (20, 0, 30, 10)], [0, 0])
+    assert words.hit_test(25, 5) == 1
+    assert words.hit_test(25, 5, [0]) == -1
+    assert words.hit_test(100, 100) == -1
+
+
+def test_grid_drag_selection_matches_brute_force():
+    words = random_words()
+    selection = TextSelection()
+    selection.set_visible_words(words)
+    rng = np.random.default_rng(1)
+    for _ in range(300):
+        start = QPoint(int(rng.uniform(0, 2000)), int(rng.uniform(0, 20000)))
+        end = QPoint(int(start.x() + rng.uniform(-300, 300)), int(start.y() + rng.uniform(-400, 400)))
+        selection.start_pos, selection.current_pos = start, end
+        selection._update_text_selection()
+
+        expected = words.select_in_rect(
+            min(start.x(), end.x()), min(start.y(), end.y()),
+            max(start.x(), end.x()), max(start.y(), end.y()),
+        )
+        assert np.array_equal(selection.selected_words, expected)
+        assert np.array_equal(np.flatnonzero(words.selected), np.sort(expected))
+
+
+def test_grid_hit_test_matches_brute_force():
+    words = random_words(seed=2)
+    selection = TextSelection()
+    selection.set_visible_words(words)
+    rng = np.random.default_rng(3)
+    for _ in range(500):
+        x, y = int(rng.uniform(0, 2000)), int(rng.uniform(0, 20000))
+        index = selection.get_word_at_pos(QPoint(x, y))
+        rects = words.display_rects
+        hits = np.flatnonzero((rects[:, 0] <= x) & (x <= rects[:, 2]) & (rects[:, 1] <= y) & (y <= rects[:, 3]))
+        if len(hits):
+            assert index in hits
+        else:
+            assert index == -1
+
+
+def test_grid_rebuilds_after_layout_change():
+    words = WordBoxes(["a"], [(0, 0, 10, 10)], [0])
+    selection = TextSelection()
+    selection.set_visible_words(words)
+    assert selection.get_word_at_pos(QPoint(5, 5)) == 0
+
+    words.set_display_transform(1.0, 500, 500)
+    selection.invalidate_layout()
+    assert selection.get_word_at_pos(QPoint(5, 5)) == -1
+    assert selection.get_word_at_pos(QPoint(505, 505)) == 0
@@ -0,0 +1,104 @@
+"""分块渲染测试：缩放档位、可见图块排序和图块缓存淘汰"""
+
+import pymupdf
+
+from core.tile_renderer import TileCache, bucket_scale, tile_clip, visible_tiles, zoom_bucket
+from utils.constants import TILE_SIZE
+
+
+class FakeImage:
+    """只提供sizeInBytes和width的图像替身"""
+
+    def __init__(self, size, width=100):
+        self.size = size
+        self._width = width
+
+    def sizeInBytes(self):
+        return self.size
+
+    def width(self):
+        return self._width
+
+
+def test_zoom_bucket_round_trip():
+    for bucket in range(-16, 17):
+        assert zoom_bucket(bucket_scale(bucket)) == bucket
+    assert zoom_bucket(1.0) == 0
+    assert zoom_bucket(1.02) == zoom_bucket(1.0)
+
+
+def test_visible_tiles_sorted_by_distance_to_center():
+    viewport = (TILE_SIZE, TILE_SIZE, 2 * TILE_SIZE, 2 * TILE_SIZE)
+    tiles = visible_tiles(4 * TILE_SIZE, 4 * TILE_SIZE, 1.0, viewport)
+    assert tiles[0] == (1, 1)
+    assert set(tiles) == {(tx, ty) for tx in (1, 2) for ty in (1, 2)}
+    assert tiles[-1] == (2, 2)
+
+
+def test_visible_tiles_clamped_to_page():
+    tiles = visible_tiles(TILE_SIZE * 1.5, TILE_SIZE * 1.5, 1.0, (-1000, -1000, 10000, 10000))
+    assert sorted(tiles) == [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+def test_tile_clip_clamped_to_page_rect():
+    rect = pymupdf.Rect(0, 0, 600, 600)
+    clip = tile_clip(rect, 1.0, 1, 0)
+    assert clip == pymupdf.Rect(TILE_SIZE, 0, 600, TILE_SIZE)
+
+
+def test_put_replace_updates_total_bytes():
+    cache = TileCache(max_bytes=1000)
+    cache.put(0, 0, 0, 0, FakeImage(100))
+    cache.put(0, 0, 0, 0, FakeImage(300))
+    assert cache.total_bytes == 300
+    assert cache.get(0, 0, 0, 0).size == 300
+
+
+def test_evicts_least_recently_used_over_budget():
+    cache = TileCache(max_bytes=300)
+    cache.put(0, 0, 0, 0, FakeImage(100))
+    cache.put(0, 0, 1, 0, FakeImage(100))
+    cache.put(0, 0, 2, 0, FakeImage(100))
+    cache.get(0, 0, 0, 0)  # 访问后变为最近使用
+    cache.put(0, 0, 3, 0, FakeImage(100))
+
+    assert cache.get(0, 0, 1, 0) is None
+    assert cache.get(0, 0, 0, 0) is not None
+    assert cache.total_bytes == 300
+
+
+def test_keeps_single_oversized_image():
+    cache = TileCache(max_bytes=100)
+    cache.put(0, 0, 0, 0, FakeImage(50))
+    cache.put(0, 0, 1, 0, FakeImage(500))
+    assert cache.get(0, 0, 0, 0) is None
+    assert cache.get(0, 0, 1, 0) is not None
+    assert cache.total_bytes == 500
+
+
+def test_remove_page_and_clear():
+    cache = TileCache(max_bytes=10000)
+    cache.put(0, 0, 0, 0, FakeImage(100))
+    cache.put_preview(0, FakeImage(50))
+    cache.put(1, 0, 0, 0, FakeImage(200))
+
+    cache.remove_page(0)
+    assert cache.get_preview(0) is None
+    assert cache.get(0, 0, 0, 0) is None
+    assert cache.total_bytes == 200
+
+    cache.clear()
+    assert cache.get(1, 0, 0, 0) is None
+    assert cache.total_bytes == 0
+
+
+def test_fallback_maps_tile_to_preview_region():
+    cache = TileCache()
+    rect = pymupdf.Rect(0, 0, 2 * TILE_SIZE, 2 * TILE_SIZE)
+    assert cache.get_fallback(0, rect, 1.0, 1, 1) is None
+
+    cache.put_preview(0, FakeImage(10, width=TILE_SIZE))
+    preview, source = cache.get_fallback(0, rect, 1.0, 1, 1)
+    assert preview.width() == TILE_SIZE
+    half = TILE_SIZE / 2
+    assert (source.x(), source.y(), source.width(), source.height()) == (half, half, half, half)
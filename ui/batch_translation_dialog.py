@@ -101,6 +101,7 @@ class BatchTranslationThread(QThread):
 
 class BatchTranslationDialog(QDialog):
     """批量翻译对话框"""
+    batch_folder_completed = pyqtSignal(str)  # 批量翻译完成的文件夹，用于更新文档库索引
     
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -553,6 +554,9 @@ class BatchTranslationDialog(QDialog):
         self.reset_ui()
         # 进度条100%
         self.progress_bar.setValue(total_count)
+        # 通知更新文档库索引
+        if success_count > 0 and self.folder_path.text():
+            self.batch_folder_completed.emit(self.folder_path.text())
         # 显示完成信息
         self.current_file_label.setText(f"批量翻译完成: {success_count}/{total_count} 成功")
         # 可选：弹窗提示
@@ -1,7 +1,11 @@
 """UI组件模块"""
 
+import hashlib
 import math
+import os
 import threading
+import uuid
+from collections import OrderedDict
 
 import requests
 
@@ -11,9 +15,9 @@ try:
     MARKDOWN_AVAILABLE = True
 except ImportError:
     MARKDOWN_AVAILABLE = False
-from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtCore import Qt, QThread, QTimer, pyqtSignal
 from PyQt6.QtCore import QTimer as _QTimer
-from PyQt6.QtGui import QColor, QPainter
+from PyQt6.QtGui import QColor, QPainter, QTextCharFormat, QTextCursor
 from PyQt6.QtWidgets import (
     QApplication,
     QComboBox,
@@ -33,6 +37,8 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from utils.constants import MARKDOWN_RENDER_CACHE_SIZE, QA_STREAM_FLUSH_INTERVAL
+
 
 class AnimationOverlay(QWidget):
     """动画覆盖层 - 确保旋转动画在最上层"""
@@ -1579,6 +1585,8 @@ class QADialog(QDialog):
             # 创建临时QA线程来获取模型信息和处理页面过滤
             temp_thread = QAEngineThread(question, self.pdf_content, self.chat_history)
             model_name = temp_thread._get_current_model()
+            # 界面线程中只读取已缓存的上下文长度，不发起网络请求
+            model_limit = temp_thread._get_context_limit(allow_fetch=False)
 
             # 获取QA设置中的页面配置
             qa_settings = temp_thread.config.get("qa_settings", {})
@@ -1606,11 +1614,11 @@ PDF文档内容如下：
                 chat_history=self.chat_history,
                 current_question=question,
                 max_response_tokens=2000,
+                context_limit=model_limit,
             )
 
             # 检查是否需要截断并显示相应提示（使用过滤后的内容）
-            original_tokens = text_processor.count_tokens(processed_pdf_content)
-            model_limit = text_processor.get_model_token_limit(model_name)
+            original_tokens = processed_pdf_content.total_tokens
 
             # 构建提示信息
             if pages_config:
@@ -1677,25 +1685,57 @@ class ChatInputWidget(QTextEdit):
             super().keyPressEvent(event)
 
 
+class MarkdownRenderThread(QThread):
+    """Markdown与数学公式后台渲染线程"""
+    render_completed = pyqtSignal(int, str, str)  # 请求ID, 消息哈希, HTML
+
+    def __init__(self, render_func, request_id, key, text, parent=None):
+        super().__init__(parent)
+        self.render_func = render_func
+        self.request_id = request_id
+        self.key = key
+        self.text = text
+
+    def run(self):
+        """执行渲染"""
+        self.render_completed.emit(self.request_id, self.key, self.render_func(self.text))
+
+
 class EmbeddedQAWidget(QWidget):
     """嵌入式问答组件"""
 
     def __init__(self, parent=None):
         super().__init__(parent)
 
-        # 初始化Markdown渲染器
-        if MARKDOWN_AVAILABLE:
-            # 使用commonmark预设并手动启用表格支持
-            self.md = MarkdownIt("commonmark", {"breaks": True, "html": True})
-            # 启用表格支持
-            self.md.enable(["table"])
-        else:
-            self.md = None
+        # Markdown渲染器：界面线程和后台渲染线程各自使用自己的实例
+        self._md_local = threading.local()
 
         # 对话历史
         self.chat_history = []
+        self.conversation_id = uuid.uuid4().hex  # 用于缓存历史摘要
         self.pdf_content = ""
+        self.library_folder = ""  # 文档库模式下检索的文件夹，为空表示单文档模式
+        self._library_thread = None
+        self._library_activate = False  # 正在运行的索引完成后是否进入文档库模式
+        self._library_queue = OrderedDict()  # 等待索引的文件夹 -> 完成后是否进入文档库模式
+        self._extraction_pending = False  # PDF文本是否正在后台提取
+        self._pending_question = None  # 等待文本提取完成后处理的问题
         self.current_response = ""  # 当前AI回答
+        self._chat_has_messages = False  # 对话区是否已有消息（否则为空或仅显示欢迎信息）
+        self._shown_notices = set()  # 清空对话后已显示过的系统提示
+        self._ai_message_start = None  # 当前AI回答在文档中的起始位置
+        self._ai_timestamp = ""
+        self._stream_buffer = []  # 尚未显示的回答片段
+        self._render_cache = OrderedDict()  # 消息哈希 -> 渲染后的HTML
+        self._render_requests = {}  # 请求ID -> (起始光标, 结束光标, 时间戳, 对话代数)
+        self._render_threads = set()
+        self._next_render_id = 0
+        self._chat_generation = 0  # 清空对话时递增，丢弃旧对话的渲染结果
+
+        # 定时合并流式片段后再刷新显示，避免每个片段都重绘
+        self._stream_timer = QTimer(self)
+        self._stream_timer.setInterval(QA_STREAM_FLUSH_INTERVAL)
+        self._stream_timer.timeout.connect(self._flush_stream_buffer)
 
         # 创建问答引擎管理器
         from core.qa_engine import QAEngineManager
@@ -1782,6 +1822,31 @@ class EmbeddedQAWidget(QWidget):
         config_btn.clicked.connect(self.open_qa_settings)
         button_layout.addWidget(config_btn)
 
+        # 文档库按钮：在文件夹内的所有PDF中检索并回答
+        self.library_btn = QPushButton("文档库")
+        self.library_btn.setFixedSize(60, 28)
+        self.library_btn.setCheckable(True)
+        self.library_btn.setStyleSheet("""
+            QPushButton {
+                background-color: #6f42c1;
+                color: white;
+                border: none;
+                padding: 4px 8px;
+                border-radius: 4px;
+                font-size: 12px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: #5a32a3;
+            }
+            QPushButton:checked {
+                background-color: #4b2a89;
+            }
+        """)
+        self.library_btn.setToolTip("在一个文件夹的所有PDF中检索并回答问题")
+        self.library_btn.clicked.connect(self.toggle_library_mode)
+        button_layout.addWidget(self.library_btn)
+
         button_layout.addStretch()
 
         # 清空对话按钮（移到发送按钮左边）
@@ -2005,6 +2070,22 @@ class EmbeddedQAWidget(QWidget):
 
         return html
 
+    @property
+    def md(self):
+        """当前线程的Markdown渲染器，未安装markdown-it时为None
+
+        markdown-it实例不保证线程安全，每个线程首次使用时各自创建一个
+        """
+        if not MARKDOWN_AVAILABLE:
+            return None
+        md = getattr(self._md_local, "md", None)
+        if md is None:
+            # 使用commonmark预设并手动启用表格支持
+            md = MarkdownIt("commonmark", {"breaks": True, "html": True})
+            md.enable(["table"])
+            self._md_local.md = md
+        return md
+
     def _render_markdown_to_html(self, text):
         """将Markdown文本渲染为HTML"""
         if not self.md:
@@ -2294,13 +2375,48 @@ class EmbeddedQAWidget(QWidget):
         """
 
     def set_pdf_content(self, content):
-        """设置PDF内容"""
+        """设置PDF内容，并处理提取期间提出的问题"""
         self.pdf_content = content
+        self._extraction_pending = False
         self.status_label.setText(f"已加载PDF内容 ({len(content)} 字符)")
 
+        if self._pending_question is not None:
+            question = self._pending_question
+            self._pending_question = None
+            self.status_label.setText("正在生成回答...")
+            self.process_question(question)
+
+    def set_extraction_pending(self, file_path):
+        """标记PDF文本正在后台提取"""
+        import os
+
+        self.pdf_content = ""
+        self._extraction_pending = True
+        self.status_label.setText(f"正在提取PDF文本: {os.path.basename(file_path)}")
+
+    def on_extraction_progress(self, current, total):
+        """显示文本提取进度"""
+        if self._extraction_pending:
+            self.status_label.setText(f"正在提取PDF文本 ({current}/{total}页)")
+
+    def set_extraction_failed(self, error_message):
+        """文本提取失败"""
+        self._extraction_pending = False
+        self.status_label.setText(f"PDF文本提取失败: {error_message}")
+        if self._pending_question is not None:
+            self._pending_question = None
+            self._reset_qa_buttons()
+            self.add_message("系统", f"无法提取PDF文本内容: {error_message}")
+
+    def has_pending_question(self):
+        """是否有等待文本提取完成的问题"""
+        return self._pending_question is not None
+
     def clear_chat(self):
         """清空对话历史"""
         self.chat_history.clear()
+        self.qa_manager.history_compactor.discard(self.conversation_id)
+        self.conversation_id = uuid.uuid4().hex
         self.chat_display.clear()
         # 添加简洁的欢迎信息
         welcome_msg = """# 🎉 智能问答面板
@@ -2309,10 +2425,98 @@ class EmbeddedQAWidget(QWidget):
 
 ---
 """
-        welcome_html = self._render_markdown_to_html(welcome_msg)
+        welcome_html = self._render_markdown_cached(welcome_msg)
+        self._finish_streaming()
+        self._chat_generation += 1
+        self._render_requests.clear()
         self.chat_display.setHtml(welcome_html)
+        self._chat_has_messages = False
+        self._shown_notices.clear()
         self.status_label.setText("对话已清空")
 
+    def toggle_library_mode(self):
+        """切换文档库模式"""
+        if self.library_folder:
+            self.library_folder = ""
+            self.library_btn.setChecked(False)
+            self.add_message("系统", "已退出文档库模式，返回当前PDF问答")
+            self.status_label.setText("单文档模式")
+            return
+
+        from PyQt6.QtWidgets import QFileDialog
+
+        self.library_btn.setChecked(False)
+        folder = QFileDialog.getExistingDirectory(self, "选择文档库文件夹")
+        if folder:
+            self.index_library_folder(folder, activate=True)
+
+    def index_library_folder(self, folder, activate=True):
+        """在后台增量更新文件夹的文档库索引
+
+        同一时刻只运行一个索引线程：正在索引同一文件夹时只合并activate，
+        其他文件夹排队等待当前索引结束后依次进行，不会取消正在运行的索引
+        """
+        thread = self._library_thread
+        if thread is not None and thread.isRunning():
+            if os.path.normcase(os.path.abspath(thread.folder)) == os.path.normcase(os.path.abspath(folder)):
+                self._library_activate = self._library_activate or activate
+            else:
+                self._library_queue[folder] = self._library_queue.get(folder, False) or activate
+            return
+        self._start_library_index(folder, activate)
+
+    def _start_library_index(self, folder, activate):
+        """启动文档库索引线程"""
+        from core.library_index import LibraryIndexThread
+
+        thread = LibraryIndexThread(folder, self)
+        thread.progress_updated.connect(
+            lambda current, total, name: self.status_label.setText(
+                f"正在索引文档库 ({current}/{total}): {name}"
+            )
+        )
+        thread.index_completed.connect(
+            lambda folder, stats: self._on_library_indexed(folder, stats, self._library_activate)
+        )
+        thread.index_failed.connect(
+            lambda folder, error: self.status_label.setText(f"文档库索引失败: {error}")
+        )
+        thread.finished.connect(lambda: self._on_library_thread_finished(thread))
+        self._library_thread = thread
+        self._library_activate = activate
+        thread.start()
+
+    def _on_library_thread_finished(self, thread):
+        """索引线程结束后清理，并开始下一个排队的文件夹"""
+        if self._library_thread is not thread:
+            return
+        self._library_thread = None
+        thread.deleteLater()
+        if self._library_queue:
+            folder, activate = self._library_queue.popitem(last=False)
+            self._start_library_index(folder, activate)
+
+    def _on_library_indexed(self, folder, stats, activate):
+        """文档库索引完成"""
+        from core.library_index import library_index
+
+        count = library_index.document_count(folder)
+        summary = (
+            f"新增{stats['added']}篇，更新{stats['updated']}篇，"
+            f"移除{stats['removed']}篇，未变化{stats['unchanged']}篇"
+        )
+        self.status_label.setText(f"文档库索引完成: {summary}")
+        if not activate:
+            return
+
+        self.library_folder = folder
+        self.library_btn.setChecked(True)
+        self.add_message(
+            "系统",
+            f"📚 已进入文档库模式：{folder}（共{count}篇文档，{summary}）。"
+            "回答将注明所依据的文档和页码，再次点击“文档库”返回当前PDF问答。",
+        )
+
     def open_qa_settings(self):
         """打开QA设置对话框"""
         from ui.qa_settings_dialog import QASettingsDialog
@@ -2333,6 +2537,19 @@ class EmbeddedQAWidget(QWidget):
         """切换小部件的可见性"""
         self.setVisible(not self.isVisible())
 
+    def cleanup(self):
+        """退出前停止后台线程：文档库索引、问答和历史摘要线程、消息渲染线程"""
+        self._stream_timer.stop()
+        self._library_queue.clear()
+        if self._library_thread and self._library_thread.isRunning():
+            self._library_thread.stop()
+            if not self._library_thread.wait(5000):
+                print("文档库索引线程未能及时停止")
+        self._library_thread = None
+        self.qa_manager.cleanup()
+        for thread in list(self._render_threads):
+            thread.wait(1000)
+
     def hide_title_bar(self):
         """隐藏标题栏"""
         if hasattr(self, "title_label"):
@@ -2345,8 +2562,14 @@ class EmbeddedQAWidget(QWidget):
 
     def _on_stop_qa_clicked(self):
         """处理停止问答按钮点击事件"""
+        if self._pending_question is not None:
+            self._pending_question = None
+            self._reset_qa_buttons()
+            self.status_label.setText("操作已停止")
+            return
         if self.qa_manager.is_qa_running():
             self.qa_manager.stop_current_qa()
+            self._finish_streaming()
             self._reset_qa_buttons()
             self.add_message("系统", "已停止回答。")
             self.status_label.setText("操作已停止")
@@ -2370,6 +2593,12 @@ class EmbeddedQAWidget(QWidget):
         self._stop_qa_button.show()
         self.status_label.setText("正在生成回答...")
 
+        # 文本仍在后台提取时先记下问题，提取完成后自动回答
+        if self._extraction_pending and not self.library_folder:
+            self._pending_question = question
+            self.status_label.setText("正在等待PDF文本提取完成...")
+            return
+
         # 调用AI问答功能
         self.process_question(question)
 
@@ -2386,38 +2615,57 @@ class EmbeddedQAWidget(QWidget):
             color = "#6c757d"
 
         # 渲染消息内容为HTML
-        message_html = self._render_markdown_to_html(message)
+        message_html = self._render_markdown_cached(message)
+        self._append_message_html(self._build_message_html(sender, color, timestamp, message_html))
 
-        # 获取当前内容
-        current_html = self.chat_display.toHtml()
+        # 确保滚动到底部
+        scrollbar = self.chat_display.verticalScrollBar()
+        scrollbar.setValue(scrollbar.maximum())
 
-        # 构建完整的消息HTML（去除背景色）
-        # 如果不是第一条消息，添加换行
-        if current_html.strip() and "智能问答面板" not in current_html:
-            styled_message_html = f'<br><div style="margin-bottom: 20px; border-left: 4px solid {color}; padding-left: 15px;"><div style="color: {color}; font-weight: bold; margin-bottom: 8px; font-size: 14px;">{sender} [{timestamp}]</div><div style="line-height: 1.6;">{message_html}</div></div>'
-        else:
-            styled_message_html = f'<div style="margin-bottom: 20px; border-left: 4px solid {color}; padding-left: 15px;"><div style="color: {color}; font-weight: bold; margin-bottom: 8px; font-size: 14px;">{sender} [{timestamp}]</div><div style="line-height: 1.6;">{message_html}</div></div>'
+    def add_notice(self, message):
+        """添加系统提示，清空对话后已显示过的相同提示不再重复添加"""
+        if message in self._shown_notices:
+            return
+        self._shown_notices.add(message)
+        self.add_message("系统", message)
 
-        # 如果是第一条消息，直接设置HTML
-        if not current_html.strip() or "智能问答面板" in current_html:
-            self.chat_display.setHtml(styled_message_html)
-        else:
-            # 追加到现有内容 - 使用setHtml确保正确的顺序
-            full_html = current_html + styled_message_html
-            self.chat_display.setHtml(full_html)
+    @staticmethod
+    def _build_message_html(sender, color, timestamp, body_html):
+        """构建单条消息的HTML"""
+        return f'<div style="margin-bottom: 20px; border-left: 4px solid {color}; padding-left: 15px;"><div style="color: {color}; font-weight: bold; margin-bottom: 8px; font-size: 14px;">{sender} [{timestamp}]</div><div style="line-height: 1.6;">{body_html}</div></div>'
 
-        # 确保滚动到底部
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        self.chat_display.setTextCursor(cursor)
+    def _append_message_html(self, message_html):
+        """通过文本光标在对话末尾追加消息，返回消息在文档中的起始位置
+
+        只插入新消息本身，不会重新序列化和解析已有的对话内容
+        """
+        if not self._chat_has_messages:
+            # 第一条消息替换空白或欢迎信息
+            self.chat_display.clear()
+            self._chat_has_messages = True
+            cursor = QTextCursor(self.chat_display.document())
+        else:
+            cursor = QTextCursor(self.chat_display.document())
+            cursor.movePosition(QTextCursor.MoveOperation.End)
+            cursor.insertBlock()
+            cursor.insertBlock()
+        start = cursor.position()
+        cursor.insertHtml(message_html)
+        return start
+
+    def _is_following_output(self):
+        """滚动条是否停留在底部（用户未向上翻看历史）"""
+        scrollbar = self.chat_display.verticalScrollBar()
+        return scrollbar.value() >= scrollbar.maximum() - 4
 
     def process_question(self, question):
         """处理问题"""
         # 重置当前回答
         self.current_response = ""
 
-        # 检查PDF内容是否会被截断
-        self._check_and_show_truncation_info(question)
+        # 检查PDF内容是否会被截断（文档库模式按检索结果组装上下文，无需提示）
+        if not self.library_folder:
+            self._check_and_show_truncation_info(question)
 
         # 开始AI问答
         self.qa_manager.start_qa(
@@ -2427,6 +2675,8 @@ class EmbeddedQAWidget(QWidget):
             chunk_callback=self.on_response_chunk,
             completed_callback=self.on_response_completed,
             failed_callback=self.on_response_failed,
+            conversation_id=self.conversation_id,
+            library_folder=self.library_folder,
         )
 
     def _check_and_show_truncation_info(self, question):
@@ -2445,6 +2695,8 @@ class EmbeddedQAWidget(QWidget):
             # 创建临时QA线程来获取模型信息和处理页面过滤
             temp_thread = QAEngineThread(question, self.pdf_content, self.chat_history)
             model_name = temp_thread._get_current_model()
+            # 界面线程中只读取已缓存的上下文长度，不发起网络请求
+            model_limit = temp_thread._get_context_limit(allow_fetch=False)
 
             # 获取QA设置中的页面配置
             qa_settings = temp_thread.config.get("qa_settings", {})
@@ -2472,11 +2724,11 @@ PDF文档内容如下：
                 chat_history=self.chat_history,
                 current_question=question,
                 max_response_tokens=2000,
+                context_limit=model_limit,
             )
 
             # 检查是否需要截断并显示相应提示（使用过滤后的内容）
-            original_tokens = text_processor.count_tokens(processed_pdf_content)
-            model_limit = text_processor.get_model_token_limit(model_name)
+            original_tokens = processed_pdf_content.total_tokens
 
             # 构建提示信息
             if pages_config:
@@ -2484,7 +2736,11 @@ PDF文档内容如下：
             else:
                 page_info = "（完整文档）"
 
-            if original_tokens > available_tokens:
+            if original_tokens > available_tokens and temp_thread._map_reduce_enabled():
+                # 分块汇总模式提示
+                map_reduce_msg = f"📚 提示：PDF内容{page_info}较长({original_tokens:,} tokens)，超出{model_name}模型限制({model_limit:,} tokens)，将分块提取全文要点后汇总回答，首次提问需要稍候。"
+                self.add_message("系统", map_reduce_msg)
+            elif original_tokens > available_tokens:
                 # 显示截断提示
                 truncation_msg = f"💡 提示：PDF内容{page_info}较长({original_tokens:,} tokens)，已智能截断至{available_tokens:,} tokens以适应{model_name}模型({model_limit:,} tokens限制)。AI将基于最相关的内容回答您的问题。"
                 self.add_message("系统", truncation_msg)
@@ -2498,50 +2754,50 @@ PDF文档内容如下：
             # 静默失败，不影响正常问答流程
 
     def on_response_chunk(self, chunk):
-        """处理AI回答片段"""
+        """处理AI回答片段：先放入缓冲区，由定时器合并后追加显示"""
         self.current_response += chunk
 
-        # 流式显示：使用HTML格式保持一致性
-        if len(self.current_response) == len(chunk):
-            # 第一个chunk，添加AI消息头
-            timestamp = __import__("datetime").datetime.now().strftime("%H:%M:%S")
-
-            # 记录开始位置（基于当前HTML内容）
-            current_html = self.chat_display.toHtml()
-            self._ai_start_html_length = len(current_html)
-
-            # 创建AI消息头的HTML
-            ai_header_html = f'<br><div style="margin-bottom: 20px; border-left: 4px solid #28a745; padding-left: 15px;"><div style="color: #28a745; font-weight: bold; margin-bottom: 8px; font-size: 14px;">AI助手 [{timestamp}]</div><div style="line-height: 1.6; font-family: \'Microsoft YaHei\', \'Segoe UI\', sans-serif; white-space: pre-wrap;">{chunk}</div></div>'
-
-            # 添加到现有HTML
-            full_html = current_html + ai_header_html
-            self.chat_display.setHtml(full_html)
-        else:
-            # 后续chunk，更新最后的AI回答内容
-            current_html = self.chat_display.toHtml()
-
-            # 找到最后一个AI回答的内容区域并更新
-            # 简单方法：重新构建最后的AI消息
-            if hasattr(self, "_ai_start_html_length"):
-                before_ai_html = current_html[: self._ai_start_html_length]
-                timestamp = __import__("datetime").datetime.now().strftime("%H:%M:%S")
-
-                updated_ai_html = f'<br><div style="margin-bottom: 20px; border-left: 4px solid #28a745; padding-left: 15px;"><div style="color: #28a745; font-weight: bold; margin-bottom: 8px; font-size: 14px;">AI助手 [{timestamp}]</div><div style="line-height: 1.6; font-family: \'Microsoft YaHei\', \'Segoe UI\', sans-serif; white-space: pre-wrap;">{self.current_response}</div></div>'
-
-                full_html = before_ai_html + updated_ai_html
-                self.chat_display.setHtml(full_html)
+        if self._ai_message_start is None:
+            # 第一个chunk，添加AI消息头，正文随后以纯文本追加
+            self._ai_timestamp = __import__("datetime").datetime.now().strftime("%H:%M:%S")
+            self._ai_message_start = self._append_message_html(
+                self._build_message_html("AI助手", "#28a745", self._ai_timestamp, "")
+            )
+            scrollbar = self.chat_display.verticalScrollBar()
+            scrollbar.setValue(scrollbar.maximum())
 
-        # 强制滚动到底部
-        self.chat_display.ensureCursorVisible()
+        self._stream_buffer.append(chunk)
+        if not self._stream_timer.isActive():
+            self._stream_timer.start()
 
-        # 额外的滚动确保
-        scrollbar = self.chat_display.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+    def _flush_stream_buffer(self):
+        """将缓冲的回答片段一次性追加到最后一条消息末尾"""
+        if not self._stream_buffer:
+            self._stream_timer.stop()
+            return
 
-        # 移动光标到末尾并确保可见
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        self.chat_display.setTextCursor(cursor)
+        text = "".join(self._stream_buffer)
+        self._stream_buffer.clear()
+
+        following = self._is_following_output()
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        text_format = QTextCharFormat()
+        text_format.setForeground(QColor("#333333"))
+        cursor.insertText(text, text_format)
+
+        # 仅在用户停留在底部时跟随滚动
+        if following:
+            scrollbar = self.chat_display.verticalScrollBar()
+            scrollbar.setValue(scrollbar.maximum())
+
+    def _finish_streaming(self):
+        """结束流式显示：输出剩余片段并停止定时器，返回AI回答的起始位置"""
+        self._flush_stream_buffer()
+        self._stream_timer.stop()
+        start = self._ai_message_start
+        self._ai_message_start = None
+        return start
 
     def on_response_completed(self):
         """AI回答完成"""
@@ -2553,49 +2809,94 @@ PDF文档内容如下：
             }
         )
 
-        # 替换流式输出的临时内容为完整的Markdown渲染
-        if hasattr(self, "_ai_start_html_length"):
-            # 获取流式输出开始前的HTML内容
-            current_html = self.chat_display.toHtml()
-            before_ai_html = current_html[: self._ai_start_html_length]
-
-            # 渲染AI回答为完整的Markdown
-            timestamp = __import__("datetime").datetime.now().strftime("%H:%M:%S")
-            response_html = self._render_markdown_to_html(self.current_response)
-
-            # 构建完整的AI回答HTML（与add_message保持一致）
-            ai_message_html = f'<br><div style="margin-bottom: 20px; border-left: 4px solid #28a745; padding-left: 15px;"><div style="color: #28a745; font-weight: bold; margin-bottom: 8px; font-size: 14px;">AI助手 [{timestamp}]</div><div style="line-height: 1.6;">{response_html}</div></div>'
-
-            # 重新设置完整内容
-            full_html = before_ai_html + ai_message_html
-            self.chat_display.setHtml(full_html)
+        start = self._finish_streaming()
+        if start is not None:
+            # 在后台渲染Markdown，完成后只替换这条AI消息；渲染期间保留流式输出的纯文本
+            self._render_message_async(self.current_response, start, self._ai_timestamp)
         else:
-            # 如果没有记录开始位置，直接使用add_message
+            # 如果没有流式输出的内容，直接使用add_message
             self.add_message("AI助手", self.current_response)
 
         # 恢复发送按钮，隐藏停止按钮
         self._reset_qa_buttons()
         self.status_label.setText("回答完成")
 
-        # 强制滚动到底部（完成渲染后）
-        self.chat_display.ensureCursorVisible()
+    @staticmethod
+    def _message_key(text):
+        """计算消息内容的哈希，作为渲染缓存的键"""
+        return hashlib.sha256(text.encode("utf-8", "surrogatepass")).hexdigest()
+
+    def _cache_rendered_html(self, key, html):
+        """写入渲染缓存，超出容量时淘汰最久未使用的条目"""
+        self._render_cache[key] = html
+        self._render_cache.move_to_end(key)
+        while len(self._render_cache) > MARKDOWN_RENDER_CACHE_SIZE:
+            self._render_cache.popitem(last=False)
+
+    def _render_markdown_cached(self, text):
+        """同步渲染Markdown（用于较短的消息），结果按消息哈希缓存"""
+        key = self._message_key(text)
+        html = self._render_cache.get(key)
+        if html is None:
+            html = self._render_markdown_to_html(text)
+        self._cache_rendered_html(key, html)
+        return html
 
-        # 额外的滚动确保
-        scrollbar = self.chat_display.verticalScrollBar()
-        scrollbar.setValue(scrollbar.maximum())
+    def _render_message_async(self, text, start, timestamp):
+        """在后台线程渲染从start开始到文档末尾的AI消息，完成后替换该消息块"""
+        document = self.chat_display.document()
+        # 两个光标会随前面内容的修改自动调整位置；结束光标放在消息最后一个字符之前，
+        # 这样之后在文档末尾追加的新消息不会被计入该消息块
+        start_cursor = QTextCursor(document)
+        start_cursor.setPosition(start)
+        end_cursor = QTextCursor(document)
+        end_cursor.setPosition(max(start, document.characterCount() - 2))
+
+        request_id = self._next_render_id
+        self._next_render_id += 1
+        self._render_requests[request_id] = (start_cursor, end_cursor, timestamp, self._chat_generation)
+
+        key = self._message_key(text)
+        html = self._render_cache.get(key)
+        if html is not None:
+            self._on_markdown_rendered(request_id, key, html)
+            return
 
-        # 移动光标到末尾并确保可见
-        cursor = self.chat_display.textCursor()
-        cursor.movePosition(cursor.MoveOperation.End)
-        self.chat_display.setTextCursor(cursor)
+        thread = MarkdownRenderThread(self._render_markdown_to_html, request_id, key, text)
+        thread.render_completed.connect(self._on_markdown_rendered)
+        thread.finished.connect(lambda: self._on_render_thread_finished(thread))
+        self._render_threads.add(thread)
+        thread.start()
+
+    def _on_render_thread_finished(self, thread):
+        """渲染线程结束后释放引用"""
+        self._render_threads.discard(thread)
+        thread.deleteLater()
+
+    def _on_markdown_rendered(self, request_id, key, html):
+        """用渲染结果替换对应的消息块"""
+        self._cache_rendered_html(key, html)
+        request = self._render_requests.pop(request_id, None)
+        if request is None:
+            return
+        start_cursor, end_cursor, timestamp, generation = request
+        if generation != self._chat_generation:
+            return
 
-        # 再次确保滚动到底部（有时需要延迟）
-        from PyQt6.QtCore import QTimer
+        following = self._is_following_output()
+        cursor = QTextCursor(self.chat_display.document())
+        cursor.setPosition(start_cursor.position())
+        cursor.setPosition(end_cursor.position() + 1, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertHtml(self._build_message_html("AI助手", "#28a745", timestamp, html))
 
-        QTimer.singleShot(50, lambda: scrollbar.setValue(scrollbar.maximum()))
+        # 渲染后内容高度变化，延迟滚动到底部
+        if following:
+            scrollbar = self.chat_display.verticalScrollBar()
+            QTimer.singleShot(50, lambda: scrollbar.setValue(scrollbar.maximum()))
 
     def on_response_failed(self, error_message):
         """AI回答失败"""
+        self._finish_streaming()
         self.add_message("系统", f"回答失败: {error_message}")
 
         # 恢复发送按钮，隐藏停止按钮
@@ -31,6 +31,7 @@ from PyQt6.QtWidgets import (
     QWidget,
 )
 
+from core.text_extraction import TextExtractionThread, shutdown_process_pool
 from core.translation import TranslationManager
 from ui.components import (
     DragDropOverlay,
@@ -41,6 +42,7 @@ from ui.components import (
 )
 from ui.pdfjs_widget import PdfJsWidget  # Use the new widget
 from ui.log_dialog import LogDialog
+from ui.thumbnail_sidebar import ThumbnailSidebar
 from utils.config_path import get_config_file_path
 
 
@@ -56,7 +58,7 @@ class MainWindow(QMainWindow):
         self.setAcceptDrops(True)
 
         self.current_file = None
-        self._last_pdf_file = None  # 用于追踪PDF文件变化
+        self._extraction_thread = None  # 后台文本提取线程
         self.translation_manager = TranslationManager()
         self._is_syncing = False
         self._scroll_sync_enabled = True
@@ -291,11 +293,19 @@ class MainWindow(QMainWindow):
             }
         """)
         left_layout.addWidget(left_title)
+        # 缩略图侧栏与原始文档并排显示
+        left_content_layout = QHBoxLayout()
+        left_content_layout.setContentsMargins(0, 0, 0, 0)
+        left_content_layout.setSpacing(0)
+        self.thumbnail_sidebar = ThumbnailSidebar()
+        self.thumbnail_sidebar.hide()
+        left_content_layout.addWidget(self.thumbnail_sidebar)
         self.left_pdf_widget = PdfJsWidget(name="left_view", profile=self.web_profile)
         self.left_pdf_widget.setStyleSheet(
             "border: none; border-bottom-left-radius: 7px; border-bottom-right-radius: 7px;"
         )
-        left_layout.addWidget(self.left_pdf_widget)
+        left_content_layout.addWidget(self.left_pdf_widget)
+        left_layout.addLayout(left_content_layout)
 
         # Middle panel (Translated PDF)
         self.middle_frame = QFrame()
@@ -468,6 +478,7 @@ class MainWindow(QMainWindow):
         # self.right_pdf_widget.scroll_changed.connect(self.on_right_scroll_changed) # This line was removed by the user's edit, so it's commented out.
         # Connect the scroll signals from both new widgets
         self.left_pdf_widget.scrollChanged.connect(self.on_scroll_changed)
+        self.thumbnail_sidebar.page_selected.connect(self.on_thumbnail_selected)
         self.right_pdf_widget.scrollChanged.connect(self.on_scroll_changed)
 
         # Handle download requests from the web engine
@@ -582,6 +593,10 @@ class MainWindow(QMainWindow):
         # Use a short timer to reset the sync flag, preventing immediate re-triggering.
         QTimer.singleShot(50, lambda: setattr(self, "_is_syncing", False))
 
+    def on_thumbnail_selected(self, page_num):
+        """点击缩略图时跳转原始文档（开启同步滚动时译文随之滚动）"""
+        self.left_pdf_widget.go_to_page(page_num + 1)
+
     def _reset_sync_flag(self):
         """重置同步标志"""
         if self._is_syncing:
@@ -627,6 +642,10 @@ class MainWindow(QMainWindow):
         from ui.batch_translation_dialog import BatchTranslationDialog
 
         dialog = BatchTranslationDialog(self)
+        # 批量翻译完成后在后台增量更新该文件夹的文档库索引
+        dialog.batch_folder_completed.connect(
+            lambda folder: self.embedded_qa.index_library_folder(folder, activate=False)
+        )
         dialog.exec()
 
     @pyqtSlot()
@@ -698,45 +717,81 @@ class MainWindow(QMainWindow):
             self.embedded_qa.add_message(
                 "系统", "请先打开PDF文件，然后即可开始智能问答"
             )
+        elif self.embedded_qa.pdf_content:
+            # PDF内容已在后台提取完成，保持历史对话记录
+            print("PDF内容已存在，保持历史对话记录")
+        elif self._extraction_thread:
+            # 文本仍在后台提取，提取完成后会自动通知问答面板；
+            # 已有等待回答的问题时保留对话，提示已显示过时不再重复添加
+            if not self.embedded_qa.has_pending_question():
+                self.embedded_qa.clear_chat()
+            self.embedded_qa.add_notice("正在后台提取PDF文本，可以直接提问，提取完成后将自动回答")
         else:
-            # 检查是否已经有PDF内容，避免重复提取和清空聊天记录
-            if not self.embedded_qa.pdf_content:
-                # 第一次加载PDF，需要提取文本内容
-                print("首次加载PDF，开始提取文本内容...")
-                pdf_text = self._extract_pdf_text()
-                if not pdf_text:
-                    self.embedded_qa.clear_chat()
-                    self.embedded_qa.add_message(
-                        "系统", "无法提取PDF文本内容，请检查PDF文件是否正常"
-                    )
-                else:
-                    print(f"PDF文本提取成功，长度: {len(pdf_text)} 字符")
-                    self.embedded_qa.set_pdf_content(pdf_text)
-                    # 只在首次加载时清空聊天记录并显示提示
-                    self.embedded_qa.clear_chat()
-                    self.embedded_qa.add_message(
-                        "系统",
-                        f"PDF文档已加载完成（{len(pdf_text)}字符），现在可以开始智能问答了！",
-                    )
-            else:
-                # PDF内容已存在，不需要清空聊天记录，只需确保内容是最新的
-                print("PDF内容已存在，保持历史对话记录")
-                # 如果当前文件与之前不同，则重新提取（比如用户换了PDF文件）
-                if (
-                    hasattr(self, "_last_pdf_file")
-                    and self._last_pdf_file != self.current_file
-                ):
-                    print("检测到PDF文件变化，重新提取文本内容...")
-                    pdf_text = self._extract_pdf_text()
-                    if pdf_text:
-                        self.embedded_qa.set_pdf_content(pdf_text)
-                        self.embedded_qa.add_message(
-                            "系统",
-                            f"新PDF文档已加载（{len(pdf_text)}字符），可以继续问答",
-                        )
-
-            # 记录当前PDF文件路径
-            self._last_pdf_file = self.current_file
+            # 之前的提取失败或未启动，重新在后台提取
+            self._start_text_extraction(self.current_file)
+
+    def _start_text_extraction(self, file_path):
+        """在后台线程中提取PDF文本，取消之前未完成的提取"""
+        if self._extraction_thread:
+            self._extraction_thread.stop()
+
+        self.embedded_qa.set_extraction_pending(file_path)
+
+        thread = TextExtractionThread(file_path, self)
+        thread.extraction_progress.connect(self._on_text_extraction_progress)
+        thread.extraction_completed.connect(self._on_text_extracted)
+        thread.extraction_failed.connect(self._on_text_extraction_failed)
+        thread.finished.connect(lambda: self._on_extraction_thread_finished(thread))
+        self._extraction_thread = thread
+        thread.start()
+
+    def _on_extraction_thread_finished(self, thread):
+        """清理已结束的提取线程"""
+        if self._extraction_thread is thread:
+            self._extraction_thread = None
+        thread.deleteLater()
+
+    def _on_text_extraction_progress(self, file_path, current, total):
+        """文本提取进度"""
+        if file_path == self.current_file:
+            self.embedded_qa.on_extraction_progress(current, total)
+
+    def _on_text_extracted(self, file_path, document):
+        """文本提取完成，通知问答面板"""
+        if file_path != self.current_file:
+            return
+
+        print(f"PDF文本提取成功，长度: {len(document)} 字符")
+        is_first_document = not self.embedded_qa.chat_history
+        has_pending_question = self.embedded_qa.has_pending_question()
+        self.embedded_qa.set_pdf_content(document)
+
+        if not self.qa_panel_visible or not self._check_qa_engine_config():
+            return
+        if not document:
+            self.embedded_qa.add_message(
+                "系统", "无法提取PDF文本内容，请检查PDF文件是否正常"
+            )
+        elif is_first_document:
+            # 首次加载时清空聊天记录并显示提示
+            if not has_pending_question:
+                self.embedded_qa.clear_chat()
+            self.embedded_qa.add_message(
+                "系统",
+                f"PDF文档已加载完成（{len(document)}字符），现在可以开始智能问答了！",
+            )
+        else:
+            self.embedded_qa.add_message(
+                "系统",
+                f"新PDF文档已加载（{len(document)}字符），可以继续问答",
+            )
+
+    def _on_text_extraction_failed(self, file_path, error_message):
+        """文本提取失败"""
+        if file_path != self.current_file:
+            return
+        print(f"PDF文本提取失败: {error_message}")
+        self.embedded_qa.set_extraction_failed(error_message)
 
     def _check_qa_engine_config(self):
         """检查问答引擎配置"""
@@ -771,344 +826,6 @@ class MainWindow(QMainWindow):
         except Exception:
             return False
 
-    def _extract_pdf_text(self):
-        """提取PDF文本内容 - 优先使用支持页面分割的方法"""
-        if not self.current_file:
-            return ""
-
-        try:
-            # 首先检查PDF的实际页数
-            actual_page_count = 0
-            try:
-                import pikepdf
-
-                with pikepdf.open(self.current_file) as pdf:
-                    actual_page_count = len(pdf.pages)
-                print(f"PDF实际页数: {actual_page_count}")
-            except Exception as e:
-                print(f"无法获取PDF页数: {e}")
-
-            # 优先尝试使用pymupdf（项目中已安装且支持页面分割）
-            try:
-                import pymupdf  # pymupdf
-
-                print("使用pymupdf(pymupdf )提取PDF文本...")
-                doc = pymupdf.open(self.current_file)
-                pdf_page_count = len(doc)
-                print(f"pymupdf检测到的页数: {pdf_page_count}")
-
-                text_content = []
-                for page_num in range(pdf_page_count):
-                    page = doc.load_page(page_num)
-                    page_text = page.get_text()
-
-                    # 检查文本质量 - 如果包含过多单字符或乱码，认为提取失败
-                    if page_text and page_text.strip():
-                        # 简单的文本质量检查
-                        words = page_text.split()
-                        single_chars = sum(
-                            1 for word in words if len(word.strip()) == 1
-                        )
-                        total_words = len(words)
-
-                        if total_words > 0 and (single_chars / total_words) > 0.7:
-                            print(f"第{page_num + 1}页文本质量较差，可能是乱码")
-                            text_content.append(
-                                f"=== 第{page_num + 1}页 ===\n[页面文本质量较差，可能需要使用其他提取方法]"
-                            )
-                        else:
-                            text_content.append(
-                                f"=== 第{page_num + 1}页 ===\n{page_text.strip()}"
-                            )
-                    else:
-                        # 即使页面为空，也添加页面标记
-                        text_content.append(
-                            f"=== 第{page_num + 1}页 ===\n[页面内容为空或无法提取]"
-                        )
-
-                doc.close()
-
-                if text_content and len(text_content) == pdf_page_count:
-                    full_text = "\n\n".join(text_content)
-                    print(
-                        f"成功使用pymupdf提取PDF文本，总长度: {len(full_text)} 字符，共{len(text_content)}页"
-                    )
-                    return full_text
-                else:
-                    print(
-                        f"pymupdf页面数量不匹配，期望{pdf_page_count}页，实际提取{len(text_content)}页"
-                    )
-
-            except ImportError as e:
-                print(f"pymupdf导入失败: {str(e)}")
-                print("尝试其他方法")
-            except Exception as e:
-                print(f"pymupdf处理失败: {str(e)}")
-                print("尝试其他方法")
-
-            # 尝试使用pdfplumber
-            try:
-                import pdfplumber
-
-                print("使用pdfplumber提取PDF文本...")
-                text_content = []
-                with pdfplumber.open(self.current_file) as pdf:
-                    pdf_page_count = len(pdf.pages)
-                    print(f"pdfplumber检测到的页数: {pdf_page_count}")
-
-                    # 验证页数是否合理
-                    if actual_page_count > 0 and pdf_page_count != actual_page_count:
-                        print(
-                            f"页数不匹配：实际{actual_page_count}页，pdfplumber检测到{pdf_page_count}页"
-                        )
-
-                    for page_num, page in enumerate(pdf.pages):
-                        try:
-                            page_text = page.extract_text()
-                            if page_text and page_text.strip():
-                                text_content.append(
-                                    f"=== 第{page_num + 1}页 ===\n{page_text.strip()}"
-                                )
-                            else:
-                                # 即使页面为空，也添加页面标记
-                                text_content.append(
-                                    f"=== 第{page_num + 1}页 ===\n[页面内容为空或无法提取]"
-                                )
-                        except Exception as e:
-                            print(f"提取第{page_num + 1}页文本失败: {e}")
-                            text_content.append(
-                                f"=== 第{page_num + 1}页 ===\n[页面文本提取失败]"
-                            )
-                            continue
-
-                if text_content and len(text_content) == pdf_page_count:
-                    full_text = "\n\n".join(text_content)
-                    print(
-                        f"成功使用pdfplumber提取PDF文本，总长度: {len(full_text)} 字符，共{len(text_content)}页"
-                    )
-                    return full_text
-                else:
-                    print(
-                        f"pdfplumber页面数量不匹配，期望{pdf_page_count}页，实际提取{len(text_content)}页"
-                    )
-
-            except ImportError:
-                print("pdfplumber未安装")
-
-            # 尝试使用PyPDF2（如果用户安装了）
-            try:
-                import PyPDF2
-
-                print("使用PyPDF2提取PDF文本...")
-                text_content = []
-                with open(self.current_file, "rb") as file:
-                    pdf_reader = PyPDF2.PdfReader(file)
-                    pdf_page_count = len(pdf_reader.pages)
-                    print(f"PyPDF2检测到的页数: {pdf_page_count}")
-
-                    # 验证页数是否合理
-                    if actual_page_count > 0 and pdf_page_count != actual_page_count:
-                        print(
-                            f"页数不匹配：实际{actual_page_count}页，PyPDF2检测到{pdf_page_count}页"
-                        )
-
-                    for page_num, page in enumerate(pdf_reader.pages):
-                        try:
-                            page_text = page.extract_text()
-                            if page_text and page_text.strip():
-                                text_content.append(
-                                    f"=== 第{page_num + 1}页 ===\n{page_text.strip()}"
-                                )
-                            else:
-                                # 即使页面为空，也添加页面标记
-                                text_content.append(
-                                    f"=== 第{page_num + 1}页 ===\n[页面内容为空或无法提取]"
-                                )
-                        except Exception as e:
-                            print(f"提取第{page_num + 1}页文本失败: {e}")
-                            text_content.append(
-                                f"=== 第{page_num + 1}页 ===\n[页面文本提取失败]"
-                            )
-                            continue
-
-                if text_content and len(text_content) == pdf_page_count:
-                    full_text = "\n\n".join(text_content)
-                    print(
-                        f"成功使用PyPDF2提取PDF文本，总长度: {len(full_text)} 字符，共{len(text_content)}页"
-                    )
-                    return full_text
-                else:
-                    print(
-                        f"PyPDF2页面数量不匹配，期望{pdf_page_count}页，实际提取{len(text_content)}页"
-                    )
-
-            except ImportError:
-                print("PyPDF2未安装")
-
-            # 使用pdfminer-six作为备用方案，增强页面分割功能
-            try:
-                import io
-
-                from pdfminer.high_level import extract_text, extract_text_to_fp
-                from pdfminer.layout import LAParams
-                from pdfminer.pdfpage import PDFPage
-
-                print("使用pdfminer-six提取PDF文本（备用方案）...")
-
-                # 尝试按页面提取文本
-                try:
-                    text_content = []
-                    with open(self.current_file, "rb") as fp:
-                        pages = list(PDFPage.get_pages(fp))
-                        page_count = len(pages)
-                        print(f"pdfminer-six检测到的页数: {page_count}")
-
-                        # 验证页数是否合理
-                        if actual_page_count > 0 and page_count != actual_page_count:
-                            print(
-                                f"页数不匹配：实际{actual_page_count}页，pdfminer-six检测到{page_count}页"
-                            )
-
-                        # 按页面提取文本
-                        for page_num, page in enumerate(pages):
-                            try:
-                                # 重新打开文件并提取特定页面
-                                with open(self.current_file, "rb") as fp2:
-                                    output_string = io.StringIO()
-                                    laparams = LAParams()
-                                    extract_text_to_fp(
-                                        fp2,
-                                        output_string,
-                                        page_numbers=[page_num],
-                                        laparams=laparams,
-                                    )
-                                    page_text = output_string.getvalue()
-
-                                if page_text and page_text.strip():
-                                    text_content.append(
-                                        f"=== 第{page_num + 1}页 ===\n{page_text.strip()}"
-                                    )
-                                else:
-                                    text_content.append(
-                                        f"=== 第{page_num + 1}页 ===\n[页面内容为空或无法提取]"
-                                    )
-
-                            except Exception as e:
-                                print(f"提取第{page_num + 1}页失败: {e}")
-                                text_content.append(
-                                    f"=== 第{page_num + 1}页 ===\n[页面文本提取失败: {str(e)}]"
-                                )
-
-                    if text_content and len(text_content) == page_count:
-                        full_text = "\n\n".join(text_content)
-                        print(
-                            f"成功使用pdfminer-six按页面提取PDF文本，总长度: {len(full_text)} 字符，共{len(text_content)}页"
-                        )
-                        return full_text
-                    else:
-                        print("pdfminer-six页面提取不完整，回退到整体提取")
-
-                except Exception as e:
-                    print(f"pdfminer-six按页面提取失败: {e}，尝试整体提取")
-
-                # 回退到整体文本提取
-                full_text = extract_text(self.current_file)
-                if full_text and full_text.strip():
-                    print(
-                        f"成功使用pdfminer-six提取PDF文本，总长度: {len(full_text)} 字符"
-                    )
-
-                    # 尝试智能分页 - 基于常见的页面分隔符
-                    import re
-
-                    # 常见的页面分隔符模式
-                    page_break_patterns = [
-                        r"\n\s*\n\s*(?=\d+\s*\n)",  # 页码后的换行
-                        r"\n\s*\n\s*(?=Page\s+\d+)",  # "Page X"
-                        r"\n\s*\n\s*(?=第\s*\d+\s*页)",  # "第X页"
-                        r"\f",  # 换页符
-                    ]
-
-                    # 尝试不同的分页模式
-                    pages = None
-                    for pattern in page_break_patterns:
-                        try_pages = re.split(pattern, full_text)
-                        if len(try_pages) > 1:
-                            pages = try_pages
-                            print(f"使用模式 '{pattern}' 分割出 {len(pages)} 个部分")
-                            break
-
-                    if pages and len(pages) > 1:
-                        text_content = []
-                        for i, page_text in enumerate(pages):
-                            if page_text.strip():
-                                text_content.append(
-                                    f"=== 第{i + 1}页 ===\n{page_text.strip()}"
-                                )
-                        if text_content:
-                            final_text = "\n\n".join(text_content)
-                            print(f"智能分页成功，共{len(text_content)}页")
-                            return final_text
-
-                    # 如果无法分页，返回整个文档，但为页面过滤添加单页标记
-                    print("无法自动分页，返回整个文档")
-                    return f"=== 第1页 ===\n{full_text.strip()}\n\n注意：无法自动分页，所有内容作为第1页处理。"
-
-            except ImportError:
-                print("pdfminer-six导入失败")
-            except Exception as e:
-                print(f"pdfminer-six处理失败: {e}")
-
-            # 最后使用pikepdf作为最后备用方案
-            print("使用pikepdf作为最后备用方案...")
-            import pikepdf
-
-            with pikepdf.open(self.current_file) as pdf:
-                pdf_page_count = len(pdf.pages)
-                print(f"pikepdf检测到的页数: {pdf_page_count}")
-
-                text_content = []
-                for page_num, page in enumerate(pdf.pages):
-                    try:
-                        # pikepdf主要用于结构操作，文本提取有限
-                        if "/Contents" in page:
-                            text_content.append(
-                                f"=== 第{page_num + 1}页 ===\n[PDF页面内容 - 文本提取功能有限，建议安装pdfminer-six、pymupdf、pdfplumber或PyPDF2]"
-                            )
-                        else:
-                            text_content.append(
-                                f"=== 第{page_num + 1}页 ===\n[空白页面或无文本内容]"
-                            )
-                    except Exception as e:
-                        print(f"处理第{page_num + 1}页失败: {e}")
-                        text_content.append(
-                            f"=== 第{page_num + 1}页 ===\n[页面处理失败]"
-                        )
-                        continue
-
-            if text_content and len(text_content) == pdf_page_count:
-                full_text = "\n\n".join(text_content)
-                print(
-                    f"使用pikepdf提取PDF结构信息，总长度: {len(full_text)} 字符，共{len(text_content)}页"
-                )
-                return full_text
-            else:
-                print(
-                    f"pikepdf页面数量不匹配，期望{pdf_page_count}页，实际提取{len(text_content)}页"
-                )
-                if text_content:
-                    full_text = "\n\n".join(text_content)
-                    return (
-                        full_text
-                        + "\n\n注意：当前使用的是基础PDF结构提取。为获得完整文本内容，建议确保pdfminer-six或pymupdf库正常工作。"
-                    )
-                else:
-                    return "PDF文件已加载，但无法提取文本内容。建议检查PDF文件格式或安装更好的文本提取库。"
-
-        except Exception as e:
-            print(f"PDF文本提取失败: {e}")
-            return f"PDF文本提取失败: {str(e)}"
-
     def load_pdf_file(self, file_path):
         """加载PDF文件"""
         # 检查是否是新的PDF文件
@@ -1116,20 +833,18 @@ class MainWindow(QMainWindow):
 
         self.current_file = file_path
         self.left_pdf_widget.load_pdf(file_path)
+        if is_new_file:
+            self.thumbnail_sidebar.load_document(file_path)
+            self.thumbnail_sidebar.show()
         self.status_label.set_status(
             f"已加载: {os.path.basename(file_path)}", "success"
         )
 
-        # 如果是新文件且智能问答面板存在内容，清空它以便重新加载
-        if (
-            is_new_file
-            and hasattr(self.embedded_qa, "pdf_content")
-            and self.embedded_qa.pdf_content
-        ):
-            print("检测到新PDF文件，清空智能问答内容以便重新加载")
-            self.embedded_qa.pdf_content = None  # 清空PDF内容，但保留聊天记录
+        # 新文件：在后台提取文本（清空PDF内容，但保留聊天记录）
+        if is_new_file or not (self.embedded_qa.pdf_content or self._extraction_thread):
+            self._start_text_extraction(file_path)
 
-        # 如果智能问答面板可见，更新PDF内容
+        # 如果智能问答面板可见，更新提示信息
         if self.qa_panel_visible:
             self._update_qa_panel_status()
 
@@ -1406,6 +1121,12 @@ class MainWindow(QMainWindow):
                 self.right_pdf_widget.cleanup()
             if hasattr(self, "translation_manager") and self.translation_manager:
                 self.translation_manager.cleanup()
+            if self._extraction_thread:
+                self._extraction_thread.stop()
+                self._extraction_thread.wait(3000)
+            shutdown_process_pool()
+            self.thumbnail_sidebar.cleanup()
+            self.embedded_qa.cleanup()
 
             event.accept()
         else:
@@ -273,6 +273,19 @@ class PdfJsWidget(QWidget):
         """
         self.view.page().runJavaScript(js_code)
     
+    def go_to_page(self, page_number: int):
+        """跳转到指定页面（从1开始）"""
+        js_code = f"""
+            try {{
+                if (window.PDFViewerApplication && PDFViewerApplication.pdfDocument) {{
+                    PDFViewerApplication.page = {int(page_number)};
+                }}
+            }} catch (e) {{
+                // Viewer not ready yet, do nothing.
+            }}
+        """
+        self.view.page().runJavaScript(js_code)
+
     def zoom_in(self):
         self.view.page().runJavaScript("isZooming = true;")
         self.view.page().runJavaScript("zoomIn();")
@@ -4,6 +4,7 @@ import json
 import os
 
 from PyQt6.QtWidgets import (
+    QComboBox,
     QDialog,
     QFormLayout,
     QGroupBox,
@@ -12,11 +13,19 @@ from PyQt6.QtWidgets import (
     QLineEdit,
     QMessageBox,
     QPushButton,
+    QSpinBox,
     QTextEdit,
     QVBoxLayout,
 )
 
 from utils.config_path import get_config_file_path
+from utils.constants import MAP_REDUCE_CONCURRENCY
+
+# 超长文档处理方式：(显示名称, 配置值)
+LONG_DOCUMENT_MODES = [
+    ("智能截断（只保留最相关的内容）", "truncate"),
+    ("分块汇总（提取全文要点后回答）", "map_reduce"),
+]
 
 
 class QASettingsDialog(QDialog):
@@ -25,7 +34,7 @@ class QASettingsDialog(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setWindowTitle("智能问答配置")
-        self.setFixedSize(500, 450)
+        self.setFixedSize(500, 540)
         self.setModal(True)
         
         # 设置对话框样式 - 与应用其他对话框保持一致
@@ -73,6 +82,13 @@ class QASettingsDialog(QDialog):
                 border-color: #007acc;
                 background-color: #ffffff;
             }
+            QComboBox, QSpinBox {
+                border: 1px solid #ddd;
+                border-radius: 3px;
+                padding: 4px;
+                font-size: 12px;
+                background-color: #fafafa;
+            }
             QPushButton {
                 background-color: #007acc;
                 color: white;
@@ -125,6 +141,18 @@ class QASettingsDialog(QDialog):
         format_label.setStyleSheet("color: #666; font-style: italic; margin-top: 5px;")
         page_layout.addRow("", format_label)
         
+        # 超长文档处理方式
+        self.long_mode_combo = QComboBox()
+        for label, _ in LONG_DOCUMENT_MODES:
+            self.long_mode_combo.addItem(label)
+        page_layout.addRow("超长文档:", self.long_mode_combo)
+        
+        # 分块汇总的并发请求数
+        self.concurrency_spin = QSpinBox()
+        self.concurrency_spin.setRange(1, 16)
+        self.concurrency_spin.setValue(MAP_REDUCE_CONCURRENCY)
+        page_layout.addRow("并发请求数:", self.concurrency_spin)
+        
         layout.addWidget(page_group)
         
         # 系统提示词配置组
@@ -183,6 +211,13 @@ class QASettingsDialog(QDialog):
         system_prompt = qa_config.get("system_prompt", "")
         self.prompt_input.setPlainText(system_prompt)
         
+        # 加载超长文档处理设置
+        mode = qa_config.get("long_document_mode", "truncate")
+        for i, (_, value) in enumerate(LONG_DOCUMENT_MODES):
+            if value == mode:
+                self.long_mode_combo.setCurrentIndex(i)
+        self.concurrency_spin.setValue(int(qa_config.get("map_concurrency", MAP_REDUCE_CONCURRENCY)))
+        
     def save_settings(self):
         """保存设置"""
         try:
@@ -201,6 +236,10 @@ class QASettingsDialog(QDialog):
                 
             self.config["qa_settings"]["pages"] = pages
             self.config["qa_settings"]["system_prompt"] = system_prompt
+            self.config["qa_settings"]["long_document_mode"] = LONG_DOCUMENT_MODES[
+                self.long_mode_combo.currentIndex()
+            ][1]
+            self.config["qa_settings"]["map_concurrency"] = self.concurrency_spin.value()
             
             # 保存到文件
             config_file = get_config_file_path()
@@ -0,0 +1,111 @@
+"""页面缩略图侧栏"""
+
+from PyQt6.QtCore import QSize, Qt, QThread, pyqtSignal
+from PyQt6.QtGui import QIcon, QPixmap
+from PyQt6.QtWidgets import QListView, QListWidget, QListWidgetItem
+
+from core.pdf_document import PDFDocument
+from core.thumbnails import ThumbnailThread, load_thumbnail_atlas
+from utils.constants import THUMBNAIL_SIDEBAR_WIDTH, THUMBNAIL_WIDTH
+from utils.file_fingerprint import file_fingerprint
+
+
+class ThumbnailSidebar(QListWidget):
+    """页面缩略图导航栏
+
+    打开文档时先从磁盘缓存读取缩略图，没有缓存时在低优先级后台线程中逐页生成
+    """
+    page_selected = pyqtSignal(int)  # 页码（从0开始）
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.document = PDFDocument()
+        self._thumbnail_thread = None
+        self._stopping_threads = set()  # 已请求停止、尚未结束的生成线程
+
+        self.setViewMode(QListView.ViewMode.IconMode)
+        self.setFlow(QListView.Flow.TopToBottom)
+        self.setWrapping(False)
+        self.setMovement(QListView.Movement.Static)
+        self.setUniformItemSizes(True)
+        self.setIconSize(QSize(THUMBNAIL_WIDTH, int(THUMBNAIL_WIDTH * 1.42)))
+        self.setSpacing(6)
+        self.setFixedWidth(THUMBNAIL_SIDEBAR_WIDTH)
+        self.setHorizontalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        self.setStyleSheet("""
+            QListWidget {
+                background-color: #f5f5f5;
+                border: none;
+                border-right: 1px solid #e0e0e0;
+            }
+            QListWidget::item {
+                color: #666666;
+            }
+            QListWidget::item:selected {
+                background-color: #d6e9f8;
+                color: #333333;
+            }
+        """)
+
+        self.itemClicked.connect(lambda item: self.page_selected.emit(self.row(item)))
+
+    def load_document(self, file_path):
+        """加载文档的缩略图"""
+        self.clear_document()
+        success, message = self.document.load(file_path)
+        if not success:
+            print(f"缩略图侧栏{message}")
+            return
+
+        page_count = self.document.total_pages
+        placeholder = QPixmap(self.iconSize())
+        placeholder.fill(Qt.GlobalColor.white)
+        placeholder_icon = QIcon(placeholder)
+        for page_num in range(page_count):
+            self.addItem(QListWidgetItem(placeholder_icon, str(page_num + 1)))
+
+        fingerprint = file_fingerprint(file_path)
+        thumbnails = load_thumbnail_atlas(fingerprint, page_count)
+        if thumbnails is not None:
+            for page_num, image in enumerate(thumbnails):
+                self._on_thumbnail_ready(page_num, image)
+            return
+
+        thread = ThumbnailThread(self.document.handles, fingerprint, page_count)
+        thread.thumbnail_ready.connect(self._on_thread_thumbnail_ready)
+        thread.finished.connect(lambda: self._on_thread_finished(thread))
+        self._thumbnail_thread = thread
+        thread.start(QThread.Priority.LowestPriority)
+
+    def _on_thread_thumbnail_ready(self, page_num, image):
+        """生成线程的缩略图，忽略已切换文档的旧线程在停止前发出的结果"""
+        if self.sender() is self._thumbnail_thread:
+            self._on_thumbnail_ready(page_num, image)
+
+    def _on_thread_finished(self, thread):
+        """生成线程结束后释放"""
+        if self._thumbnail_thread is thread:
+            self._thumbnail_thread = None
+        self._stopping_threads.discard(thread)
+        thread.deleteLater()
+
+    def _on_thumbnail_ready(self, page_num, image):
+        """显示生成的缩略图"""
+        item = self.item(page_num)
+        if item is not None:
+            item.setIcon(QIcon(QPixmap.fromImage(image)))
+
+    def clear_document(self):
+        """停止缩略图生成并清空侧栏"""
+        thread, self._thumbnail_thread = self._thumbnail_thread, None
+        if thread is not None and thread.isRunning():
+            thread.stop()
+            if not thread.wait(3000):
+                # 保留引用直到线程结束（finished信号中释放）
+                self._stopping_threads.add(thread)
+        self.document.close()
+        self.clear()
+
+    def cleanup(self):
+        """释放资源"""
+        self.clear_document()
@@ -60,3 +60,28 @@ def get_resource_path(relative_path):
     base_path = get_app_resource_dir()
     resource_path = os.path.join(base_path, relative_path)
     return resource_path
+
+
+def get_cache_dir(name=""):
+    """
+    获取缓存目录路径
+
+    在打包环境中,缓存保存到用户目录的可写位置
+    在开发环境中,使用项目目录下的cache目录
+    """
+    if getattr(sys, "frozen", False):
+        if sys.platform == "darwin":  # macOS
+            cache_dir = os.path.expanduser("~/Library/Caches/FreePDF")
+        elif sys.platform == "win32":  # Windows
+            cache_dir = os.path.expanduser("~/AppData/Local/FreePDF/cache")
+        else:  # Linux
+            cache_dir = os.path.expanduser("~/.cache/FreePDF")
+    else:
+        cache_dir = os.path.join(get_app_resource_dir(), "cache")
+
+    if name:
+        cache_dir = os.path.join(cache_dir, name)
+
+    # 确保目录存在
+    os.makedirs(cache_dir, exist_ok=True)
+    return cache_dir
@@ -9,7 +9,9 @@ MIN_ZOOM = 0.3      # 允许更小的缩放
 ZOOM_STEP = 1.25
 
 # 缓存设置
-MAX_CACHE_SIZE = 6
+PAGE_CACHE_MAX_BYTES = 300 * 1024 * 1024  # 已渲染页面图像缓存的最大占用（默认300MB）
+PAGE_WORDS_CACHE_SIZE = 200  # 页面文本单词缓存的页数上限（单独淘汰，远大于图像缓存）
+DISPLAY_LIST_CACHE_SIZE = 12  # 缓存的页面显示列表数量，缩放或裁剪重新渲染时不再解析内容流
 PRELOAD_DISTANCE = 2
 
 # 显示设置
@@ -36,4 +38,76 @@ PROCESSING_ANIMATION_SPEED = 100  # ms 处理动画速度
 DEFAULT_LANG_IN = "en"
 DEFAULT_LANG_OUT = "zh"
 DEFAULT_SERVICE = "google"
-DEFAULT_THREADS = 4 
\ No newline at end of file
+DEFAULT_THREADS = 4 
+# 问答缓存设置
+QA_CACHE_TTL = 7 * 24 * 3600  # 秒，缓存答案有效期（默认7天）
+QA_CACHE_MAX_BYTES = 50 * 1024 * 1024  # 答案缓存最大占用（默认50MB）
+QA_CACHE_REPLAY_CHUNK = 64  # 命中缓存时每次回放的字符数
+
+# 对话历史压缩设置
+QA_HISTORY_WINDOW = 4  # 保留原文的最近对话轮数
+QA_HISTORY_COMPACT_BATCH = 2  # 超出窗口的对话累计达到该轮数时触发压缩
+QA_HISTORY_SUMMARY_CHARS = 800  # 历史摘要的最大字数
+QA_HISTORY_MAX_TURNS = 8  # 摘要缺失或滞后时最多保留的原文对话轮数
+
+# 文档库问答设置
+LIBRARY_CHUNK_CHARS = 1200  # 文档库检索块的最大字符数
+LIBRARY_SEARCH_LIMIT = 40  # 每次检索返回的最大文本块数量
+
+# 文本提取设置
+PARALLEL_EXTRACTION_MIN_PAGES = 64  # 达到该页数时使用进程池并行提取
+PARALLEL_EXTRACTION_BATCH_PAGES = 16  # 每个任务提取的页数
+PARALLEL_EXTRACTION_MAX_WORKERS = 8  # 最大工作进程数
+TEXT_CACHE_MAX_BYTES = 200 * 1024 * 1024  # 提取文本磁盘缓存的最大占用（默认200MB）
+
+# token计数设置
+TOKEN_COUNT_CHUNK_CHARS = 8192  # 长文本按该字符数切块计数
+TOKEN_COUNT_THREADS = 4  # 批量编码使用的线程数
+TOKEN_COUNT_CACHE_SIZE = 4096  # 缓存token数量的文本块数量上限
+
+# 模型上下文窗口设置
+CONTEXT_WINDOW_CACHE_TTL = 24 * 3600  # 秒，查询到的上下文长度的缓存有效期
+CONTEXT_WINDOW_RETRY_TTL = 3600  # 秒，查询失败后再次查询的间隔
+CONTEXT_WINDOW_REQUEST_TIMEOUT = 5  # 秒，查询请求超时时间
+OLLAMA_MAX_NUM_CTX = 32768  # 未显式配置num_ctx时向Ollama申请的上下文长度上限（避免按训练长度分配过大的KV缓存）
+
+# 问答显示设置
+QA_STREAM_FLUSH_INTERVAL = 40  # ms，流式回答合并刷新的间隔
+MARKDOWN_RENDER_CACHE_SIZE = 128  # 缓存的已渲染消息数量
+
+# 分块汇总问答设置
+MAP_REDUCE_CONCURRENCY = 4  # 默认同时发送的分块请求数量
+MAP_REDUCE_NOTES_CHARS = 600  # 每个分块要点的最大字数
+MAP_REDUCE_POLL_INTERVAL = 0.5  # 秒，等待分块结果时检查停止请求的间隔
+
+# 文档结构分析设置
+STRUCTURE_CHUNK_CHARS = 2000  # 章节级文本块的最大字符数
+RUNNING_HEADER_MARGIN = 0.08  # 页面顶部/底部该比例范围内的文本视为可能的页眉页脚
+RUNNING_HEADER_MIN_RATIO = 0.3  # 在至少该比例的页面中重复出现时判定为页眉页脚
+
+# 分块渲染设置
+TILE_SIZE = 512  # 图块边长（像素）
+ZOOM_BUCKETS_PER_OCTAVE = 8  # 缩放比例每翻倍划分的档位数，同档位的图块共享缓存
+LOW_RES_PREVIEW_SCALE = 0.5  # 清晰图块渲染完成前填充用的整页预览比例（像素/点）
+TILE_CACHE_MAX_BYTES = 256 * 1024 * 1024  # 图块缓存的最大占用（默认256MB）
+
+# 渲染线程池设置
+RENDER_POOL_WORKERS = 2  # 渲染线程数量
+RENDER_LATENCY_SAMPLES = 512  # 用于统计渲染延迟分位数的最近样本数
+
+# 文本选择设置
+TEXT_GRID_CELL_SIZE = 64  # 单词命中检测网格的单元格边长（像素）
+
+# 缩略图设置
+THUMBNAIL_WIDTH = 96  # 缩略图宽度（像素）
+THUMBNAIL_ATLAS_COLUMNS = 10  # 缩略图拼图每行的缩略图数量
+THUMBNAIL_ATLAS_QUALITY = 80  # 缩略图拼图的JPEG质量
+THUMBNAIL_YIELD_MS = 5  # 每生成一页缩略图后让出的时间（毫秒），避免与前台渲染争抢
+THUMBNAIL_SIDEBAR_WIDTH = 130  # 缩略图侧栏宽度
+THUMBNAIL_CACHE_MAX_BYTES = 100 * 1024 * 1024  # 缩略图磁盘缓存的最大占用（默认100MB）
+
+# 渲染结果磁盘缓存设置
+RENDER_DISK_CACHE_ENABLED = True  # 是否将渲染好的页面写入磁盘，重启后直接读取
+RENDER_DISK_CACHE_MAX_BYTES = 500 * 1024 * 1024  # 渲染结果磁盘缓存的最大占用（默认500MB）
+RENDER_DISK_CACHE_COMPRESSION = 3  # zlib压缩级别，兼顾写入速度和体积
+RENDER_DISK_CACHE_QUEUE_SIZE = 16  # 等待写入的页面数量上限，超出时丢弃新的写入
@@ -0,0 +1,126 @@
+"""结构化PDF文本模块"""
+
+import hashlib
+import re
+from typing import Iterable, List, Optional
+
+from utils.text_processor import text_processor
+
+# 页面标记格式，与提取结果的字符串形式保持兼容
+PAGE_MARKER = "=== 第{page}页 ==="
+PAGE_MARKER_PATTERN = re.compile(r'=== 第(\d+)页 ===\n?')
+PAGE_SEPARATOR = "\n\n"
+
+
+class DocumentText:
+    """按页组织的PDF文本
+
+    在提取时一次性构建，保存每页文本、对应的原始页码（0-based）、
+    每页在字符串形式中的字符偏移以及每页的token数量
+    """
+
+    def __init__(self, pages: List[str], page_numbers: Optional[List[int]] = None,
+                 token_counts: Optional[List[int]] = None):
+        self.pages = list(pages)
+        self.page_numbers = list(page_numbers) if page_numbers is not None else list(range(len(self.pages)))
+        if token_counts is None:
+            token_counts = text_processor.count_tokens_batch(self.page_blocks())
+        self.token_counts = list(token_counts)
+        self.offsets = self._compute_offsets()
+        self.source_path = ""  # 来源PDF文件路径，用于按需分析文档结构
+        self._text = None
+        self._content_hash = None
+        self._index_by_page = None
+
+    @classmethod
+    def from_text(cls, text: str) -> "DocumentText":
+        """从带有"=== 第N页 ==="标记的字符串构建，无标记时整体作为第1页"""
+        matches = list(PAGE_MARKER_PATTERN.finditer(text or ""))
+        if not matches:
+            return cls([text.strip()] if text and text.strip() else [])
+
+        pages = []
+        page_numbers = []
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            pages.append(text[match.end():end].strip())
+            page_numbers.append(int(match.group(1)) - 1)
+        return cls(pages, page_numbers)
+
+    @classmethod
+    def ensure(cls, content) -> "DocumentText":
+        """将字符串或DocumentText统一转换为DocumentText"""
+        if isinstance(content, DocumentText):
+            return content
+        return cls.from_text(content or "")
+
+    def _page_block(self, index: int) -> str:
+        """获取带页面标记的单页文本"""
+        return f"{PAGE_MARKER.format(page=self.page_numbers[index] + 1)}\n{self.pages[index]}"
+
+    def _compute_offsets(self) -> List[int]:
+        """计算每页在字符串形式中的起始偏移"""
+        offsets = []
+        position = 0
+        for i in range(len(self.pages)):
+            offsets.append(position)
+            position += len(self._page_block(i)) + len(PAGE_SEPARATOR)
+        return offsets
+
+    @property
+    def page_count(self) -> int:
+        """页面数量"""
+        return len(self.pages)
+
+    @property
+    def total_tokens(self) -> int:
+        """全部页面的token数量"""
+        return sum(self.token_counts)
+
+    @property
+    def text(self) -> str:
+        """带页面标记的完整文本（延迟构建并缓存）"""
+        if self._text is None:
+            self._text = PAGE_SEPARATOR.join(self.page_blocks())
+        return self._text
+
+    @property
+    def content_hash(self) -> str:
+        """完整文本的哈希值"""
+        if self._content_hash is None:
+            self._content_hash = hashlib.sha256(
+                self.text.encode("utf-8", "surrogatepass")
+            ).hexdigest()
+        return self._content_hash
+
+    def page_blocks(self) -> List[str]:
+        """获取所有带页面标记的单页文本"""
+        return [self._page_block(i) for i in range(len(self.pages))]
+
+    def select_pages(self, page_indices: Iterable[int]) -> "DocumentText":
+        """选取指定页面（0-based原始页码），复杂度与选中页数成正比"""
+        if self._index_by_page is None:
+            self._index_by_page = {page: i for i, page in enumerate(self.page_numbers)}
+
+        positions = []
+        for page in page_indices:
+            position = self._index_by_page.get(page)
+            if position is not None:
+                positions.append(position)
+
+        selected = DocumentText(
+            [self.pages[i] for i in positions],
+            [self.page_numbers[i] for i in positions],
+            [self.token_counts[i] for i in positions],
+        )
+        selected.source_path = self.source_path
+        return selected
+
+    def __bool__(self) -> bool:
+        return bool(self.pages)
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def __str__(self) -> str:
+        return self.text
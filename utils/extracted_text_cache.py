@@ -0,0 +1,114 @@
+"""提取文本的磁盘缓存模块"""
+
+import json
+import os
+import threading
+import time
+import zlib
+from typing import Any, Optional
+
+from utils.config_path import get_cache_dir
+from utils.constants import TEXT_CACHE_MAX_BYTES
+from utils.document_text import DocumentText
+from utils.text_processor import text_processor
+
+# 提取流程变化时递增，使旧缓存自动失效
+TEXT_CACHE_VERSION = 2
+
+
+class ExtractedTextCache:
+    """按文件指纹缓存每页提取文本（以及文档结构等派生数据），压缩存储并按总大小进行LRU淘汰"""
+
+    def __init__(self, cache_dir: Optional[str] = None, max_bytes: int = TEXT_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def _get_cache_dir(self) -> str:
+        """获取缓存目录（延迟创建）"""
+        if not self.cache_dir:
+            self.cache_dir = get_cache_dir("text")
+        return self.cache_dir
+
+    def _entry_path(self, fingerprint: str, kind: str = "text", version: int = TEXT_CACHE_VERSION) -> str:
+        """获取缓存条目的文件路径，提取文本之外的数据以kind区分"""
+        name = f"{fingerprint}.v{version}.zlib" if kind == "text" else f"{fingerprint}.{kind}.v{version}.zlib"
+        return os.path.join(self._get_cache_dir(), name)
+
+    def get(self, fingerprint: str) -> Optional[DocumentText]:
+        """读取缓存的文本，不存在或损坏时返回None；token计数方式已变化时重新计算token数量"""
+        data = self.get_data(fingerprint)
+        if data is None:
+            return None
+        token_counts = data["token_counts"] if data.get("tokenizer") == text_processor.tokenizer_name else None
+        return DocumentText(data["pages"], data["page_numbers"], token_counts)
+
+    def set(self, fingerprint: str, document: DocumentText):
+        """写入文本缓存，并在超出容量时淘汰最久未使用的条目"""
+        self.set_data(fingerprint, {
+            "pages": document.pages,
+            "page_numbers": document.page_numbers,
+            "token_counts": document.token_counts,
+            "tokenizer": text_processor.tokenizer_name,
+        })
+
+    def get_data(self, fingerprint: str, kind: str = "text", version: int = TEXT_CACHE_VERSION) -> Optional[Any]:
+        """读取缓存的JSON数据，不存在或损坏时返回None"""
+        path = self._entry_path(fingerprint, kind, version)
+        try:
+            with open(path, "rb") as f:
+                data = json.loads(zlib.decompress(f.read()).decode("utf-8", errors="surrogatepass"))
+            # 更新访问时间，用于LRU淘汰
+            now = time.time()
+            os.utime(path, (now, now))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, zlib.error) as e:
+            print(f"读取文本缓存失败: {e}")
+            return None
+        return data
+
+    def set_data(self, fingerprint: str, data: Any, kind: str = "text", version: int = TEXT_CACHE_VERSION):
+        """写入JSON数据，并在超出容量时淘汰最久未使用的条目
+
+        PDF中提取的文本可能包含不成对的代理字符，按surrogatepass编码，读取时原样还原
+        """
+        path = self._entry_path(fingerprint, kind, version)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            payload = zlib.compress(
+                json.dumps(data, ensure_ascii=False).encode("utf-8", errors="surrogatepass"), 6
+            )
+            with self._lock:
+                with open(tmp_path, "wb") as f:
+                    f.write(payload)
+                os.replace(tmp_path, path)
+                self._evict()
+        except (OSError, ValueError) as e:
+            print(f"写入文本缓存失败: {e}")
+
+    def _evict(self):
+        """按最近访问时间淘汰，直到总大小不超过上限"""
+        entries = []
+        total = 0
+        with os.scandir(self._get_cache_dir()) as it:
+            for entry in it:
+                if entry.is_file() and entry.name.endswith(".zlib"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+                    total += stat.st_size
+        if total <= self.max_bytes:
+            return
+        entries.sort()
+        for _, size, path in entries:
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+
+# 全局实例
+extracted_text_cache = ExtractedTextCache()
@@ -0,0 +1,33 @@
+"""文件指纹工具模块"""
+
+import hashlib
+import os
+from typing import Tuple
+
+# 参与哈希的采样块大小
+_SAMPLE_SIZE = 64 * 1024
+
+
+def file_signature(file_path: str) -> Tuple[int, float]:
+    """获取文件的快速签名（大小, 修改时间），用于判断文件是否可能发生变化"""
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime
+
+
+def file_fingerprint(file_path: str) -> str:
+    """计算文件指纹
+
+    基于文件大小、修改时间以及开头、中间、结尾三段采样内容的哈希，
+    无需读取整个文件即可可靠地识别同一份PDF；原地修改且大小不变的文件也会得到新的指纹
+    """
+    stat = os.stat(file_path)
+    size = stat.st_size
+    digest = hashlib.sha256(f"{size}:{stat.st_mtime_ns}".encode("ascii"))
+    with open(file_path, "rb") as f:
+        if size <= _SAMPLE_SIZE * 3:
+            digest.update(f.read())
+        else:
+            for offset in (0, size // 2 - _SAMPLE_SIZE // 2, size - _SAMPLE_SIZE):
+                f.seek(offset)
+                digest.update(f.read(_SAMPLE_SIZE))
+    return digest.hexdigest()
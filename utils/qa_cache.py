@@ -0,0 +1,155 @@
+"""问答答案缓存模块"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+from utils.config_path import get_cache_dir
+from utils.constants import QA_CACHE_MAX_BYTES, QA_CACHE_TTL
+
+
+class QACache:
+    """问答答案缓存，基于SQLite持久化，支持TTL过期和容量淘汰"""
+
+    def __init__(self, db_path: Optional[str] = None, ttl: int = QA_CACHE_TTL,
+                 max_bytes: int = QA_CACHE_MAX_BYTES):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def _get_conn(self) -> sqlite3.Connection:
+        """获取数据库连接（延迟创建）"""
+        if self._conn is None:
+            if not self.db_path:
+                self.db_path = os.path.join(get_cache_dir(), "qa_cache.sqlite3")
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS qa_answers (
+                    key TEXT PRIMARY KEY,
+                    answer TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_qa_answers_accessed ON qa_answers(accessed_at)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    @staticmethod
+    def hash_text(text: str) -> str:
+        """计算文本的哈希值"""
+        return hashlib.sha256((text or "").encode("utf-8", "surrogatepass")).hexdigest()
+
+    @staticmethod
+    def normalize_question(question: str) -> str:
+        """规范化问题：统一大小写、空白和结尾标点"""
+        question = re.sub(r"\s+", " ", (question or "").strip().lower())
+        return question.rstrip("?？。.!！ ")
+
+    @classmethod
+    def make_key(cls, document_hash: str, pages: List[int], question: str,
+                 chat_history: list, provider: str, model: str, system_prompt: str,
+                 mode: str = "") -> str:
+        """构建缓存键
+
+        由文档内容哈希、选中页面、规范化问题、对话历史哈希、服务商、模型和系统提示词组成，
+        mode非空时（如分块汇总模式）一并计入
+        """
+        history_hash = cls.hash_text(json.dumps(
+            [[chat.get("question", ""), chat.get("answer", "")] for chat in chat_history],
+            ensure_ascii=False,
+        ))
+        key_parts = [
+            document_hash,
+            ",".join(str(page) for page in pages),
+            cls.normalize_question(question),
+            history_hash,
+            provider or "",
+            model or "",
+            cls.hash_text(system_prompt),
+        ]
+        if mode:
+            key_parts.append(mode)
+        return cls.hash_text("\x1f".join(key_parts))
+
+    def get(self, key: str) -> Optional[str]:
+        """获取缓存的答案，过期或不存在时返回None"""
+        now = time.time()
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                row = conn.execute(
+                    "SELECT answer, created_at FROM qa_answers WHERE key = ?", (key,)
+                ).fetchone()
+                if row is None:
+                    return None
+                answer, created_at = row
+                if now - created_at > self.ttl:
+                    conn.execute("DELETE FROM qa_answers WHERE key = ?", (key,))
+                    conn.commit()
+                    return None
+                conn.execute(
+                    "UPDATE qa_answers SET accessed_at = ? WHERE key = ?", (now, key)
+                )
+                conn.commit()
+                return answer
+        except sqlite3.Error as e:
+            print(f"读取问答缓存失败: {e}")
+            return None
+
+    def set(self, key: str, answer: str):
+        """写入答案缓存，并按TTL和容量淘汰旧条目"""
+        if not answer:
+            return
+        now = time.time()
+        size = len(answer.encode("utf-8", "surrogatepass"))
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                conn.execute(
+                    "INSERT OR REPLACE INTO qa_answers (key, answer, size, created_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (key, answer, size, now, now),
+                )
+                self._evict(conn, now)
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"写入问答缓存失败: {e}")
+
+    def _evict(self, conn: sqlite3.Connection, now: float):
+        """淘汰过期条目，并在超出容量时按最近访问时间淘汰"""
+        conn.execute("DELETE FROM qa_answers WHERE created_at < ?", (now - self.ttl,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM qa_answers").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute(
+            "SELECT key, size FROM qa_answers ORDER BY accessed_at ASC"
+        ).fetchall():
+            conn.execute("DELETE FROM qa_answers WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self):
+        """清空缓存"""
+        try:
+            with self._lock:
+                conn = self._get_conn()
+                conn.execute("DELETE FROM qa_answers")
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"清空问答缓存失败: {e}")
+
+
+# 全局实例
+qa_cache = QACache()
@@ -1,13 +1,26 @@
 """文本处理工具模块"""
 
 import re
-from typing import Dict, List, Tuple
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from itertools import accumulate
+from typing import Dict, List, Optional, Tuple
 
 try:
     import tiktoken
 except ImportError:
     tiktoken = None
 
+from utils.constants import TOKEN_COUNT_CACHE_SIZE, TOKEN_COUNT_CHUNK_CHARS, TOKEN_COUNT_THREADS
+
+# 估算token时使用的中文字符匹配模式
+_CJK_RUN_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+# 切分句子（保留句末标点）
+_SENTENCE_PATTERN = re.compile(r'[^。！？.!?]*[。！？.!?]+\s*|[^。！？.!?]+$')
+# 计算性价比时块token数的下限，避免几乎为空的块排在最前面
+_MIN_DENSITY_TOKENS = 64
+
 
 class TextProcessor:
     """文本处理器，支持token计数和智能截断"""
@@ -46,6 +59,13 @@ class TextProcessor:
     def __init__(self):
         """初始化文本处理器"""
         self.encoding = None
+        self._token_cache = OrderedDict()  # 文本块 -> token数量
+        self._token_cache_lock = threading.Lock()
+        self._model_limit_cache = {}  # 模型名称 -> token限制
+        # 按长度降序排列的模型名称，用于最长前缀匹配
+        self._model_keys_by_length = sorted(
+            (key for key in self.MODEL_TOKEN_LIMITS if key != "default"), key=len, reverse=True
+        )
         self._init_tiktoken()
         
     def _init_tiktoken(self):
@@ -61,42 +81,135 @@ class TextProcessor:
             print(f"警告: 初始化tiktoken失败: {e}，将使用字符数估算")
             self.encoding = None
     
+    @property
+    def tokenizer_name(self) -> str:
+        """当前token计数方式的名称（tiktoken编码名或estimate），用于使缓存的token数量失效"""
+        return self.encoding.name if self.encoding else "estimate"
+
     def count_tokens(self, text: str) -> int:
         """计算文本的token数量"""
         if not text:
             return 0
-            
+        return self.count_tokens_batch([text])[0]
+
+    def count_tokens_batch(self, texts: List[str], use_cache: bool = True) -> List[int]:
+        """批量计算多段文本的token数量
+
+        长文本按TOKEN_COUNT_CHUNK_CHARS切分为文本块，每个块的结果单独缓存；
+        未命中缓存的块通过tiktoken的encode_ordinary_batch多线程编码。
+        use_cache为False时不读写缓存（用于句子等一次性的短文本）
+        """
+        if not use_cache:
+            return self._encode_chunks(list(texts)) if texts else []
+
+        chunk_lists = [self._split_for_counting(text) if text else [] for text in texts]
+
+        counts = {}
+        missing = []
+        with self._token_cache_lock:
+            for chunks in chunk_lists:
+                for chunk in chunks:
+                    if chunk in counts:
+                        continue
+                    cached = self._token_cache.get(chunk)
+                    if cached is None:
+                        counts[chunk] = None
+                        missing.append(chunk)
+                    else:
+                        self._token_cache.move_to_end(chunk)
+                        counts[chunk] = cached
+
+        if missing:
+            for chunk, tokens in zip(missing, self._encode_chunks(missing)):
+                counts[chunk] = tokens
+            with self._token_cache_lock:
+                for chunk in missing:
+                    self._token_cache[chunk] = counts[chunk]
+                while len(self._token_cache) > TOKEN_COUNT_CACHE_SIZE:
+                    self._token_cache.popitem(last=False)
+
+        return [sum(counts[chunk] for chunk in chunks) for chunks in chunk_lists]
+
+    @staticmethod
+    def _split_for_counting(text: str) -> List[str]:
+        """将文本切分为计数用的文本块，尽量在换行或空格处断开以减少边界误差"""
+        if len(text) <= TOKEN_COUNT_CHUNK_CHARS:
+            return [text]
+
+        chunks = []
+        start = 0
+        length = len(text)
+        while start < length:
+            end = min(start + TOKEN_COUNT_CHUNK_CHARS, length)
+            if end < length:
+                lower = start + TOKEN_COUNT_CHUNK_CHARS // 2
+                cut = text.rfind("\n", lower, end)
+                if cut < 0:
+                    cut = text.rfind(" ", lower, end)
+                if cut >= 0:
+                    end = cut + 1
+            chunks.append(text[start:end])
+            start = end
+        return chunks
+
+    def _encode_chunks(self, chunks: List[str]) -> List[int]:
+        """计算文本块的token数量，tiktoken不可用时使用估算"""
         if self.encoding:
             try:
-                # 处理可能包含特殊token的文本，允许所有特殊token
-                return len(self.encoding.encode(text, disallowed_special=()))
+                # encode_ordinary将特殊token按普通文本处理
+                if len(chunks) == 1:
+                    return [len(self.encoding.encode_ordinary(chunks[0]))]
+                encoded = self.encoding.encode_ordinary_batch(chunks, num_threads=TOKEN_COUNT_THREADS)
+                return [len(tokens) for tokens in encoded]
             except Exception as e:
                 print(f"警告: token计数失败: {e}，使用字符数估算")
-        
-        # 降级方案：使用字符数估算（中文约1.5个字符=1个token，英文约4个字符=1个token）
-        chinese_chars = len(re.findall(r'[\u4e00-\u9fff]', text))
+        return [self._estimate_tokens(chunk) for chunk in chunks]
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        """估算token数量（中文约1.5个字符=1个token，英文约4个字符=1个token）"""
+        # 按连续中文片段累加长度，无需为每个字符生成列表项
+        chinese_chars = sum(match.end() - match.start() for match in _CJK_RUN_PATTERN.finditer(text))
         other_chars = len(text) - chinese_chars
         estimated_tokens = int(chinese_chars * 0.67 + other_chars * 0.25)
         return max(estimated_tokens, len(text) // 4)  # 至少按4字符=1token计算
     
     def get_model_token_limit(self, model_name: str) -> int:
-        """获取模型的token限制"""
+        """从配置表获取模型的token限制
+
+        模型名称先去掉组织前缀（如"Qwen/"）和Ollama标签（如":7b"），
+        再按完整名称或最长的完整前缀匹配（如"qwen2.5-7b"匹配"qwen2"，而"gpt-4o"不会匹配"gpt-4"）
+        """
         if not model_name:
             return self.MODEL_TOKEN_LIMITS["default"]
-            
-        # 模糊匹配模型名称
-        model_lower = model_name.lower()
-        for key, limit in self.MODEL_TOKEN_LIMITS.items():
-            if key in model_lower or model_lower.startswith(key.split('-')[0]):
-                return limit
-        
+
+        limit = self._model_limit_cache.get(model_name)
+        if limit is None:
+            limit = self._lookup_model_token_limit(model_name)
+            self._model_limit_cache[model_name] = limit
+        return limit
+
+    def _lookup_model_token_limit(self, model_name: str) -> int:
+        """在配置表中查找模型的token限制"""
+        name = model_name.lower().rsplit("/", 1)[-1].split(":", 1)[0]
+        if name in self.MODEL_TOKEN_LIMITS:
+            return self.MODEL_TOKEN_LIMITS[name]
+
+        for key in self._model_keys_by_length:
+            if name.startswith(key) and not name[len(key)].isalnum():
+                return self.MODEL_TOKEN_LIMITS[key]
+
         return self.MODEL_TOKEN_LIMITS["default"]
     
     def calculate_available_tokens(self, model_name: str, system_prompt: str, 
                                  chat_history: List[Dict], current_question: str,
-                                 max_response_tokens: int = 2000) -> int:
-        """计算可用于PDF内容的token数量"""
-        total_limit = self.get_model_token_limit(model_name)
+                                 max_response_tokens: int = 2000,
+                                 context_limit: Optional[int] = None) -> int:
+        """计算可用于PDF内容的token数量
+
+        context_limit为服务端查询到的上下文窗口大小，未提供时按模型名称查表
+        """
+        total_limit = context_limit or self.get_model_token_limit(model_name)
         
         # 计算已使用的token
         used_tokens = 0
@@ -115,13 +228,13 @@ class TextProcessor:
         available_tokens = total_limit - used_tokens - reserved_tokens
         return max(available_tokens, 1000)  # 至少保留1000个token给PDF内容
     
-    def smart_truncate_pdf_content(self, pdf_content: str, max_tokens: int, 
+    def smart_truncate_pdf_content(self, pdf_content, max_tokens: int,
                                  question: str = "") -> Tuple[str, bool]:
         """
         智能截断PDF内容
         
         Args:
-            pdf_content: PDF文本内容
+            pdf_content: PDF文本内容（字符串或DocumentText）
             max_tokens: 最大允许的token数量
             question: 用户问题，用于关键词匹配
             
@@ -130,6 +243,19 @@ class TextProcessor:
         """
         if not pdf_content:
             return "", False
+
+        from utils.document_text import DocumentText
+
+        # 按页组织的文档：直接使用提取时计算好的每页文本和token数量
+        if isinstance(pdf_content, DocumentText):
+            if pdf_content.total_tokens <= max_tokens:
+                return pdf_content.text, False
+            selected_content = self._select_important_content(
+                pdf_content.pages, max_tokens, question,
+                block_tokens=pdf_content.token_counts,
+                block_labels=[page + 1 for page in pdf_content.page_numbers],
+            )
+            return selected_content, True
             
         current_tokens = self.count_tokens(pdf_content)
         if current_tokens <= max_tokens:
@@ -148,10 +274,31 @@ class TextProcessor:
         
         return selected_content, True
     
+    def select_sections(self, sections: List[Dict], max_tokens: int, question: str = "") -> str:
+        """在token预算内选择最相关的章节级文本块
+
+        Args:
+            sections: 文档结构分析得到的文本块（需包含text、tokens、page_start、page_end）
+            max_tokens: 最大允许的token数量
+            question: 用户问题，用于关键词匹配
+        """
+        labels = [
+            f"{section['page_start'] + 1}" if section["page_start"] == section["page_end"]
+            else f"{section['page_start'] + 1}-{section['page_end'] + 1}"
+            for section in sections
+        ]
+        return self._select_important_content(
+            [section["text"] for section in sections], max_tokens, question,
+            block_tokens=[section["tokens"] for section in sections],
+            block_labels=labels,
+        )
+    
     def _split_pdf_by_pages(self, pdf_content: str) -> List[str]:
         """按页面分割PDF内容"""
-        # 寻找页面分隔符（如"第X页:"或类似模式）
-        page_pattern = r'第\s*\d+\s*页\s*[:：]'
+        # 寻找提取结果中的页面标记"=== 第X页 ==="
+        page_pattern = r'=== 第\d+页 ==='
+        if not re.search(page_pattern, pdf_content):
+            return []
         pages = re.split(page_pattern, pdf_content)
         
         # 过滤掉空内容
@@ -166,7 +313,8 @@ class TextProcessor:
         return paragraphs
     
     def _select_important_content(self, content_blocks: List[str], max_tokens: int, 
-                                question: str) -> str:
+                                question: str, block_tokens: Optional[List[int]] = None,
+                                block_labels: Optional[List] = None) -> str:
         """
         智能选择重要内容
         
@@ -174,40 +322,49 @@ class TextProcessor:
         1. 保留前几个块（通常包含摘要、介绍）
         2. 保留最后几个块（通常包含结论）
         3. 基于问题关键词匹配相关块
-        4. 确保总token数不超过限制
+        4. 按"得分/token数"从高到低贪心选择，放不下的块跳过，继续尝试更小的块
+        5. 剩余预算用于得分最高的未选块，按句子前缀和截断
         """
         if not content_blocks:
             return ""
         
-        selected_blocks = []
-        current_tokens = 0
+        if block_tokens is None:
+            block_tokens = self.count_tokens_batch(content_blocks)
         
         # 提取问题关键词
         question_keywords = self._extract_keywords(question) if question else []
         
         # 计算每个块的重要性得分
-        block_scores = []
-        for i, block in enumerate(content_blocks):
-            score = self._calculate_block_importance(block, i, len(content_blocks), question_keywords)
-            block_tokens = self.count_tokens(block)
-            block_scores.append((i, block, score, block_tokens))
-        
-        # 按重要性排序
-        block_scores.sort(key=lambda x: x[2], reverse=True)
-        
-        # 选择最重要的块，直到达到token限制
-        for block_idx, block, score, block_tokens in block_scores:
-            if current_tokens + block_tokens <= max_tokens:
-                selected_blocks.append((block_idx, block))
-                current_tokens += block_tokens
+        total_blocks = len(content_blocks)
+        scores = [
+            self._calculate_block_importance(block, i, total_blocks, question_keywords)
+            for i, block in enumerate(content_blocks)
+        ]
+        
+        # 按单位token的得分排序，得分相同时优先得分高的块
+        order = sorted(
+            range(total_blocks),
+            key=lambda i: (scores[i] / max(block_tokens[i], _MIN_DENSITY_TOKENS), scores[i]),
+            reverse=True,
+        )
+        
+        selected_blocks = []
+        skipped = []
+        remaining_tokens = max_tokens
+        for block_idx in order:
+            tokens = block_tokens[block_idx]
+            if tokens <= remaining_tokens:
+                selected_blocks.append((block_idx, content_blocks[block_idx]))
+                remaining_tokens -= tokens
             else:
-                # 如果当前块过大，尝试截断
-                remaining_tokens = max_tokens - current_tokens
-                if remaining_tokens > 100:  # 至少需要100个token才值得截断
-                    truncated_block = self._truncate_block(block, remaining_tokens)
-                    if truncated_block:
-                        selected_blocks.append((block_idx, truncated_block))
-                break
+                skipped.append(block_idx)
+        
+        # 剩余预算足够时，截断得分最高的未选块放入
+        if skipped and remaining_tokens > 100:  # 至少需要100个token才值得截断
+            block_idx = max(skipped, key=lambda i: scores[i])
+            truncated_block = self._truncate_block(content_blocks[block_idx], remaining_tokens)
+            if truncated_block:
+                selected_blocks.append((block_idx, truncated_block))
         
         # 按原始顺序排序
         selected_blocks.sort(key=lambda x: x[0])
@@ -215,21 +372,19 @@ class TextProcessor:
         # 组合选中的内容
         result_parts = []
         for block_idx, block in selected_blocks:
-            if block_idx < len(content_blocks) - len(selected_blocks):
+            if block_labels is not None:
+                result_parts.append(f"[页面 {block_labels[block_idx]}]\n{block}")
+            elif block_idx < total_blocks - len(selected_blocks):
                 result_parts.append(f"[页面 {block_idx + 1}]\n{block}")
             else:
                 result_parts.append(block)
         
-        result = "\n\n".join(result_parts)
-        
         # 添加截断提示
-        total_blocks = len(content_blocks)
         selected_count = len(selected_blocks)
         if selected_count < total_blocks:
-            truncation_note = f"\n\n[注意：由于内容过长，已智能选择 {selected_count}/{total_blocks} 个重要部分]"
-            result += truncation_note
+            result_parts.append(f"[注意：由于内容过长，已智能选择 {selected_count}/{total_blocks} 个重要部分]")
         
-        return result
+        return "\n\n".join(result_parts)
     
     def _extract_keywords(self, question: str) -> List[str]:
         """从问题中提取关键词"""
@@ -284,32 +439,20 @@ class TextProcessor:
         return score
     
     def _truncate_block(self, block: str, max_tokens: int) -> str:
-        """截断单个内容块"""
-        if self.count_tokens(block) <= max_tokens:
-            return block
-        
-        # 按句子分割
-        sentences = re.split(r'[。！？.!?]\s*', block)
-        
-        result = ""
-        current_tokens = 0
-        
-        for sentence in sentences:
-            sentence = sentence.strip()
-            if not sentence:
-                continue
-                
-            sentence_tokens = self.count_tokens(sentence + "。")
-            if current_tokens + sentence_tokens <= max_tokens - 20:  # 预留空间
-                result += sentence + "。"
-                current_tokens += sentence_tokens
-            else:
-                break
+        """截断单个内容块：按句子前缀和二分查找能放入预算的最长前缀"""
+        sentences = _SENTENCE_PATTERN.findall(block)
+        if not sentences:
+            return ""
         
-        if result:
-            result += "...[内容截断]"
+        prefix_tokens = list(accumulate(self.count_tokens_batch(sentences, use_cache=False)))
+        if prefix_tokens[-1] <= max_tokens:
+            return block
         
-        return result
+        # 预留截断提示的空间
+        sentence_count = bisect_right(prefix_tokens, max_tokens - 20)
+        if sentence_count == 0:
+            return ""
+        return "".join(sentences[:sentence_count]).rstrip() + "...[内容截断]"
 
 
 # 全局实例